@@ -13,22 +13,75 @@ app.get("/validate", async (req, res) => {
   res.json({ success: true });
 });
 
-app.post('/get_account_data', (req, res) => {
-  const { login, password, server, start_date, end_date } = req.body;
+// Resident python worker: one long-lived process instead of a spawn per request
+const residentWorker = (script, args = []) => ({
+  process: null,
+  buffer: '',
+  nextId: 1,
+  pending: new Map(),
+
+  start() {
+    const scriptPath = path.resolve(script);
+    const worker = spawn('python', [scriptPath, ...args]);
+
+    worker.stdout.on('data', chunk => {
+      this.buffer += chunk.toString();
+      let index;
+      while ((index = this.buffer.indexOf('\n')) >= 0) {
+        const line = this.buffer.slice(0, index).trim();
+        this.buffer = this.buffer.slice(index + 1);
+        if (!line) continue;
+
+        try {
+          const { id, ...payload } = JSON.parse(line);
+          const resolve = this.pending.get(id);
+          if (resolve) {
+            this.pending.delete(id);
+            resolve(payload);
+          }
+        } catch (err) {
+          console.error('worker output:', line);
+        }
+      }
+    });
+    worker.stderr.on('data', err => console.error('stderr:', err.toString()));
+    worker.on('close', code => {
+      console.error(`${script} exited with code ${code}`);
+      for (const resolve of this.pending.values()) resolve(null);
+      this.pending.clear();
+      this.buffer = '';
+      this.process = null;
+    });
+
+    this.process = worker;
+  },
+
+  request(body) {
+    if (!this.process) this.start();
+
+    const id = String(this.nextId++);
+    return new Promise(resolve => {
+      this.pending.set(id, resolve);
+      this.process.stdin.write(JSON.stringify({ id, ...body }) + '\n');
+    });
+  }
+});
+
+// ACCOUNT_WORKER_TERMINALS=1-32 runs one python process per terminal
+const accountWorker = residentWorker("../scripts/account/worker.py",
+  process.env.ACCOUNT_WORKER_TERMINALS ? ['--terminals', process.env.ACCOUNT_WORKER_TERMINALS] : []);
+// compiles on COMPILE_WORKERS MetaEditor copies at once, each killed after COMPILE_TIMEOUT seconds
+const validateWorker = residentWorker("../scripts/validate/worker.py");
+
+app.post('/get_account_data', async (req, res) => {
+  const { login, password, server, start_date, end_date, sections, curve_interval, fresh, timeout } = req.body;
 
   if (!login || !password || !server)
     return res.status(400).json({ error: 'Missing fields' });
 
-  const scriptPath = path.resolve("../scripts/account/index.py");
-  const process = spawn('python', [scriptPath, login, password, server, start_date, end_date]);
-
-  let data = '';
-  process.stdout.on('data', chunk => data += chunk.toString());
-  process.stderr.on('data', err => console.error('stderr:', err.toString()));
-  process.on('close', code => {
-    if (code === 0) res.json(JSON.parse(data));
-    else res.status(500).json({ error: 'Failed to connect' });
-  });
+  const data = await accountWorker.request({ login, password, server, start_date, end_date, sections, curve_interval, fresh, timeout });
+  if (data) res.json(data);
+  else res.status(500).json({ error: 'Failed to connect' });
 });
 
 
@@ -51,33 +104,51 @@ app.post("/validate", upload.single("code_file"), async (req, res) => {
     const exFilePath = path.resolve(`./${destination}${filename}.${file_extension.replace("mq", "ex")}`)
     const rawFilePath = path.resolve(`./${destination}${filename}`)
 
-    const scriptPath = path.resolve("../scripts/validate/index.py");
-    const python = spawn("python", [scriptPath, filePath, filename, exFilePath, rawFilePath]);
+    const result = await validateWorker.request({
+      file_path: filePath, filename, ex_file_path: exFilePath, raw_file_path: rawFilePath
+    });
+    if (!result) return res.status(500).json({ error: "Validation worker failed" });
+    if (result.error) return res.status(500).json({ error: result.error });
+    return res.json(result);
 
-    let output = "";
-    let errorOutput = "";
+  } catch (err) {
+    console.error(err);
+    res.status(500).json({ success: false, message: "Server error" });
+  }
+});
 
-    python.stdout.on("data", (data) => {
-      output += data.toString();
-    });
+// Strategy packs: every uploaded file compiled in one MetaEditor run, results keyed by original name
+app.post("/validate_batch", upload.array("code_files"), async (req, res) => {
+  try {
 
-    python.stderr.on("data", (data) => {
-      errorOutput += data.toString();
-    });
+    if (!req.files || !req.files.length) {
+      return res.status(400).json({ error: "No files uploaded" });
+    }
 
-    python.on("close", (code) => {
-        console.log(JSON.parse(output))
+    const stagingDir = path.resolve(`./uploads/batch-${Date.now()}-${Math.random().toString(36).slice(2, 8)}`)
+    fs.mkdirSync(stagingDir, { recursive: true })
 
-      try {
-        if (errorOutput) {
-          return res.status(500).json({ error: errorOutput });
-        }
-        const result = JSON.parse(output);
-        return res.json(result);
-      } catch (err) {
-        return res.status(500).json({ error: "Failed to parse Python output", details: output });
-      }
-    });
+    // staged as <index>_<name>.mq5 so two uploads with the same name do not collide
+    const names = {}
+    req.files.forEach((file, index) => {
+      const extension = path.extname(file.originalname).toLowerCase() === ".mq4" ? "mq4" : "mq5"
+      const base = path.basename(file.originalname, path.extname(file.originalname)).replace(/[^\w.-]/g, "_")
+      const stagedName = `${index}_${base}.${extension}`
+      fs.renameSync(path.resolve(file.path), path.join(stagingDir, stagedName))
+      names[stagedName] = file.originalname
+    })
+
+    const output = await validateWorker.request({ batch: stagingDir });
+    fs.rmSync(stagingDir, { recursive: true, force: true })
+
+    if (!output) return res.status(500).json({ error: "Validation worker failed" });
+    if (output.error) return res.status(500).json({ error: output.error });
+
+    const result = {};
+    for (const [stagedName, fileResult] of Object.entries(output)) {
+      result[names[stagedName] || stagedName] = fileResult;
+    }
+    return res.json(result);
 
   } catch (err) {
     console.error(err);
@@ -88,7 +159,6 @@ app.post("/validate", upload.single("code_file"), async (req, res) => {
 
 
 
-
 const PORT = process.env.PORT || 4756;
 app.listen(PORT, () => {
   console.log(`EA Compiler API running on port ${PORT} 🚀`);
@@ -0,0 +1,186 @@
+from utils.terminal_manager import TerminalManager, to_msc
+from utils.fake_mt5 import FakeMT5
+from utils.deal_store import DealStore
+from utils.symbol_index import SymbolIndex
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from loguru import logger
+
+# TerminalManager hot paths against a synthetic account (utils/fake_mt5.py), no terminal needed.
+#
+#   python benchmark.py --deals 10000,100000,1000000
+#   python benchmark.py --baseline data/benchmarks/<commit>.json
+#
+# Results are written to data/benchmarks/<commit>.json, and with --baseline each case
+# is printed next to the baseline's median.
+
+BENCHMARK_FOLDER = os.path.join(os.path.dirname(__file__), "data", "benchmarks")
+LOGIN = 5000001
+SERVER = "Fake-Server"
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def new_manager(mt5: FakeMT5, folder: str):
+    # a TerminalManager on the fake terminal with its stores in folder, also used by test_sync.py
+    terminal_manager = TerminalManager(mt5)
+    terminal_manager.deal_store = DealStore(os.path.join(folder, "deals.sqlite3"))
+    terminal_manager.symbol_index = SymbolIndex(os.path.join(folder, "symbols.sqlite3"))
+    return terminal_manager
+
+
+async def timed(run, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await run()
+        timings.append(time.perf_counter() - started)
+
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings)
+    }
+
+
+async def bench_account(deals: int, positions: int, repeat: int):
+    mt5 = FakeMT5(deals=deals, positions=positions)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as folder:
+        # full sync into an empty deal store, a new account's first sync
+        runs = iter(range(repeat))
+
+        async def cold_sync():
+            run_folder = os.path.join(folder, f"cold{next(runs)}")
+            cold_manager = new_manager(mt5, run_folder)
+            try:
+                data = await cold_manager.get_refined_account_data(LOGIN, "password", SERVER, terminal_number=1)
+            finally:
+                cold_manager.close()
+            assert data.get("status"), data
+
+        results["sync_cold"] = await timed(cold_sync, repeat)
+
+        # repeat sync of the same account, only recent history is fetched
+        terminal_manager = new_manager(mt5, os.path.join(folder, "warm"))
+        await terminal_manager.get_refined_account_data(LOGIN, "password", SERVER, terminal_number=1)
+
+        async def warm_sync():
+            data = await terminal_manager.get_refined_account_data(LOGIN, "password", SERVER, terminal_number=1)
+            assert data.get("status"), data
+
+        results["sync_warm"] = await timed(warm_sync, repeat)
+
+        async def account_section():
+            await terminal_manager.sync_account(LOGIN, "password", SERVER, ["account"], terminal_number=1)
+
+        results["sync_account_section"] = await timed(account_section, repeat)
+
+        # the individual stages, on the already synced store
+        start_date, end_date = TerminalManager.get_history_window()
+        since_msc, until_msc = to_msc(start_date), to_msc(end_date)
+        store = terminal_manager.deal_store
+        closed_trades = open_trades = balance_trades = None
+
+        async def closed():
+            nonlocal closed_trades
+            closed_trades = await terminal_manager.get_closed_trades(
+                deal_array=store.array(LOGIN, SERVER, since_msc, until_msc))
+
+        async def opened():
+            nonlocal open_trades
+            open_trades = await terminal_manager.get_open_trades()
+
+        async def balance():
+            nonlocal balance_trades
+            balance_trades = store.load(LOGIN, SERVER, since_msc, until_msc, deal_type=2)
+
+        results["get_closed_trades"] = await timed(closed, repeat)
+        results["get_open_trades"] = await timed(opened, repeat)
+        results["load_balance_trades"] = await timed(balance, repeat)
+
+        async def account_info():
+            await terminal_manager.get_account_info(open_trades, closed_trades, balance_trades)
+
+        results["get_account_info"] = await timed(account_info, repeat)
+
+        async def equity_curve():
+            terminal_manager.get_equity_curve(LOGIN, SERVER)
+
+        results["get_equity_curve"] = await timed(equity_curve, repeat)
+        terminal_manager.close()
+
+    return results
+
+
+def compare(results: dict, baseline: dict):
+    print(f"{'deals':>9}  {'case':<22} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for deals, cases in results.items():
+        for case, timing in cases.items():
+            before = baseline.get("results", {}).get(deals, {}).get(case)
+            if before:
+                ratio = timing["median"] / before["median"] if before["median"] else 0
+                print(f"{deals:>9}  {case:<22} {before['median']:>10.4f} {timing['median']:>10.4f} {ratio:>6.2f}x")
+            else:
+                print(f"{deals:>9}  {case:<22} {'-':>10} {timing['median']:>10.4f} {'-':>7}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="TerminalManager micro-benchmarks on a synthetic account")
+    parser.add_argument("--deals", default="10000,100000", help="comma separated deal counts, e.g. 10000,1000000")
+    parser.add_argument("--positions", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="results file, default data/benchmarks/<commit>.json")
+    parser.add_argument("--baseline", default=None, help="results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    # the per-call INFO lines would dominate the timings
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    commit = git_commit()
+    results = {}
+    for deals in [int(d) for d in args.deals.split(",") if d.strip()]:
+        logger.warning(f"⏱️ Benchmarking {deals} deals")
+        results[str(deals)] = await bench_account(deals, args.positions, args.repeat)
+
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results
+    }
+
+    output = args.output or os.path.join(BENCHMARK_FOLDER, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+    else:
+        compare(results, {})
+
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -17,7 +17,10 @@ async def main():
         })
 
     terminal_manager = TerminalManager()
-    data = await terminal_manager.get_refined_account_data(login, password, server, start_date, end_date)
+    try:
+        data = await terminal_manager.get_refined_account_data(login, password, server, start_date, end_date)
+    finally:
+        terminal_manager.close()
     print(json.dumps(data))
     
     return
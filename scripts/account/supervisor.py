@@ -0,0 +1,296 @@
+from utils.allocator import get_allocator, TERMINALS_FOLDER, TERMINAL_COUNT, TERMINAL_STATUS_PATH
+from utils.dispatcher import parse_terminal_range
+from utils.sync_metrics import Histogram
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from datetime import datetime
+from loguru import logger
+
+# Warm-pool supervisor: keeps the target terminals running so a sync never pays a cold start.
+#
+#   python supervisor.py --terminals 1-32
+#
+# Every terminal is launched (/portable, like launch_all_terminals.bat did) and counts as
+# ready once its process is alive and its journal logged the start. Its time to ready is
+# recorded. A terminal that exits or is not ready within TERMINAL_READY_TIMEOUT is marked
+# unavailable in the allocator, so no request lands on it, and restarted with backoff;
+# it is handed out again as soon as it is ready.
+#
+# The allocator skips unavailable terminals, and a worker pool pinned to terminals
+# (worker.py --terminals) reads the status file written to TERMINAL_STATUS_PATH instead.
+# mt5.initialize(path=...) starts a terminal that is not running, so a sync may bring one
+# back before the supervisor does; the supervisor's own launch then exits right away
+# (one instance per portable folder) and the terminal is adopted as "external", with a
+# relaunch attempt every TERMINAL_EXTERNAL_PROBE_INTERVAL to take it over once it exits.
+#
+# A ready terminal is probed every TERMINAL_LIVENESS_INTERVAL: when its windows stop answering
+# (IsHungAppWindow, Windows only) it is marked unavailable straight away and restarted once it
+# stayed hung for TERMINAL_HUNG_TIMEOUT. A terminal that is responsive but lost its broker
+# connection is not detected here, a sync on it fails to initialize and the request is answered.
+
+SUPERVISOR_CHECK_INTERVAL = 5
+TERMINAL_READY_TIMEOUT = 120
+# spacing between launches, 32 terminals starting at once saturate the disk
+TERMINAL_LAUNCH_SPACING = 1
+# delay before restarting a crashed terminal, doubled for each crash in a row
+TERMINAL_RESTART_DELAY = 5
+TERMINAL_RESTART_MAX_DELAY = 300
+TERMINAL_EXTERNAL_PROBE_INTERVAL = 60
+TERMINAL_LIVENESS_INTERVAL = 15
+# a terminal not responding for this long is killed and restarted
+TERMINAL_HUNG_TIMEOUT = 60
+
+
+def terminal_folder(terminal_number: int):
+    return os.path.join(TERMINALS_FOLDER, f"T{terminal_number}")
+
+
+class SupervisedTerminal:
+    def __init__(self, terminal_number: int):
+        self.number = terminal_number
+        self.id = f"T{terminal_number}"
+        self.path = os.path.join(terminal_folder(terminal_number), "terminal64.exe")
+        self.process = None
+        # stopped, starting, ready, waiting (for a restart), external (running, started by someone
+        # else) or probing (relaunched to see whether the external instance is still there)
+        self.state = "stopped"
+        self.launched_at = None
+        self.restart_at = 0.0
+        self.crashes = 0
+        self.restarts = 0
+        self.ready_seconds = None
+        self.journal = None
+        self.journal_offset = 0
+        self.probe_at = 0.0
+        self.hung_since = None
+
+    def journal_path(self):
+        return os.path.join(terminal_folder(self.number), "logs", datetime.now().strftime("%Y%m%d") + ".log")
+
+    def launch(self):
+        # only what the terminal writes after this launch counts for readiness
+        self.journal = self.journal_path()
+        try:
+            self.journal_offset = os.path.getsize(self.journal)
+        except OSError:
+            self.journal_offset = 0
+
+        self.process = subprocess.Popen([self.path, "/portable"], cwd=terminal_folder(self.number))
+        self.launched_at = time.monotonic()
+        self.state = "starting"
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def started(self):
+        # the journal is UTF-16; a terminal writes "... started for <company>" once it is up
+        try:
+            with open(self.journal, "rb") as f:
+                f.seek(self.journal_offset - self.journal_offset % 2)
+                content = f.read().decode("utf-16-le", errors="ignore")
+        except OSError:
+            return False
+        return " started" in content
+
+    def responding(self):
+        """False when every visible window of the process is hung, None when that cannot be told
+        (not on Windows, or no window yet)."""
+        if os.name != "nt" or not self.alive():
+            return None
+
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        windows = []
+
+        @ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+        def collect(hwnd, _):
+            pid = wintypes.DWORD()
+            user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+            if pid.value == self.process.pid and user32.IsWindowVisible(hwnd):
+                windows.append(hwnd)
+            return True
+
+        user32.EnumWindows(collect, 0)
+        if not windows:
+            return None
+        # Windows reports a window hung once it has not processed messages for 5 seconds
+        return not all(user32.IsHungAppWindow(hwnd) for hwnd in windows)
+
+    def stop(self):
+        if self.alive():
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            # hung terminals are out of the pinned pools too, see unavailable_terminals()
+            "state": "not_responding" if self.hung_since else self.state,
+            "pid": self.process.pid if self.alive() else None,
+            "ready_seconds": self.ready_seconds,
+            "hung_seconds": time.monotonic() - self.hung_since if self.hung_since else None,
+            "restarts": self.restarts,
+            "crashes": self.crashes
+        }
+
+
+class TerminalSupervisor:
+    """Launches, health-checks and restarts terminals, and tells the allocator which are usable."""
+
+    def __init__(self, terminal_numbers: list, ready_timeout: float = TERMINAL_READY_TIMEOUT):
+        self.terminals = [SupervisedTerminal(number) for number in terminal_numbers]
+        self.ready_timeout = ready_timeout
+        self.allocator = get_allocator()
+        self.ready_latency = Histogram()
+
+    def set_available(self, terminal: SupervisedTerminal, available: bool, reason: str = None):
+        try:
+            self.allocator.set_available(terminal.id, available, reason)
+        except Exception as e:
+            logger.warning(f"❌ Failed to mark terminal {terminal.id} {'available' if available else 'unavailable'}: {e}")
+
+    def fail(self, terminal: SupervisedTerminal, reason: str):
+        terminal.stop()
+        terminal.hung_since = None
+        terminal.crashes += 1
+        delay = min(TERMINAL_RESTART_MAX_DELAY, TERMINAL_RESTART_DELAY * 2 ** (terminal.crashes - 1))
+        terminal.state = "waiting"
+        terminal.restart_at = time.monotonic() + delay
+        self.set_available(terminal, False, reason)
+        logger.warning(f"⚠️ Terminal {terminal.id} {reason}, restarting in {delay}s")
+
+    def launch(self, terminal: SupervisedTerminal):
+        try:
+            terminal.launch()
+            logger.info(f"🚀 Terminal {terminal.id} launched")
+        except OSError as e:
+            self.fail(terminal, f"failed to launch: {e}")
+
+    def check(self, terminal: SupervisedTerminal):
+        now = time.monotonic()
+
+        if terminal.state in ("waiting", "external") and now >= terminal.restart_at:
+            external = terminal.state == "external"
+            if not external:
+                terminal.restarts += 1
+            self.launch(terminal)
+            if external and terminal.state == "starting":
+                # still counts as available while we find out whether the other instance is gone
+                terminal.state = "probing"
+            return True
+
+        if terminal.state in ("starting", "probing"):
+            if not terminal.alive() and terminal.process.returncode == 0:
+                # a clean immediate exit: another instance already runs this portable folder
+                if terminal.state == "starting":
+                    logger.info(f"♻️ Terminal {terminal.id} is already running outside the supervisor")
+                    self.set_available(terminal, True)
+                terminal.process = None
+                terminal.state = "external"
+                terminal.crashes = 0
+                terminal.restart_at = now + TERMINAL_EXTERNAL_PROBE_INTERVAL
+            elif not terminal.alive():
+                self.fail(terminal, f"exited while starting with code {terminal.process.returncode}")
+            elif terminal.started():
+                terminal.state = "ready"
+                terminal.crashes = 0
+                terminal.ready_seconds = now - terminal.launched_at
+                self.ready_latency.observe(terminal.ready_seconds)
+                self.set_available(terminal, True)
+                logger.success(f"🟢 Terminal {terminal.id} ready in {terminal.ready_seconds:.1f}s")
+            elif now - terminal.launched_at > self.ready_timeout:
+                self.fail(terminal, f"not ready after {self.ready_timeout:g}s")
+
+        elif terminal.state == "ready" and not terminal.alive():
+            self.fail(terminal, f"exited with code {terminal.process.returncode}")
+
+        elif terminal.state == "ready" and now >= terminal.probe_at:
+            terminal.probe_at = now + TERMINAL_LIVENESS_INTERVAL
+            self.probe(terminal, now)
+
+        return False
+
+    def probe(self, terminal: SupervisedTerminal, now: float):
+        if terminal.responding() is False:
+            if not terminal.hung_since:
+                # out of the pool at once, the restart waits in case it recovers
+                terminal.hung_since = now
+                self.set_available(terminal, False, "not responding")
+                logger.warning(f"⚠️ Terminal {terminal.id} is not responding")
+            elif now - terminal.hung_since >= TERMINAL_HUNG_TIMEOUT:
+                self.fail(terminal, f"not responding for {now - terminal.hung_since:.0f}s")
+        elif terminal.hung_since:
+            terminal.hung_since = None
+            self.set_available(terminal, True)
+            logger.success(f"🟢 Terminal {terminal.id} is responding again")
+
+    def start(self):
+        for terminal in self.terminals:
+            # out of the pool until it is ready
+            self.set_available(terminal, False, "starting")
+            self.launch(terminal)
+            time.sleep(TERMINAL_LAUNCH_SPACING)
+
+    def status(self):
+        return {
+            "terminals": [terminal.to_dict() for terminal in self.terminals],
+            "ready": sum(terminal.state in ("ready", "external", "probing") and not terminal.hung_since
+                         for terminal in self.terminals),
+            "ready_seconds": {
+                "count": self.ready_latency.count,
+                "sum": self.ready_latency.sum,
+                "p50": self.ready_latency.quantile(0.5),
+                "p90": self.ready_latency.quantile(0.9),
+                "p99": self.ready_latency.quantile(0.99)
+            }
+        }
+
+    def write_status(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.status(), f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def run(self, status_path: str = None):
+        self.start()
+        while True:
+            for terminal in self.terminals:
+                # restarts are spaced like the first launches
+                if self.check(terminal):
+                    time.sleep(TERMINAL_LAUNCH_SPACING)
+
+            if status_path:
+                try:
+                    self.write_status(status_path)
+                except OSError as e:
+                    logger.warning(f"❌ Failed to write terminal status to {status_path}: {e}")
+
+            time.sleep(SUPERVISOR_CHECK_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep MT5 terminals running and ready")
+    parser.add_argument("--terminals", default=f"1-{TERMINAL_COUNT}", help="e.g. 32, 1-32 or 1,2,5")
+    parser.add_argument("--ready-timeout", type=float, default=TERMINAL_READY_TIMEOUT,
+                        help="seconds a terminal may take to start before it is restarted")
+    parser.add_argument("--status-path", default=TERMINAL_STATUS_PATH,
+                        help="write the terminal states and time to ready here, pinned worker pools read it")
+    args = parser.parse_args()
+
+    supervisor = TerminalSupervisor(parse_terminal_range(args.terminals), args.ready_timeout)
+    try:
+        supervisor.run(args.status_path)
+    except KeyboardInterrupt:
+        # the terminals keep running, only the supervision stops
+        logger.info("👋 Supervisor stopped")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
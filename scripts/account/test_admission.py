@@ -0,0 +1,119 @@
+import os
+# AccountWorker builds a TerminalManager, which needs a MetaTrader5 backend
+os.environ.setdefault("MT5_BACKEND", "fake")
+
+from utils.admission import AdmissionQueue
+import worker
+from worker import AccountWorker
+import time
+import asyncio
+import unittest
+
+# The wait line in front of terminal allocation, and the worker's single time budget for it.
+#
+#   python -m pytest -q test_admission.py
+
+
+class Pool:
+    """A number of free slots; take() is AdmissionQueue's try_acquire."""
+
+    def __init__(self, free: int = 0):
+        self.free = free
+
+    async def take(self):
+        if self.free:
+            self.free -= 1
+            return True
+        return None
+
+
+class AdmissionQueueTest(unittest.TestCase):
+    def test_first_come_first_served(self):
+        async def run():
+            queue = AdmissionQueue(poll_interval=10)
+            pool = Pool()
+            order = []
+
+            async def request(name):
+                resource, _ = await queue.admit(pool.take, timeout=5)
+                order.append(name)
+
+            tasks = []
+            for name in "abc":
+                tasks.append(asyncio.create_task(request(name)))
+                await asyncio.sleep(0)
+
+            for _ in "abc":
+                pool.free += 1
+                queue.notify()
+                await asyncio.sleep(0.01)
+
+            await asyncio.gather(*tasks)
+            return order, queue.metrics()
+
+        order, metrics = asyncio.run(run())
+        self.assertEqual(order, ["a", "b", "c"])
+        self.assertEqual(metrics["admitted"], 3)
+        self.assertEqual(metrics["max_queue_depth"], 3)
+
+    def test_deadline(self):
+        async def run():
+            queue = AdmissionQueue(poll_interval=0.01)
+            started = time.monotonic()
+            resource, message = await queue.admit(Pool().take, timeout=0.1)
+            return resource, message, time.monotonic() - started, queue.metrics()
+
+        resource, message, waited, metrics = asyncio.run(run())
+        self.assertIsNone(resource)
+        self.assertEqual(message, "❌ No free terminals.")
+        self.assertLess(waited, 1)
+        self.assertEqual(metrics["timed_out"], 1)
+        self.assertEqual(metrics["queue_depth"], 0)
+
+    def test_max_length(self):
+        async def run():
+            queue = AdmissionQueue(max_length=2, poll_interval=10)
+            waiting = [asyncio.create_task(queue.admit(Pool().take, timeout=0.2)) for _ in range(2)]
+            await asyncio.sleep(0)
+            resource, message = await queue.admit(Pool().take, timeout=0.2)
+            await asyncio.gather(*waiting)
+            return resource, message, queue.metrics()
+
+        resource, message, metrics = asyncio.run(run())
+        self.assertIsNone(resource)
+        self.assertEqual(message, "❌ Too many requests waiting for a terminal.")
+        self.assertEqual(metrics["rejected"], 1)
+
+
+class WorkerBudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.timeout = worker.ADMISSION_TIMEOUT
+
+    def tearDown(self):
+        worker.ADMISSION_TIMEOUT = self.timeout
+
+    def test_default_timeout_covers_both_waits(self):
+        worker.ADMISSION_TIMEOUT = 0.3
+        timeouts = []
+
+        async def run():
+            account_worker = AccountWorker()
+
+            async def sync(login, password, server, start_date, end_date, timeout = None):
+                timeouts.append(timeout)
+                await asyncio.sleep(0.2)
+                return {"status": True}
+
+            account_worker.terminal_manager.close()
+            account_worker.terminal_manager.get_refined_account_data = sync
+            # the second request waits in line for the first, then gets what is left of 0.3s
+            return await asyncio.gather(*(account_worker.run_sync(1, "password", "Server") for _ in range(2)))
+
+        asyncio.run(run())
+        self.assertEqual(len(timeouts), 2)
+        self.assertAlmostEqual(timeouts[0], 0.3, delta=0.05)
+        self.assertAlmostEqual(timeouts[1], 0.1, delta=0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
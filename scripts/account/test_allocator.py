@@ -0,0 +1,145 @@
+from utils.allocator import LocalAllocator, LeaseHeartbeat, unavailable_terminals
+import os
+import json
+import time
+import tempfile
+import unittest
+
+# Terminal allocation through the local SQLite allocator.
+#
+#   python -m pytest -q test_allocator.py
+
+
+class LocalAllocatorTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.allocator = LocalAllocator(os.path.join(self.folder.name, "terminals.sqlite3"), terminal_count=3)
+
+    def tearDown(self):
+        self.allocator.connection.close()
+        self.folder.cleanup()
+
+    def allocate_all(self, holder: str = "holder", **kwargs):
+        terminals = []
+        while True:
+            terminal = self.allocator.allocate(holder, **kwargs)
+            if not terminal:
+                return terminals
+            terminals.append(terminal["id"])
+
+    def test_each_terminal_once(self):
+        self.assertEqual(sorted(self.allocate_all()), ["T1", "T2", "T3"])
+        self.assertIsNone(self.allocator.allocate("holder"))
+
+    def test_release_frees_the_terminal(self):
+        self.allocate_all()
+        self.assertTrue(self.allocator.release("T2"))
+        self.assertEqual(self.allocator.allocate("holder")["id"], "T2")
+
+    def test_least_recently_assigned_first(self):
+        self.allocate_all()
+        for terminal_id in ("T3", "T1", "T2"):
+            self.allocator.release(terminal_id)
+        # never-assigned terminals come first, then the one assigned longest ago
+        self.assertEqual(self.allocator.allocate("holder")["id"], "T1")
+
+    def test_two_allocators_share_the_file(self):
+        other = LocalAllocator(os.path.join(self.folder.name, "terminals.sqlite3"), terminal_count=3)
+        try:
+            ids = [self.allocator.allocate("a")["id"], other.allocate("b")["id"], self.allocator.allocate("a")["id"]]
+            self.assertEqual(sorted(ids), ["T1", "T2", "T3"])
+            self.assertIsNone(other.allocate("b"))
+        finally:
+            other.connection.close()
+
+    def test_expired_lease_is_reaped(self):
+        self.assertEqual(self.allocator.allocate("crashed", ttl=-1)["id"], "T1")
+        self.assertEqual(self.allocator.allocate("alive")["id"], "T2")
+
+        self.assertEqual(self.allocator.reap(), ["T1"])
+        self.assertFalse(self.allocator.renew("T1", "crashed"))
+        self.assertTrue(self.allocator.renew("T2", "alive"))
+
+    def test_expired_lease_can_be_taken_before_the_reaper(self):
+        for _ in range(3):
+            self.allocator.allocate("crashed", ttl=-1)
+        self.assertEqual(self.allocator.allocate("next")["id"], "T1")
+
+    def test_release_checks_the_holder(self):
+        self.allocator.allocate("a")
+        self.assertFalse(self.allocator.release("T1", "b"))
+        self.assertTrue(self.allocator.release("T1", "a"))
+
+    def test_renew_only_by_the_holder(self):
+        self.allocator.allocate("a", ttl=-1)
+        self.assertFalse(self.allocator.renew("T1", "b"))
+        self.assertTrue(self.allocator.renew("T1", "a"))
+        # renewed, so no longer expired
+        self.assertEqual(self.allocator.reap(), [])
+
+    def test_heartbeat_keeps_the_lease(self):
+        self.allocator.allocate("a", ttl=1)
+        heartbeat = LeaseHeartbeat(self.allocator, "T1", "a", ttl=1, interval=0.1).start()
+        try:
+            time.sleep(1.3)
+            self.assertEqual(self.allocator.reap(), [])
+        finally:
+            heartbeat.stop()
+
+    def test_prefers_terminal_warm_for_the_server(self):
+        for server in ("Alpha-Live", "Beta-Live", "Gamma-Live"):
+            self.allocator.allocate("holder", server=server)
+        self.allocate_all()
+        for terminal_id in ("T1", "T2", "T3"):
+            self.allocator.release(terminal_id)
+
+        # T2 served Beta-Live, it wins over T1 which was assigned longer ago
+        self.assertEqual(self.allocator.allocate("holder", server="Beta-Live")["id"], "T2")
+        # a server no terminal served falls back to the least recently assigned
+        self.assertEqual(self.allocator.allocate("holder", server="Delta-Live")["id"], "T1")
+
+    def test_warm_terminal_in_use_is_not_waited_for(self):
+        self.allocator.allocate("holder", server="Alpha-Live")
+        self.assertEqual(self.allocator.allocate("holder", server="Alpha-Live")["id"], "T2")
+
+    def test_unavailable_terminal_is_skipped(self):
+        self.allocator.set_available("T1", False, "crashed")
+        self.assertEqual(sorted(self.allocate_all()), ["T2", "T3"])
+
+        self.allocator.set_available("T1", True)
+        self.assertEqual(self.allocator.allocate("holder")["id"], "T1")
+
+
+class UnavailableTerminalsTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "terminals.json")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write_status(self, *states):
+        with open(self.path, "w") as f:
+            json.dump({"terminals": [{"id": f"T{i}", "state": state} for i, state in enumerate(states, 1)]}, f)
+
+    def test_not_ready_terminals(self):
+        self.write_status("ready", "external", "probing", "not_responding", "crashed")
+        self.assertEqual(unavailable_terminals(self.path), {"T4", "T5"})
+
+    def test_missing_or_stale_file_reports_none(self):
+        self.assertEqual(unavailable_terminals(self.path), set())
+
+        self.write_status("crashed")
+        stale = time.time() - 120
+        os.utime(self.path, (stale, stale))
+        # the supervisor is gone, so nothing is known to be down
+        self.assertEqual(unavailable_terminals(self.path, max_age=60), set())
+
+    def test_unreadable_file_reports_none(self):
+        with open(self.path, "w") as f:
+            f.write("{")
+        self.assertEqual(unavailable_terminals(self.path), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+from utils.retry import RetryPolicy, Deadline
+import asyncio
+import unittest
+
+# The shared retry policy every MetaTrader5 call goes through.
+#
+#   python -m pytest -q test_retry.py
+
+
+class Call:
+    """Answers the given results in order, then keeps answering the last one."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.results[min(self.calls, len(self.results)) - 1]
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.policy = RetryPolicy(attempts=3, base_delay=0.01, max_delay=0.02, jitter=0)
+
+    def run_policy(self, call, **kwargs):
+        return asyncio.run(self.policy.run(call, "test", **kwargs))
+
+    def test_retries_until_done(self):
+        call = Call(None, None, "ok")
+        self.assertEqual(self.run_policy(call), "ok")
+        self.assertEqual(call.calls, 3)
+
+    def test_gives_up_after_attempts(self):
+        call = Call(None)
+        self.assertIsNone(self.run_policy(call))
+        self.assertEqual(call.calls, 3)
+
+    def test_done_accepts_empty_answer(self):
+        # positions_get() answers () for an account without open positions
+        call = Call((), ("position",))
+        self.assertEqual(self.run_policy(call, done=lambda result: result is not None), ())
+        self.assertEqual(call.calls, 1)
+
+    def test_permanent_failure_is_not_retried(self):
+        call = Call(False)
+        self.assertFalse(self.run_policy(call, permanent=lambda result: True))
+        self.assertEqual(call.calls, 1)
+
+    def test_deadline_stops_retries(self):
+        call = Call(None)
+        self.assertIsNone(self.run_policy(call, deadline=Deadline(0)))
+        self.assertEqual(call.calls, 1)
+
+    def test_coroutine_call_and_on_retry(self):
+        calls = Call(None, "ok")
+        retries = []
+
+        async def call():
+            return calls()
+
+        self.assertEqual(self.run_policy(call, on_retry=retries.append), "ok")
+        self.assertEqual(retries, ["test"])
+
+    def test_delay_backs_off_up_to_max(self):
+        policy = RetryPolicy(base_delay=0.1, max_delay=0.5, multiplier=2, jitter=0)
+        self.assertEqual([policy.delay(attempt) for attempt in range(4)], [0.1, 0.2, 0.4, 0.5])
+
+        # jitter only ever shortens a delay
+        policy = RetryPolicy(base_delay=0.1, max_delay=0.5, jitter=0.5)
+        self.assertTrue(all(0.05 <= policy.delay(0) <= 0.1 for _ in range(100)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,280 @@
+from utils.terminal_manager import TRADE_DEAL_TYPES, TRADE_MODES, MARGIN_MODES, to_msc
+from utils.fake_mt5 import FakeMT5
+from utils.deal_store import DealStore
+from utils.equity_curve import EquityCurve
+from benchmark import new_manager, LOGIN, SERVER
+import os
+import math
+import asyncio
+import tempfile
+import unittest
+from collections import defaultdict
+from datetime import datetime, timezone
+from dateutil.relativedelta import relativedelta
+import numpy as np
+
+# The refined sync (deal store, columnar aggregation, batched symbol lookups) against the
+# plain per-deal computation it replaced, on a synthetic account (utils/fake_mt5.py).
+#
+#   python -m pytest -q test_sync.py
+
+def symbol_info(mt5: FakeMT5, symbol: str):
+    info = mt5.symbol_info(symbol)._asdict()
+    return {"trade_contract_size": info["trade_contract_size"], "digits": info["digits"]}
+
+
+def reference_closed_trades(mt5: FakeMT5, history_deals: list):
+    # one pass per position over the deal dicts, as get_closed_trades did before utils/deal_arrays.py
+    trades_by_position = defaultdict(list)
+    for d in history_deals:
+        if d["position_id"] > 0:
+            trades_by_position[d["position_id"]].append(d)
+
+    result = []
+    for position_id, deals in trades_by_position.items():
+        open_deals = [d for d in deals if d["entry"] == 0]
+        close_deals = [d for d in deals if d["entry"] == 1]
+        if not open_deals or not close_deals:
+            continue
+
+        total_open_vol = sum(d["volume"] for d in open_deals)
+        total_close_vol = sum(d["volume"] for d in close_deals) or total_open_vol
+        open_price = sum(d["price"] * d["volume"] for d in open_deals) / total_open_vol
+        close_price = sum(d["price"] * d["volume"] for d in close_deals) / total_close_vol
+        commission = sum(d["commission"] for d in deals)
+        swap = sum(d["swap"] for d in deals)
+        fee = sum(d["fee"] for d in deals)
+        profit = sum(d["profit"] for d in deals) + swap + commission + fee
+
+        open_time = datetime.fromtimestamp(min(d["time_msc"] for d in open_deals) / 1000.0, tz=timezone.utc)
+        close_time = datetime.fromtimestamp(max(d["time_msc"] for d in close_deals) / 1000.0, tz=timezone.utc)
+        direction = TRADE_DEAL_TYPES.get(open_deals[0]["type"], "UNKNOWN")
+        info = symbol_info(mt5, open_deals[0]["symbol"])
+        contract_size = info["trade_contract_size"]
+
+        price_diff = close_price - open_price if direction == "BUY" else open_price - close_price
+        notional = open_price * total_open_vol * contract_size
+
+        result.append({
+            "trade_id": str(position_id),
+            "symbol": open_deals[0]["symbol"],
+            "type": direction,
+            "volume": total_open_vol,
+            "entry": open_deals[0]["entry"],
+            "magic": open_deals[0]["magic"],
+            "reason": open_deals[0]["reason"],
+            "commission": commission,
+            "swap": swap,
+            "fee": fee,
+            "profit": profit,
+            "open_time": open_time.isoformat(),
+            "close_time": close_time.isoformat(),
+            "open_price": open_price,
+            "close_price": close_price,
+            "market_value": price_diff * total_open_vol * contract_size,
+            "pips": round(price_diff * 10 ** max(info["digits"] - 1, 0), 2),
+            "gain": profit / notional * 100 if notional > 0 else 0.0,
+            "change_percent": profit / notional * 100 if notional else 0.0,
+            "duration_in_minutes": round((close_time - open_time).total_seconds() / 60.0),
+            "success": "won" if profit > 0 else "lost"
+        })
+
+    return result
+
+
+def reference_open_trades(mt5: FakeMT5):
+    result = []
+    for position in mt5.positions_get():
+        p = position._asdict()
+        notional = p["volume"] * symbol_info(mt5, p["symbol"])["trade_contract_size"] * p["price_open"]
+        result.append({
+            "trade_id": str(p["identifier"]),
+            "symbol": p["symbol"],
+            "volume": p["volume"],
+            "magic": p["magic"],
+            "reason": p["reason"],
+            "swap": p["swap"],
+            "open_time": datetime.fromtimestamp(p["time_msc"] / 1000, tz=timezone.utc).isoformat(),
+            "open_price": p["price_open"],
+            "market_value": p["price_current"],
+            "profit": p["profit"],
+            "stop_loss": p["sl"],
+            "take_profit": p["tp"],
+            "change_percent": p["profit"] / notional * 100 if notional else 0.0,
+            "gain": p["profit"] / (p["price_open"] * p["volume"]) * 100 if p["price_open"] > 0 else 0,
+            "type": "BUY" if p["type"] == 0 else "SELL",
+            "success": "won" if p["profit"] > 0 else "lost"
+        })
+    return result
+
+
+def reference_account_info(mt5: FakeMT5, open_trades: list, closed_trades: list, balance_trades: list):
+    info = mt5.account_info()._asdict()
+    deposits = sum(t["profit"] for t in balance_trades if t["profit"] >= 0)
+    withdrawals = sum(t["profit"] for t in balance_trades if t["profit"] < 0)
+    trades = closed_trades + open_trades
+    winning_trades = [t for t in trades if t["profit"] > 0]
+
+    return {
+        **{key: info[key] for key in ("balance", "leverage", "login", "currency", "equity", "margin",
+                                      "margin_free", "margin_level", "credit", "name", "company")},
+        "trade_mode": TRADE_MODES.get(info["trade_mode"], info["trade_mode"]),
+        "margin_mode": MARGIN_MODES.get(info["margin_mode"], info["margin_mode"]),
+        "swap": sum(t["swap"] for t in trades),
+        "profit": (info["balance"] - withdrawals) - deposits,
+        "gain": sum(t["gain"] for t in closed_trades) / len(closed_trades) if closed_trades else 0,
+        "deposits": deposits,
+        "withdrawals": withdrawals,
+        "trades": len(trades),
+        "average_win": sum(t["profit"] for t in winning_trades) / len(winning_trades) if winning_trades else 0,
+        "won_trades_percent": len(winning_trades) / len(trades) * 100 if trades else 0,
+        "pips": round(sum(t["pips"] for t in closed_trades) / 1000, 2)
+    }
+
+
+class RefinedSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.mt5 = FakeMT5(deals=4000, positions=20, symbols=8, years=2)
+        self.terminal_manager = new_manager(self.mt5, self.folder.name)
+        # the whole synthetic history, so the reference and the sync see the same deals
+        self.end_date = datetime.now() + relativedelta(days=1)
+        self.start_date = self.end_date - relativedelta(years=3)
+
+    def tearDown(self):
+        self.terminal_manager.close()
+        self.folder.cleanup()
+
+    def sync(self, terminal_manager = None):
+        data = asyncio.run((terminal_manager or self.terminal_manager).get_refined_account_data(
+            LOGIN, "password", SERVER, self.start_date, self.end_date, terminal_number=1))
+        self.assertTrue(data.get("status"), data)
+        return data["data"]
+
+    def reference(self):
+        self.mt5.initialize(login=LOGIN, server=SERVER)
+        try:
+            history_deals = [d._asdict() for d in self.mt5.history_deals_get(self.start_date, self.end_date)]
+            balance_trades = [d for d in history_deals if d["type"] == 2]
+            closed_trades = reference_closed_trades(self.mt5, history_deals)
+            open_trades = reference_open_trades(self.mt5)
+            account_info = reference_account_info(self.mt5, open_trades, closed_trades, balance_trades)
+        finally:
+            self.mt5.shutdown()
+        return balance_trades, closed_trades, open_trades, account_info
+
+    def assertRecordsEqual(self, actual: list, expected: list, key: str, ignore = ()):
+        self.assertEqual(len(actual), len(expected))
+        actual = {record[key]: record for record in actual}
+        for record in expected:
+            self.assertIn(record[key], actual)
+            self.assertMatches(actual[record[key]], record, ignore)
+
+    def assertMatches(self, actual: dict, expected: dict, ignore = ()):
+        for field, value in expected.items():
+            if field in ignore:
+                continue
+            if isinstance(value, float):
+                self.assertTrue(math.isclose(actual[field], value, rel_tol=1e-9, abs_tol=1e-9),
+                                f"{field}: {actual[field]} != {value}")
+            else:
+                self.assertEqual(actual[field], value, field)
+
+    def check(self, data: dict):
+        balance_trades, closed_trades, open_trades, account_info = self.reference()
+
+        self.assertRecordsEqual(data["balance_trades"], balance_trades, "ticket")
+        self.assertRecordsEqual(data["closed_trades"], closed_trades, "trade_id")
+        # an open trade's duration runs on the clock
+        self.assertRecordsEqual(data["open_trades"], open_trades, "trade_id")
+        self.assertMatches(data["account_info"], account_info)
+
+    def test_matches_reference(self):
+        self.check(self.sync())
+
+    def test_warm_sync_matches_reference(self):
+        # the second sync reads what the first one stored, plus the cached deal array
+        self.sync()
+        self.check(self.sync())
+
+    def test_backfill_through_another_manager(self):
+        # a recent window first, then the full one through a second manager on the same store:
+        # the first manager must not serve the deal array it cached before the backfill
+        start_date = self.start_date
+        self.start_date = self.end_date - relativedelta(months=2)
+        self.sync()
+
+        self.start_date = start_date
+        other = new_manager(self.mt5, self.folder.name)
+        self.sync(other)
+        other.close()
+
+        _, closed_trades, _, _ = self.reference()
+        deal_array = self.terminal_manager.deal_store.array(LOGIN, SERVER, to_msc(self.start_date), to_msc(self.end_date))
+        self.assertRecordsEqual(asyncio.run(self.terminal_manager.get_closed_trades(deal_array=deal_array)),
+                                closed_trades, "trade_id")
+        self.check(self.sync())
+
+    def test_invalid_window_fails_before_login(self):
+        for start_date, end_date in (("not a date", None), (self.end_date, self.start_date)):
+            data = asyncio.run(self.terminal_manager.get_refined_account_data(
+                LOGIN, "password", SERVER, start_date, end_date, terminal_number=1))
+            self.assertFalse(data["status"])
+        self.assertNotIn("initialize", self.mt5.calls)
+
+    def test_timezone_aware_dates(self):
+        # toISOString() from the API
+        self.start_date = self.start_date.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+        self.sync()
+
+
+class EquityCurveTest(unittest.TestCase):
+    def deals(self, rows: list):
+        # rows of (type, profit), one a day
+        deals = np.zeros(len(rows), dtype=[("ticket", "i8"), ("time_msc", "i8"), ("type", "i8"), ("profit", "f8"),
+                                           ("commission", "f8"), ("swap", "f8"), ("fee", "f8")])
+        deals["ticket"] = np.arange(1, len(rows) + 1)
+        deals["time_msc"] = np.arange(len(rows)) * 24 * 3600 * 1000
+        deals["type"] = [deal_type for deal_type, _ in rows]
+        deals["profit"] = [profit for _, profit in rows]
+        return deals
+
+    def test_extend_from_checkpoint_equals_rebuild(self):
+        mt5 = FakeMT5(deals=4000, positions=0, symbols=8)
+        mt5.initialize(login=LOGIN, server=SERVER)
+        history_deals = [d._asdict() for d in mt5.history_deals_get(datetime(2000, 1, 1), datetime.now() + relativedelta(days=1))]
+
+        with tempfile.TemporaryDirectory() as folder:
+            store = DealStore(os.path.join(folder, "deals.sqlite3"))
+            store.merge(LOGIN, SERVER, history_deals)
+            deals, _ = store.array(LOGIN, SERVER)
+
+            for interval in (None, "hour", "day"):
+                rebuilt = EquityCurve(interval)
+                rebuilt.extend(deals)
+
+                name = f"equity_curve:{interval}"
+                for split in (len(deals) // 3, 2 * len(deals) // 3, len(deals)):
+                    # every part resumes from the previous part's checkpoint and stored points, as across syncs
+                    curve = EquityCurve(interval, store.checkpoint(LOGIN, SERVER, name))
+                    self.assertTrue(curve.matches(deals[:split]))
+                    curve.extend(deals[:split])
+                    store.save_checkpoint(LOGIN, SERVER, name, curve.to_state(), curve.points, curve.points_from)
+
+                self.assertEqual(store.checkpoint(LOGIN, SERVER, name), rebuilt.to_state(), interval)
+                self.assertEqual(store.checkpoint_points(LOGIN, SERVER, name), rebuilt.points, interval)
+                self.assertNotIn("points", rebuilt.to_state())
+
+    def test_withdrawal_is_not_drawdown(self):
+        curve = EquityCurve()
+        curve.extend(self.deals([(2, 1000.0), (0, 100.0), (2, -900.0)]))
+        self.assertEqual(curve.max_drawdown, 0.0)
+
+        curve.extend(self.deals([(2, 1000.0), (0, 100.0), (2, -900.0), (0, -70.0), (2, 500.0)]))
+        # a trading loss of 70 from a peak of 200, the deposit after it does not hide it
+        self.assertEqual(curve.max_drawdown, 70.0)
+        self.assertAlmostEqual(curve.max_drawdown_percent, 35.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
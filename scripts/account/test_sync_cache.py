@@ -0,0 +1,91 @@
+from utils.sync_cache import SyncCache, sync_key
+import asyncio
+import unittest
+
+# Single-flight deduplication and the short-lived result cache in front of the sync.
+#
+#   python -m pytest -q test_sync_cache.py
+
+
+class Sync:
+    """Counts its runs; each run answers `result` after a short wait."""
+
+    def __init__(self, result: dict = None, delay: float = 0.05):
+        self.result = result or {"status": True, "data": {}}
+        self.delay = delay
+        self.runs = 0
+
+    async def __call__(self):
+        self.runs += 1
+        await asyncio.sleep(self.delay)
+        return {**self.result, "run": self.runs}
+
+
+class SyncCacheTest(unittest.TestCase):
+    def test_concurrent_requests_share_one_sync(self):
+        async def run():
+            cache = SyncCache(ttl=10)
+            sync = Sync()
+            results = await asyncio.gather(*(cache.run("key", sync) for _ in range(5)))
+            return sync.runs, results, cache.metrics()
+
+        runs, results, metrics = asyncio.run(run())
+        self.assertEqual(runs, 1)
+        self.assertTrue(all(result["run"] == 1 for result in results))
+        self.assertEqual(metrics["shared"], 4)
+        self.assertEqual(metrics["in_flight"], 0)
+
+    def test_result_is_cached_until_ttl(self):
+        async def run():
+            cache = SyncCache(ttl=0.1)
+            sync = Sync(delay=0)
+            await cache.run("key", sync)
+            await cache.run("key", sync)
+            cached_runs = sync.runs
+            await asyncio.sleep(0.15)
+            await cache.run("key", sync)
+            return cached_runs, sync.runs, cache.metrics()
+
+        cached_runs, runs, metrics = asyncio.run(run())
+        self.assertEqual(cached_runs, 1)
+        self.assertEqual(runs, 2)
+        self.assertEqual(metrics["hits"], 1)
+
+    def test_failures_are_not_cached(self):
+        async def run():
+            cache = SyncCache(ttl=10)
+            sync = Sync({"status": False, "message": "❌ No free terminals."})
+            shared = await asyncio.gather(cache.run("key", sync), cache.run("key", sync))
+            await cache.run("key", sync)
+            return shared, sync.runs
+
+        shared, runs = asyncio.run(run())
+        # shared with the request already waiting, then tried again
+        self.assertEqual([result["run"] for result in shared], [1, 1])
+        self.assertEqual(runs, 2)
+
+    def test_fresh_skips_cache_and_in_flight(self):
+        async def run():
+            cache = SyncCache(ttl=10)
+            sync = Sync()
+            first = asyncio.ensure_future(cache.run("key", sync))
+            await asyncio.sleep(0)
+            fresh = await cache.run("key", sync, fresh=True)
+            await first
+            # the fresh result is the one cached now
+            return fresh, await cache.run("key", sync), sync.runs
+
+        fresh, cached, runs = asyncio.run(run())
+        self.assertEqual(runs, 2)
+        self.assertEqual(cached["run"], fresh["run"])
+
+    def test_key_depends_on_credentials_and_options(self):
+        key = sync_key(1, "password", "Server", None, None, ["account"])
+        self.assertEqual(key, sync_key(1, "password", "Server", None, None, ["account"]))
+        self.assertNotEqual(key, sync_key(1, "other", "Server", None, None, ["account"]))
+        self.assertNotEqual(key, sync_key(1, "password", "Server", None, None, ["open_trades"]))
+        self.assertNotIn("password", str(key))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+from utils.trade_stats import TradeStats
+import json
+import unittest
+
+# Account statistics and risk metrics over a handful of hand-made trades.
+#
+#   python -m pytest -q test_trade_stats.py
+
+
+def closed(symbol, magic, profit, swap=0.0, volume=0.1, pips=0.0, gain=0.0):
+    return {"symbol": symbol, "magic": magic, "profit": profit, "swap": swap, "volume": volume, "pips": pips,
+            "gain": gain}
+
+
+class TradeStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.closed_trades = [
+            closed("EURUSD", 0, 100.0, swap=-1.0, pips=120, gain=2.0),
+            closed("EURUSD", 1001, -50.0, pips=-60, gain=-1.0),
+            closed("XAUUSD", 1001, 30.0, volume=1.0, pips=40, gain=0.5),
+            closed("XAUUSD", 1001, -20.0, swap=-2.0, pips=-25, gain=-0.5),
+            closed("XAUUSD", 0, 0.0)
+        ]
+        self.open_trades = [{"profit": 15.0, "swap": -0.5}, {"profit": -5.0, "swap": 0.0}]
+        self.balance_trades = [{"profit": 1000.0}, {"profit": -200.0}, {"profit": 50.0}]
+        self.stats = TradeStats.collect(self.closed_trades, self.open_trades, self.balance_trades).result()
+
+    def test_totals(self):
+        self.assertEqual(self.stats["trades"], 7)
+        self.assertEqual(self.stats["deposits"], 1050.0)
+        self.assertEqual(self.stats["withdrawals"], -200.0)
+        self.assertEqual(self.stats["swap"], -3.5)
+        # 100, 30 and the open 15
+        self.assertAlmostEqual(self.stats["average_win"], 145.0 / 3)
+        self.assertAlmostEqual(self.stats["won_trades_percent"], 3 / 7 * 100)
+        self.assertEqual(self.stats["pips"], 0.07)
+        self.assertAlmostEqual(self.stats["gain"], 1.0 / 5)
+
+    def test_risk_metrics(self):
+        # closed trades only: 130 won, 70 lost, the flat trade counts for expectancy alone
+        self.assertAlmostEqual(self.stats["profit_factor"], 130.0 / 70.0)
+        self.assertAlmostEqual(self.stats["expectancy"], 60.0 / 5)
+        self.assertAlmostEqual(self.stats["average_loss"], -35.0)
+        self.assertEqual(self.stats["largest_win"], 100.0)
+        self.assertEqual(self.stats["largest_loss"], -50.0)
+
+    def test_no_losses(self):
+        stats = TradeStats.collect([closed("EURUSD", 0, 10.0)], [], []).result()
+        self.assertIsNone(stats["profit_factor"])
+        self.assertEqual(stats["average_loss"], 0)
+        self.assertEqual(stats["largest_loss"], 0.0)
+
+    def test_breakdowns(self):
+        self.assertEqual(self.stats["by_symbol"]["EURUSD"], {
+            "trades": 2, "won": 1, "profit": 50.0, "swap": -1.0, "volume": 0.2, "pips": 60.0})
+        self.assertEqual(self.stats["by_symbol"]["XAUUSD"]["trades"], 3)
+        self.assertAlmostEqual(self.stats["by_symbol"]["XAUUSD"]["volume"], 1.2)
+
+        # keyed by string, the same before and after a JSON round trip
+        self.assertEqual(set(self.stats["by_magic"]), {"0", "1001"})
+        self.assertEqual(self.stats["by_magic"]["1001"]["trades"], 3)
+        self.assertEqual(self.stats["by_magic"]["1001"]["profit"], -40.0)
+        self.assertEqual(json.loads(json.dumps(self.stats["by_magic"])), self.stats["by_magic"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import time
+import asyncio
+from collections import deque
+
+# longest a request waits for a terminal before we answer "No free terminals"
+ADMISSION_TIMEOUT = 30
+# requests allowed to wait at once, later ones are turned away straight away
+ADMISSION_MAX_QUEUE = 64
+# how often the request at the head of the line asks the allocator again
+ADMISSION_POLL_INTERVAL = 1
+
+
+class AdmissionQueue:
+    """Fair FIFO line in front of terminal allocation.
+
+    Only the request at the head tries to acquire. It retries whenever notify() reports
+    a release in this process, and every poll_interval for releases elsewhere. Each
+    request gives up at its own deadline, and the line has a maximum length for
+    backpressure.
+    """
+
+    def __init__(self, max_length: int = ADMISSION_MAX_QUEUE, poll_interval: float = ADMISSION_POLL_INTERVAL):
+        self.max_length = max_length
+        self.poll_interval = poll_interval
+        self.waiters = deque()
+
+        self.max_depth = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def notify(self):
+        if self.waiters:
+            self.waiters[0].set()
+
+    async def admit(self, try_acquire, timeout: float = None):
+        """Wait in line until try_acquire() returns something truthy.
+
+        Returns (resource, None) or (None, message) when the line is full or the deadline passed.
+        """
+        started = time.monotonic()
+        deadline = started + (ADMISSION_TIMEOUT if timeout is None else timeout)
+
+        if len(self.waiters) >= self.max_length:
+            self.rejected += 1
+            return None, "❌ Too many requests waiting for a terminal."
+
+        waiter = asyncio.Event()
+        self.waiters.append(waiter)
+        self.max_depth = max(self.max_depth, len(self.waiters))
+
+        try:
+            while True:
+                # cleared before trying, so a release during try_acquire still wakes us
+                waiter.clear()
+                head = self.waiters[0] is waiter
+                if head:
+                    resource = await try_acquire()
+                    if resource:
+                        waited = time.monotonic() - started
+                        self.admitted += 1
+                        self.total_wait += waited
+                        self.max_wait = max(self.max_wait, waited)
+                        return resource, None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timed_out += 1
+                    return None, "❌ No free terminals."
+
+                try:
+                    await asyncio.wait_for(waiter.wait(), min(remaining, self.poll_interval) if head else remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            head = self.waiters[0] is waiter
+            self.waiters.remove(waiter)
+            if head:
+                # the next request in line tries straight away
+                self.notify()
+
+    def metrics(self):
+        return {
+            "queue_depth": len(self.waiters),
+            "max_queue_depth": self.max_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "average_wait_seconds": self.total_wait / self.admitted if self.admitted else 0,
+            "max_wait_seconds": self.max_wait
+        }
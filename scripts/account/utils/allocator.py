@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from loguru import logger
+
+# supabase: the mt5_terminals table and allocate_free_mt5_terminal rpc
+# local: a SQLite copy of the same table on this VPS, no network round-trip
+TERMINAL_ALLOCATOR = os.getenv("TERMINAL_ALLOCATOR", "supabase")
+TERMINAL_DB_PATH = os.getenv("TERMINAL_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "terminals.sqlite3"))
+TERMINALS_FOLDER = r"C:\MQ45\Terminals"
+TERMINAL_COUNT = 32
+
+# seconds a terminal stays ours without a heartbeat, after that the reaper takes it back
+TERMINAL_LEASE_TTL = 120
+TERMINAL_HEARTBEAT_INTERVAL = TERMINAL_LEASE_TTL / 3
+
+# terminal states written by supervisor.py, for pools pinned to terminals that bypass the allocator
+TERMINAL_STATUS_PATH = os.getenv("TERMINAL_STATUS_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "terminals.json"))
+# an older status file means the supervisor is gone, and its view of the terminals with it
+TERMINAL_STATUS_MAX_AGE = 60
+
+# a terminal that served a broker server this recently still has its Bases/<server> cache warm
+TERMINAL_SERVER_AFFINITY_DAYS = 7
+
+
+def new_holder_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def unavailable_terminals(path: str = TERMINAL_STATUS_PATH, max_age: float = TERMINAL_STATUS_MAX_AGE):
+    """Ids of the terminals the supervisor reports as not ready, empty without a recent status file."""
+    try:
+        if time.time() - os.path.getmtime(path) > max_age:
+            return set()
+        with open(path) as f:
+            status = json.load(f)
+    except (OSError, ValueError):
+        return set()
+
+    return {terminal["id"] for terminal in status.get("terminals", []) if terminal.get("state") not in ("ready", "external", "probing")}
+
+
+class TerminalAllocator:
+    """Leases free terminals one caller at a time, like allocate_free_mt5_terminal.
+
+    A lease belongs to a holder id and expires after ttl seconds unless renewed, so
+    terminals held by a crashed process go back to the pool. Terminals remember the
+    broker servers they served, and a free terminal already warm for the requested
+    server is preferred over the least recently assigned one. Terminals the supervisor
+    marked unavailable (crashed or not ready) are never handed out.
+    """
+
+    def allocate(self, holder: str, ttl: int = TERMINAL_LEASE_TTL, server: str = None):
+        """Lease a free (or expired) terminal, {"id", "path"} or None.
+
+        Prefers a terminal warm for server, then the least recently assigned.
+        """
+        raise NotImplementedError
+
+    def renew(self, terminal_id: str, holder: str, ttl: int = TERMINAL_LEASE_TTL):
+        """Extend the lease, False if the holder no longer owns the terminal."""
+        raise NotImplementedError
+
+    def release(self, terminal_id: str, holder: str = None):
+        """Return the terminal to the pool, True if it was found (and held by holder)."""
+        raise NotImplementedError
+
+    def reap(self):
+        """Free every terminal whose lease expired, returns their ids."""
+        raise NotImplementedError
+
+    def set_available(self, terminal_id: str, available: bool, reason: str = None):
+        """Take a terminal out of (or back into) allocation, reason says why it is out."""
+        raise NotImplementedError
+
+
+class SupabaseAllocator(TerminalAllocator):
+    def __init__(self):
+        # only the supabase backend pays for the client import and setup
+        from utils.database import supabase
+        self.supabase = supabase
+
+    def allocate(self, holder: str, ttl: int = TERMINAL_LEASE_TTL, server: str = None):
+        response = (
+            self.supabase.rpc("allocate_free_mt5_terminal", {
+                "p_holder": holder,
+                "p_lease_seconds": ttl,
+                "p_server": server
+            })
+            .execute()
+        )
+
+        terminals = response.data
+        if not len(terminals):
+            return None
+
+        return {
+            "id": terminals[0].get("id"),
+            "path": terminals[0].get("path")
+        }
+
+    def renew(self, terminal_id: str, holder: str, ttl: int = TERMINAL_LEASE_TTL):
+        response = (
+            self.supabase.rpc("renew_mt5_terminal_lease", {
+                "p_id": terminal_id,
+                "p_holder": holder,
+                "p_lease_seconds": ttl
+            })
+            .execute()
+        )
+
+        return bool(response.data)
+
+    def release(self, terminal_id: str, holder: str = None):
+        query = (
+            self.supabase.table("mt5_terminals")
+            .update({"in_use": False, "holder": None, "lease_expires_at": None})
+            .eq("id", terminal_id)
+        )
+        if holder:
+            query = query.eq("holder", holder)
+
+        response = query.execute()
+        return bool(len(response.data))
+
+    def reap(self):
+        response = (
+            self.supabase.rpc("reap_expired_mt5_terminals")
+            .execute()
+        )
+
+        return [row.get("id") for row in response.data or []]
+
+    def set_available(self, terminal_id: str, available: bool, reason: str = None):
+        (
+            self.supabase.table("mt5_terminals")
+            .update({
+                "available": available,
+                "unavailable_reason": None if available else reason,
+                "health_checked_at": datetime.now(timezone.utc).isoformat()
+            })
+            .eq("id", terminal_id)
+            .execute()
+        )
+
+
+class LocalAllocator(TerminalAllocator):
+    def __init__(self, path: str = TERMINAL_DB_PATH, terminal_count: int = TERMINAL_COUNT):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # autocommit, transactions are opened explicitly below; the heartbeat thread shares the connection
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.connection.execute("pragma journal_mode=wal")
+        self.connection.execute("""
+            create table if not exists mt5_terminals (
+              id text primary key,
+              path text not null,
+              in_use integer not null default 0,
+              last_assigned text,
+              holder text,
+              lease_expires_at text,
+              available integer not null default 1,
+              unavailable_reason text,
+              health_checked_at text
+            )
+        """)
+        self.connection.execute("""
+            create table if not exists mt5_terminal_servers (
+              terminal_id text not null,
+              server text not null,
+              last_served text not null,
+              primary key (terminal_id, server)
+            )
+        """)
+        columns = [row[1] for row in self.connection.execute("pragma table_info(mt5_terminals)")]
+        for column in ["holder", "lease_expires_at", "unavailable_reason", "health_checked_at"]:
+            if column not in columns:
+                self.connection.execute(f"alter table mt5_terminals add column {column} text")
+        if "available" not in columns:
+            self.connection.execute("alter table mt5_terminals add column available integer not null default 1")
+
+        self.connection.executemany(
+            "insert or ignore into mt5_terminals (id, path, in_use) values (?, ?, 0)",
+            [(f"T{i}", f"{TERMINALS_FOLDER}\\T{i}\\terminal64.exe") for i in range(1, terminal_count + 1)]
+        )
+
+    def allocate(self, holder: str, ttl: int = TERMINAL_LEASE_TTL, server: str = None):
+        now = datetime.now(timezone.utc)
+        warm_since = (now - timedelta(days=TERMINAL_SERVER_AFFINITY_DAYS)).isoformat()
+
+        with self.lock:
+            # begin immediate takes the write lock up front, so two processes can never pick
+            # the same row, the local equivalent of "for update skip locked"
+            self.connection.execute("begin immediate")
+            try:
+                term = self.connection.execute("""
+                    select t.id, t.path from mt5_terminals t
+                    left join mt5_terminal_servers s
+                      on s.terminal_id = t.id and s.server = ? and s.last_served >= ?
+                    where (t.in_use = 0 or t.lease_expires_at < ?) and t.available = 1
+                    order by s.server is null, t.last_assigned is not null, t.last_assigned
+                    limit 1
+                """, (server, warm_since, now.isoformat())).fetchone()
+
+                if term:
+                    self.connection.execute("""
+                        update mt5_terminals
+                        set in_use = 1, last_assigned = ?, holder = ?, lease_expires_at = ?
+                        where id = ?
+                    """, (now.isoformat(), holder, (now + timedelta(seconds=ttl)).isoformat(), term[0]))
+                    if server:
+                        self.connection.execute("""
+                            insert into mt5_terminal_servers (terminal_id, server, last_served) values (?, ?, ?)
+                            on conflict (terminal_id, server) do update set last_served = excluded.last_served
+                        """, (term[0], server, now.isoformat()))
+                self.connection.execute("commit")
+            except Exception:
+                self.connection.execute("rollback")
+                raise
+
+        if not term:
+            return None
+
+        return {
+            "id": term[0],
+            "path": term[1]
+        }
+
+    def renew(self, terminal_id: str, holder: str, ttl: int = TERMINAL_LEASE_TTL):
+        expires_at = (datetime.now(timezone.utc) + timedelta(seconds=ttl)).isoformat()
+        with self.lock:
+            cursor = self.connection.execute(
+                "update mt5_terminals set lease_expires_at = ? where id = ? and holder = ? and in_use = 1",
+                (expires_at, terminal_id, holder)
+            )
+        return cursor.rowcount > 0
+
+    def release(self, terminal_id: str, holder: str = None):
+        with self.lock:
+            cursor = self.connection.execute("""
+                update mt5_terminals set in_use = 0, holder = null, lease_expires_at = null
+                where id = ? and (? is null or holder = ?)
+            """, (terminal_id, holder, holder))
+        return cursor.rowcount > 0
+
+    def reap(self):
+        now = datetime.now(timezone.utc).isoformat()
+        with self.lock:
+            rows = self.connection.execute(
+                "select id from mt5_terminals where in_use = 1 and lease_expires_at < ?", (now,)
+            ).fetchall()
+            self.connection.execute("""
+                update mt5_terminals set in_use = 0, holder = null, lease_expires_at = null
+                where in_use = 1 and lease_expires_at < ?
+            """, (now,))
+        return [row[0] for row in rows]
+
+    def set_available(self, terminal_id: str, available: bool, reason: str = None):
+        with self.lock:
+            self.connection.execute("""
+                update mt5_terminals set available = ?, unavailable_reason = ?, health_checked_at = ?
+                where id = ?
+            """, (int(available), None if available else reason, datetime.now(timezone.utc).isoformat(), terminal_id))
+
+
+class LeaseHeartbeat:
+    """Renews a terminal lease from a background thread while a sync runs.
+
+    A thread keeps renewing even while a blocking MetaTrader5 call holds the event loop.
+    """
+
+    def __init__(self, allocator: TerminalAllocator, terminal_id: str, holder: str,
+                 ttl: int = TERMINAL_LEASE_TTL, interval: float = TERMINAL_HEARTBEAT_INTERVAL):
+        self.allocator = allocator
+        self.terminal_id = terminal_id
+        self.holder = holder
+        self.ttl = ttl
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                if not self.allocator.renew(self.terminal_id, self.holder, self.ttl):
+                    logger.warning(f"⚠️ Lost the lease on terminal {self.terminal_id}")
+                    return
+            except Exception as e:
+                logger.warning(f"❌ Failed to renew lease on terminal {self.terminal_id}: {e}")
+
+    def stop(self):
+        self.stopped.set()
+
+
+_allocator = None
+
+
+def get_allocator():
+    global _allocator
+    if _allocator is None:
+        _allocator = LocalAllocator() if TERMINAL_ALLOCATOR == "local" else SupabaseAllocator()
+    return _allocator
@@ -0,0 +1,148 @@
+from operator import attrgetter, itemgetter
+import numpy as np
+
+# columns of a history deal that closed-trade reconstruction needs
+DEAL_FIELDS = [
+    "ticket", "time_msc", "type", "position_id", "entry", "magic", "reason", "symbol",
+    "volume", "price", "commission", "swap", "fee", "profit"
+]
+DEAL_DTYPE = np.dtype([
+    ("ticket", np.int64),
+    ("time_msc", np.int64),
+    ("type", np.int64),
+    ("position_id", np.int64),
+    ("entry", np.int64),
+    ("magic", np.int64),
+    ("reason", np.int64),
+    ("symbol", np.int64),  # index into the symbols list kept next to the array
+    ("volume", np.float64),
+    ("price", np.float64),
+    ("commission", np.float64),
+    ("swap", np.float64),
+    ("fee", np.float64),
+    ("profit", np.float64)
+])
+
+
+def deals_to_array(deals, symbols: list = None):
+    """Build a DEAL_DTYPE array, one column at a time.
+
+    deals may be history_deals_get() output, its _asdict() dicts or plain tuples in
+    DEAL_FIELDS order. Returns (array, symbols) where array["symbol"] indexes into
+    symbols; pass an existing symbols list to extend it instead of starting a new one.
+    """
+    symbols = list(symbols or [])
+    array = np.empty(len(deals), dtype=DEAL_DTYPE)
+    if not len(deals):
+        return array, symbols
+
+    first = deals[0]
+    if isinstance(first, dict):
+        getters = [itemgetter(name) for name in DEAL_FIELDS]
+    elif hasattr(first, "_fields"):
+        getters = [attrgetter(name) for name in DEAL_FIELDS]
+    else:
+        getters = [itemgetter(index) for index in range(len(DEAL_FIELDS))]
+
+    codes = {symbol: index for index, symbol in enumerate(symbols)}
+
+    def code(symbol):
+        index = codes.get(symbol)
+        if index is None:
+            index = codes[symbol] = len(symbols)
+            symbols.append(symbol)
+        return index
+
+    for name, getter in zip(DEAL_FIELDS, getters):
+        values = map(getter, deals)
+        if name == "symbol":
+            values = map(code, values)
+        array[name] = np.fromiter(values, dtype=DEAL_DTYPE[name], count=len(deals))
+
+    return array, symbols
+
+
+def merge_arrays(stored: np.ndarray, new: np.ndarray):
+    """Replace stored deals by ticket with new ones and keep (time_msc, ticket) order."""
+    if not len(new):
+        return stored
+
+    merged = np.concatenate([stored[~np.isin(stored["ticket"], new["ticket"])], new])
+    return merged[np.lexsort((merged["ticket"], merged["time_msc"]))]
+
+
+def aggregate_positions(deals: np.ndarray):
+    """Vectorized group-by position_id of a DEAL_DTYPE array.
+
+    Only positions with at least one opening (entry 0) and one closing (entry 1) deal
+    are kept, in order of their first deal. Sums run over deals in array order, so every
+    value matches summing the same deals one by one.
+    """
+    deals = deals[deals["position_id"] > 0]
+    if not len(deals):
+        return None
+
+    position_ids, first_index, group = np.unique(deals["position_id"], return_index=True, return_inverse=True)
+    group = group.ravel()
+    groups = len(position_ids)
+
+    is_open = deals["entry"] == 0
+    is_close = deals["entry"] == 1
+    volume = deals["volume"]
+    price_volume = deals["price"] * volume
+
+    def group_sum(values, mask = None):
+        if mask is not None:
+            values = np.where(mask, values, 0.0)
+        return np.bincount(group, weights=values, minlength=groups)
+
+    open_count = np.bincount(group, weights=is_open, minlength=groups)
+    close_count = np.bincount(group, weights=is_close, minlength=groups)
+
+    open_volume = group_sum(volume, is_open)
+    close_volume = group_sum(volume, is_close)
+    open_price_volume = group_sum(price_volume, is_open)
+    close_price_volume = group_sum(price_volume, is_close)
+
+    # first opening deal of each position gives direction, symbol, magic and reason
+    index = np.arange(len(deals))
+    first_open = np.full(groups, len(deals), dtype=np.int64)
+    np.minimum.at(first_open, group[is_open], index[is_open])
+
+    open_time = np.full(groups, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(open_time, group[is_open], deals["time_msc"][is_open])
+    close_time = np.full(groups, np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(close_time, group[is_close], deals["time_msc"][is_close])
+
+    keep = (open_count > 0) & (close_count > 0)
+    order = np.argsort(first_index[keep], kind="stable")
+
+    def column(values):
+        return values[keep][order]
+
+    open_volume = column(open_volume)
+    close_volume = column(close_volume)
+    close_volume = np.where(close_volume != 0, close_volume, open_volume)
+    first_open = column(first_open)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        open_price = column(open_price_volume) / open_volume
+        close_price = column(close_price_volume) / close_volume
+
+    return {
+        "position_id": column(position_ids),
+        "type": deals["type"][first_open],
+        "entry": deals["entry"][first_open],
+        "magic": deals["magic"][first_open],
+        "reason": deals["reason"][first_open],
+        "symbol": deals["symbol"][first_open],
+        "volume": open_volume,
+        "open_price": open_price,
+        "close_price": close_price,
+        "commission": column(group_sum(deals["commission"])),
+        "swap": column(group_sum(deals["swap"])),
+        "fee": column(group_sum(deals["fee"])),
+        "profit": column(group_sum(deals["profit"])),
+        "open_time_msc": column(open_time),
+        "close_time_msc": column(close_time)
+    }
@@ -0,0 +1,236 @@
+import os
+import json
+import sqlite3
+from utils.deal_arrays import DEAL_FIELDS, deals_to_array, merge_arrays
+from utils.lru_cache import LruCache
+
+DEAL_STORE_PATH = os.getenv("DEAL_STORE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "deals.sqlite3"))
+DEAL_STORE_VERSION = 4
+# accounts whose columnar history stays in memory between syncs
+DEAL_ARRAY_CACHE_SIZE = 64
+DEAL_ARRAY_CACHE_TIMEOUT = 3600
+
+
+class DealStore:
+    """Local copy of each account's history deals plus the last time_msc we have seen.
+
+    Each account also records the span we have fetched, covered_from to covered_to, so
+    a sync only asks the terminal for older history or for deals since the last fetch.
+
+    Deals live in SQLite, and the columnar copy the closed-trade pipeline reads is kept
+    in memory for recently synced accounts and extended with each merge. Every merge
+    bumps the account's revision, so a copy is dropped once another process merged deals,
+    older ones from a backfill included, which never move the watermark.
+    """
+
+    def __init__(self, path: str = DEAL_STORE_PATH):
+        self.path = path
+        self.connection = None
+        self.arrays = LruCache(capacity=DEAL_ARRAY_CACHE_SIZE, idle_timeout=DEAL_ARRAY_CACHE_TIMEOUT)
+
+    def connect(self):
+        if self.connection:
+            return self.connection
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # several worker processes share the file; within a process the connection is used
+        # from the session thread of TerminalManager.run_blocking, one call at a time
+        self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.connection.execute("pragma journal_mode=wal")
+
+        # the store is only a cache of the broker history, so an old layout is dropped and refetched
+        if self.connection.execute("pragma user_version").fetchone()[0] != DEAL_STORE_VERSION:
+            with self.connection:
+                self.connection.execute("drop table if exists deals")
+                self.connection.execute("drop table if exists watermarks")
+                self.connection.execute("drop table if exists checkpoints")
+                self.connection.execute("drop table if exists checkpoint_points")
+                self.connection.execute(f"pragma user_version = {DEAL_STORE_VERSION}")
+
+        self.connection.execute("""
+            create table if not exists deals (
+              login integer not null,
+              server text not null,
+              ticket integer not null,
+              time_msc integer not null,
+              type integer not null,
+              position_id integer not null,
+              entry integer not null,
+              magic integer not null,
+              reason integer not null,
+              symbol text not null,
+              volume real not null,
+              price real not null,
+              commission real not null,
+              swap real not null,
+              fee real not null,
+              profit real not null,
+              data text not null,
+              primary key (login, server, ticket)
+            )
+        """)
+        self.connection.execute("""
+            create table if not exists watermarks (
+              login integer not null,
+              server text not null,
+              time_msc integer,
+              covered_from integer,
+              covered_to integer,
+              revision integer not null default 0,
+              primary key (login, server)
+            )
+        """)
+        self.connection.execute("""
+            create table if not exists checkpoints (
+              login integer not null,
+              server text not null,
+              name text not null,
+              state text not null,
+              primary key (login, server, name)
+            )
+        """)
+        self.connection.execute("""
+            create table if not exists checkpoint_points (
+              login integer not null,
+              server text not null,
+              name text not null,
+              seq integer not null,
+              time_msc integer not null,
+              balance real not null,
+              drawdown real not null,
+              drawdown_percent real not null,
+              primary key (login, server, name, seq)
+            )
+        """)
+        self.connection.commit()
+        return self.connection
+
+    def watermark(self, login: int, server: str):
+        row = self.connect().execute(
+            "select time_msc from watermarks where login = ? and server = ?", (login, server)
+        ).fetchone()
+        return row[0] if row else None
+
+    def revision(self, login: int, server: str):
+        row = self.connect().execute(
+            "select revision from watermarks where login = ? and server = ?", (login, server)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def coverage(self, login: int, server: str):
+        """(covered_from, covered_to) in time_msc, both None for an account we never synced."""
+        row = self.connect().execute(
+            "select covered_from, covered_to from watermarks where login = ? and server = ?", (login, server)
+        ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    def mark_covered(self, login: int, server: str, covered_from: int, covered_to: int):
+        connection = self.connect()
+        with connection:
+            connection.execute("""
+                insert into watermarks (login, server, covered_from, covered_to) values (?, ?, ?, ?)
+                on conflict (login, server) do update
+                set covered_from = min(coalesce(covered_from, excluded.covered_from), excluded.covered_from),
+                    covered_to = max(coalesce(covered_to, excluded.covered_to), excluded.covered_to)
+            """, (login, server, covered_from, covered_to))
+
+    def checkpoint(self, login: int, server: str, name: str):
+        """State saved by save_checkpoint for something derived from the deals, or None."""
+        row = self.connect().execute(
+            "select state from checkpoints where login = ? and server = ? and name = ?", (login, server, name)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def checkpoint_points(self, login: int, server: str, name: str):
+        """Points saved with the checkpoint, as [time_msc, balance, drawdown, drawdown_percent] rows."""
+        return [list(row) for row in self.connect().execute(
+            "select time_msc, balance, drawdown, drawdown_percent from checkpoint_points "
+            "where login = ? and server = ? and name = ? order by seq", (login, server, name)
+        )]
+
+    def save_checkpoint(self, login: int, server: str, name: str, state: dict, points: list = None, points_from: int = 0):
+        """Save the state, and with points replace the stored points from index points_from on.
+
+        Points are rows of their own, so a sync only writes the ones it added; both are saved
+        in one transaction and always line up.
+        """
+        connection = self.connect()
+        with connection:
+            connection.execute(
+                "insert or replace into checkpoints (login, server, name, state) values (?, ?, ?, ?)",
+                (login, server, name, json.dumps(state))
+            )
+            if points is not None:
+                connection.execute(
+                    "delete from checkpoint_points where login = ? and server = ? and name = ? and seq >= ?",
+                    (login, server, name, points_from)
+                )
+                connection.executemany(
+                    "insert into checkpoint_points (login, server, name, seq, time_msc, balance, drawdown, drawdown_percent) "
+                    "values (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(login, server, name, points_from + i, *point) for i, point in enumerate(points)]
+                )
+
+    def merge(self, login: int, server: str, deals: list):
+        """Upsert deals by ticket, move the watermark to the newest time_msc and bump the revision."""
+        if not deals:
+            return
+
+        connection = self.connect()
+        watermark = max(d["time_msc"] for d in deals)
+
+        with connection:
+            # the write lock up front, so no other process merges between reading and bumping the revision
+            connection.execute("begin immediate")
+            previous = self.revision(login, server)
+            connection.executemany(
+                f"insert or replace into deals (login, server, {', '.join(DEAL_FIELDS)}, data) "
+                f"values (?, ?, {', '.join('?' for _ in DEAL_FIELDS)}, ?)",
+                [(login, server, *(d[name] for name in DEAL_FIELDS), json.dumps(d)) for d in deals]
+            )
+            connection.execute("""
+                insert into watermarks (login, server, time_msc, revision) values (?, ?, ?, 1)
+                on conflict (login, server) do update
+                set time_msc = max(coalesce(time_msc, excluded.time_msc), excluded.time_msc),
+                    revision = revision + 1
+            """, (login, server, watermark))
+
+        cached = self.arrays.get((login, server))
+        if cached and cached[2] == previous:
+            array, symbols, _ = cached
+            new, symbols = deals_to_array(deals, symbols)
+            self.arrays.put((login, server), (merge_arrays(array, new), symbols, previous + 1))
+        elif cached:
+            # another process merged deals since we cached this account
+            self.arrays.remove((login, server))
+
+    def load(self, login: int, server: str, since_msc: int = 0, until_msc: int = None, deal_type: int = None):
+        query = "select data from deals where login = ? and server = ? and time_msc >= ?"
+        params = [login, server, since_msc]
+        if until_msc is not None:
+            query += " and time_msc <= ?"
+            params.append(until_msc)
+        if deal_type is not None:
+            query += " and type = ?"
+            params.append(deal_type)
+
+        rows = self.connect().execute(query + " order by time_msc, ticket", params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def array(self, login: int, server: str, since_msc: int = 0, until_msc: int = None):
+        """Columnar deals (see utils/deal_arrays.py) for the account, as (array, symbols)."""
+        revision = self.revision(login, server)
+        cached = self.arrays.get((login, server))
+        if not cached or cached[2] != revision:
+            rows = self.connect().execute(
+                f"select {', '.join(DEAL_FIELDS)} from deals where login = ? and server = ? order by time_msc, ticket",
+                (login, server)
+            ).fetchall()
+            cached = (*deals_to_array(rows), revision)
+            self.arrays.put((login, server), cached)
+
+        array, symbols, _ = cached
+        window = array["time_msc"] >= since_msc
+        if until_msc is not None:
+            window &= array["time_msc"] <= until_msc
+        return array[window], symbols
@@ -0,0 +1,247 @@
+import asyncio
+import multiprocessing
+import queue
+import threading
+from utils.session_cache import SessionCache
+from utils.admission import AdmissionQueue
+from utils.equity_curve import EQUITY_CURVE_INTERVAL
+from utils.sync_metrics import get_sync_metrics
+from utils.allocator import unavailable_terminals
+from loguru import logger
+
+# seconds between reads of the supervisor's terminal status
+TERMINAL_HEALTH_INTERVAL = 5
+
+
+def _terminal_worker(terminal_number: int, jobs, results):
+    # MetaTrader5 holds a single terminal connection per process, so every
+    # worker owns its own TerminalManager pinned to one terminal
+    from utils.terminal_manager import TerminalManager
+
+    terminal_manager = TerminalManager()
+    logger.success(f"🟢 Worker for T{terminal_number} started.")
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+
+        job_id, request = job
+        try:
+            if request.get("sections"):
+                sync = terminal_manager.sync_account(
+                    request.get("login"), request.get("password"), request.get("server"), request.get("sections"),
+                    request.get("start_date"), request.get("end_date"), terminal_number=terminal_number,
+                    curve_interval=request.get("curve_interval"))
+            else:
+                sync = terminal_manager.get_refined_account_data(
+                    request.get("login"), request.get("password"), request.get("server"),
+                    request.get("start_date"), request.get("end_date"), terminal_number=terminal_number)
+            data = asyncio.run(sync)
+        except Exception as e:
+            logger.exception(f"❌ Sync failed on T{terminal_number}: {e}")
+            data = {"status": False, "message": "❌ Account sync failed"}
+
+        # phase timings go back with the result, the pool's process keeps the metrics
+        trace = terminal_manager.trace
+        results.put((terminal_number, job_id, data, trace.to_dict() if trace.status is not None else None))
+
+    terminal_manager.close()
+
+
+class TerminalPool:
+    """One worker process per terminal, jobs routed to whichever worker is idle.
+
+    Workers stay logged in after a sync, so a repeat sync of the same (login, server)
+    goes back to the worker that still holds its session when that worker is idle.
+    New accounts prefer a worker whose terminal already served their broker server.
+    """
+
+    def __init__(self, terminal_numbers: list):
+        self.terminal_numbers = list(terminal_numbers)
+        self.processes = {}
+        self.jobs = {}
+        self.results = None
+        self.idle = set()
+        # requests waiting for an idle worker
+        self.admission = AdmissionQueue()
+        self.sessions = SessionCache(capacity=len(self.terminal_numbers))
+        # broker servers each worker's terminal has served
+        self.terminal_servers = {}
+        self.pending = {}
+        self.busy = {}
+        self.next_job_id = 0
+        self.loop = None
+        self.reader = None
+        # terminals the supervisor reports as crashed or starting, never picked
+        self.unavailable = set()
+        self.health = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.results = multiprocessing.Queue()
+
+        for terminal_number in self.terminal_numbers:
+            self._start_worker(terminal_number)
+            self.idle.add(terminal_number)
+
+        self.reader = threading.Thread(target=self._read_results, daemon=True)
+        self.reader.start()
+        self.health = asyncio.create_task(self._watch_health())
+
+    async def _watch_health(self):
+        # the pool is pinned to T<n> and never asks the allocator, so it follows the
+        # supervisor's status file instead
+        while True:
+            try:
+                unavailable = {
+                    int(terminal_id[1:]) for terminal_id in await asyncio.to_thread(unavailable_terminals)
+                    if terminal_id[1:].isdigit()
+                }
+                if unavailable != self.unavailable:
+                    recovered = self.unavailable - unavailable
+                    self.unavailable = unavailable
+                    if unavailable:
+                        logger.warning(f"⚠️ Terminals unavailable: {', '.join(f'T{t}' for t in sorted(unavailable))}")
+                    if recovered:
+                        # requests waiting for an idle terminal may take the ones that came back
+                        self.admission.notify()
+            except Exception as e:
+                logger.warning(f"❌ Failed to read terminal health: {e}")
+            await asyncio.sleep(TERMINAL_HEALTH_INTERVAL)
+
+    def _start_worker(self, terminal_number: int):
+        jobs = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=_terminal_worker, args=(terminal_number, jobs, self.results), daemon=True)
+        process.start()
+
+        self.jobs[terminal_number] = jobs
+        self.processes[terminal_number] = process
+
+    def _read_results(self):
+        while True:
+            try:
+                result = self.results.get(timeout=1)
+            except queue.Empty:
+                # a worker that crashed mid-sync never answers, fail its job instead of hanging
+                for terminal_number, job_id in list(self.busy.items()):
+                    if not self.processes[terminal_number].is_alive():
+                        self.loop.call_soon_threadsafe(self._complete, terminal_number, job_id, {
+                            "status": False,
+                            "message": "❌ Account sync failed"
+                        })
+                continue
+
+            if result is None:
+                break
+            self.loop.call_soon_threadsafe(self._complete, *result)
+
+    def _complete(self, terminal_number: int, job_id: int, data: dict, trace: dict = None):
+        if self.busy.get(terminal_number) != job_id:
+            return
+        del self.busy[terminal_number]
+
+        if trace:
+            get_sync_metrics().record(trace)
+
+        future = self.pending.pop(job_id, None)
+        if future and not future.done():
+            future.set_result(data)
+            if not data.get("status"):
+                # a failed login leaves no session behind
+                self.sessions.remove_value(terminal_number)
+
+        self.idle.add(terminal_number)
+        self.admission.notify()
+
+    def _pick_terminal(self, key: tuple):
+        # 1. the idle worker still logged in to this account
+        terminal_number = self.sessions.get(key)
+        if terminal_number in self.idle and terminal_number not in self.unavailable:
+            return terminal_number
+
+        idle = [t for t in self.terminal_numbers if t in self.idle and t not in self.unavailable]
+        if not idle:
+            return None
+
+        # 2. otherwise prefer a terminal warm for this broker server (Bases/<server> cache),
+        # then one holding no session, then the least recently used session
+        server = key[1]
+        sessions = [value for _, value in self.sessions.items()]
+
+        def rank(terminal_number):
+            warm = server in self.terminal_servers.get(terminal_number, ())
+            session_age = sessions.index(terminal_number) if terminal_number in sessions else -1
+            return (not warm, session_age)
+
+        return min(idle, key=rank)
+
+    async def sync(self, login: int, password: str, server: str, start_date: str = None, end_date: str = None,
+                   timeout: float = None, sections: list = None, curve_interval: str = EQUITY_CURVE_INTERVAL):
+        key = (login, server)
+
+        async def take_idle():
+            terminal_number = self._pick_terminal(key)
+            if terminal_number is not None:
+                self.idle.discard(terminal_number)
+            return terminal_number
+
+        terminal_number, message = await self.admission.admit(take_idle, timeout)
+        if terminal_number is None:
+            return {
+                "status": False,
+                "message": message
+            }
+
+        self.sessions.remove_value(terminal_number)
+        self.sessions.put(key, terminal_number)
+        self.terminal_servers.setdefault(terminal_number, set()).add(server)
+
+        if not self.processes[terminal_number].is_alive():
+            logger.warning(f"⚠️ Worker for T{terminal_number} died, restarting.")
+            self._start_worker(terminal_number)
+
+        self.next_job_id += 1
+        job_id = self.next_job_id
+        future = self.loop.create_future()
+        self.pending[job_id] = future
+        self.busy[terminal_number] = job_id
+
+        self.jobs[terminal_number].put((job_id, {
+            "login": login,
+            "password": password,
+            "server": server,
+            "start_date": start_date,
+            "end_date": end_date,
+            "sections": sections,
+            "curve_interval": curve_interval
+        }))
+
+        return await future
+
+    async def stop(self):
+        if self.health:
+            self.health.cancel()
+        for jobs in self.jobs.values():
+            jobs.put(None)
+        for process in self.processes.values():
+            process.join(timeout=5)
+        self.results.put(None)
+        self.reader.join(timeout=5)
+
+
+def parse_terminal_range(value: str):
+    """Parse "1-32", "1,2,5" or "8" (first N terminals) into terminal numbers."""
+    numbers = []
+    if "," not in value and "-" not in value:
+        return list(range(1, int(value) + 1))
+
+    for part in value.split(","):
+        if "-" in part:
+            start, end = part.split("-")
+            numbers.extend(range(int(start), int(end) + 1))
+        elif part.strip():
+            numbers.append(int(part))
+
+    return numbers
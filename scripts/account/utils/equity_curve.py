@@ -0,0 +1,149 @@
+from datetime import datetime, timezone
+import numpy as np
+
+# bucket length in milliseconds for each downsampling interval, None keeps a point per deal
+CURVE_INTERVALS = {
+    None: None,
+    "hour": 3600 * 1000,
+    "day": 24 * 3600 * 1000
+}
+# default interval of the equity_curve sync section
+EQUITY_CURVE_INTERVAL = "day"
+# deposits and withdrawals (DEAL_TYPE_BALANCE), which move the balance but are not drawdown
+BALANCE_DEAL_TYPE = 2
+# bump when the state layout or its meaning changes, older checkpoints are rebuilt
+EQUITY_CURVE_VERSION = 3
+
+
+class EquityCurve:
+    """Balance and drawdown series over an account's deals, extended one sync at a time.
+
+    Every deal moves the balance by profit + commission + swap + fee. Deposits and
+    withdrawals move the peak by the same amount, so drawdown only measures trading
+    losses: a withdrawal lowers balance and peak together, a deposit does not set a new
+    high to fall from. The state (running balance, peak, net deposits, worst drawdown and
+    the last point) round-trips through to_state(), so a later sync only walks the deals
+    after the checkpoint. With an interval, each hour or day keeps its closing balance and
+    its deepest drawdown.
+
+    The points themselves are not part of the state, a curve has one per deal without an
+    interval. extend() leaves the points it added in `points`, to be stored from index
+    `points_from` on; that index is point_count - 1 when the first new deals fell in the
+    last stored bucket and replace it.
+    """
+
+    def __init__(self, interval: str = None, state: dict = None):
+        if interval not in CURVE_INTERVALS:
+            raise ValueError(f"Unknown equity curve interval: {interval}")
+
+        state = state or {}
+        if state.get("version") != EQUITY_CURVE_VERSION:
+            state = {}
+        self.interval = interval
+        # deals folded in so far and the ticket of the last one, to check the deals still line up
+        self.count = state.get("count", 0)
+        self.last_ticket = state.get("last_ticket")
+        self.balance = state.get("balance", 0.0)
+        self.peak = state.get("peak", 0.0)
+        # net deposits so far, and the peak with them taken out (peak = trading_peak + flows)
+        self.flows = state.get("flows", 0.0)
+        self.trading_peak = state.get("trading_peak", 0.0)
+        self.max_drawdown = state.get("max_drawdown", 0.0)
+        self.max_drawdown_percent = state.get("max_drawdown_percent", 0.0)
+        # points stored so far and the last of them, [time_msc, balance, drawdown, drawdown_percent]
+        self.point_count = state.get("point_count", 0)
+        self.last_point = state.get("last_point")
+        # what the last extend() added, from index points_from on
+        self.points = []
+        self.points_from = self.point_count
+
+    def matches(self, deals: np.ndarray):
+        """True when the deals the checkpoint covers are still the first `count` rows."""
+        if not self.count:
+            return True
+        return len(deals) >= self.count and int(deals["ticket"][self.count - 1]) == self.last_ticket
+
+    def extend(self, deals: np.ndarray):
+        """Fold in the deals after the checkpoint (a DEAL_DTYPE array in time order), returns how many."""
+        new = deals[self.count:]
+        if not len(new):
+            return 0
+
+        change = new["profit"] + new["commission"] + new["swap"] + new["fee"]
+        flow = np.where(new["type"] == BALANCE_DEAL_TYPE, change, 0.0)
+        # summed from the stored values in order, so extending gives the same values as a rebuild
+        balance = np.cumsum(np.concatenate(([self.balance], change)))[1:]
+        flows = np.cumsum(np.concatenate(([self.flows], flow)))[1:]
+        # the peak follows every deposit and withdrawal: the highest balance net of deposits, plus them
+        trading_peak = np.maximum.accumulate(np.maximum(balance - flows, self.trading_peak))
+        peak = np.maximum(trading_peak + flows, balance)
+        drawdown = peak - balance
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drawdown_percent = np.where(peak > 0, drawdown / peak * 100, 0.0)
+
+        bucket = CURVE_INTERVALS[self.interval]
+        if bucket:
+            buckets = new["time_msc"] // bucket
+            starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+            ends = np.concatenate((starts[1:], [len(new)])) - 1
+            points = list(map(list, zip(
+                (buckets[starts] * bucket).tolist(),
+                balance[ends].tolist(),
+                np.maximum.reduceat(drawdown, starts).tolist(),
+                np.maximum.reduceat(drawdown_percent, starts).tolist()
+            )))
+
+            self.points_from = self.point_count
+            if self.last_point and self.last_point[0] == points[0][0]:
+                # the first new deals fall in the last stored bucket, merge them into it
+                self.points_from -= 1
+                points[0][2] = max(points[0][2], self.last_point[2])
+                points[0][3] = max(points[0][3], self.last_point[3])
+        else:
+            self.points_from = self.point_count
+            points = list(map(list, zip(
+                new["time_msc"].tolist(), balance.tolist(), drawdown.tolist(), drawdown_percent.tolist())))
+
+        self.points = points
+        self.point_count = self.points_from + len(points)
+        self.last_point = points[-1]
+        self.count = len(deals)
+        self.last_ticket = int(new["ticket"][-1])
+        self.balance = float(balance[-1])
+        self.peak = float(peak[-1])
+        self.flows = float(flows[-1])
+        self.trading_peak = float(trading_peak[-1])
+        self.max_drawdown = max(self.max_drawdown, float(drawdown.max()))
+        self.max_drawdown_percent = max(self.max_drawdown_percent, float(drawdown_percent.max()))
+        return len(new)
+
+    def to_state(self):
+        return {
+            "version": EQUITY_CURVE_VERSION,
+            "count": self.count,
+            "last_ticket": self.last_ticket,
+            "balance": self.balance,
+            "peak": self.peak,
+            "flows": self.flows,
+            "trading_peak": self.trading_peak,
+            "max_drawdown": self.max_drawdown,
+            "max_drawdown_percent": self.max_drawdown_percent,
+            "point_count": self.point_count,
+            "last_point": self.last_point
+        }
+
+    def result(self, points: list):
+        """The response section, over every point of the curve (stored ones plus the new)."""
+        return {
+            "interval": self.interval or "deal",
+            "balance": self.balance,
+            "peak": self.peak,
+            "max_drawdown": self.max_drawdown,
+            "max_drawdown_percent": self.max_drawdown_percent,
+            "points": [{
+                "time": datetime.fromtimestamp(time_msc / 1000.0, tz=timezone.utc).isoformat(),
+                "balance": balance,
+                "drawdown": drawdown,
+                "drawdown_percent": drawdown_percent
+            } for time_msc, balance, drawdown, drawdown_percent in points]
+        }
@@ -0,0 +1,199 @@
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+
+# size of the synthetic account when the backend is picked with MT5_BACKEND=fake
+FAKE_MT5_DEALS = int(os.getenv("FAKE_MT5_DEALS", 10000))
+FAKE_MT5_POSITIONS = int(os.getenv("FAKE_MT5_POSITIONS", 50))
+FAKE_MT5_SYMBOLS = int(os.getenv("FAKE_MT5_SYMBOLS", 20))
+# seconds added to every call, roughly the IPC cost of a real terminal
+FAKE_MT5_LATENCY = float(os.getenv("FAKE_MT5_LATENCY", 0))
+
+# same fields, in the same order, as the MetaTrader5 package's named tuples
+TradeDeal = namedtuple("TradeDeal", [
+    "ticket", "order", "time", "time_msc", "type", "entry", "magic", "position_id", "reason", "volume",
+    "price", "commission", "swap", "profit", "fee", "symbol", "comment", "external_id"
+])
+TradePosition = namedtuple("TradePosition", [
+    "ticket", "time", "time_msc", "time_update", "time_update_msc", "type", "magic", "identifier", "reason",
+    "volume", "price_open", "sl", "tp", "price_current", "swap", "profit", "symbol", "comment", "external_id"
+])
+AccountInfo = namedtuple("AccountInfo", [
+    "login", "trade_mode", "leverage", "limit_orders", "margin_so_mode", "trade_allowed", "trade_expert",
+    "margin_mode", "currency_digits", "fifo_close", "balance", "credit", "profit", "equity", "margin",
+    "margin_free", "margin_level", "margin_so_call", "margin_so_so", "margin_initial", "margin_maintenance",
+    "assets", "liabilities", "commission_blocked", "name", "server", "currency", "company"
+])
+SymbolInfo = namedtuple("SymbolInfo", ["name", "digits", "point", "trade_contract_size", "trade_tick_value"])
+
+
+class FakeMT5:
+    """Stand-in for the MetaTrader5 module backed by a synthetic account.
+
+    The account has `deals` history deals over the last `years` years, that is closed
+    positions as IN/OUT pairs plus a few balance operations, along with `positions`
+    open positions spread over `symbols` symbols. Generation is seeded, so the same
+    arguments always give the same account.
+    """
+
+    def __init__(self, deals: int = FAKE_MT5_DEALS, positions: int = FAKE_MT5_POSITIONS,
+                 symbols: int = FAKE_MT5_SYMBOLS, years: int = 3, seed: int = 0, latency: float = FAKE_MT5_LATENCY):
+        self.deal_count = deals
+        self.position_count = positions
+        self.symbol_count = max(symbols, 1)
+        self.years = years
+        self.seed = seed
+        self.latency = latency
+
+        self.initialized = False
+        self.login = None
+        self.server = None
+        # calls per function, to check which terminal calls a sync made
+        self.calls = {}
+
+        self.generate()
+
+    def generate(self):
+        rng = np.random.default_rng(self.seed)
+        now = int(time.time() * 1000)
+        start = now - self.years * 365 * 24 * 3600 * 1000
+
+        self.symbols = [f"SYM{i:03d}" for i in range(self.symbol_count)]
+        self.symbol_digits = rng.choice([2, 3, 5], self.symbol_count)
+        base_prices = rng.uniform(0.5, 2000, self.symbol_count)
+
+        n_balance = max(1, self.deal_count // 1000)
+        n_closed = max(0, (self.deal_count - n_balance) // 2)
+
+        # closed positions, each an IN deal and a later OUT deal in the opposite direction
+        open_time = rng.integers(start, now, n_closed)
+        close_time = np.minimum(open_time + rng.integers(60 * 1000, 3 * 24 * 3600 * 1000, n_closed), now)
+        direction = rng.integers(0, 2, n_closed)
+        symbol = rng.integers(0, self.symbol_count, n_closed)
+        volume = rng.choice([0.01, 0.1, 0.5, 1.0], n_closed)
+        open_price = base_prices[symbol] * rng.uniform(0.9, 1.1, n_closed)
+        close_price = open_price * rng.uniform(0.99, 1.01, n_closed)
+        profit = np.round(rng.normal(0, 25, n_closed), 2)
+        # the OUT deal carries the IN deal's magic, like an EA closing its own position
+        magic = rng.choice([0, 1001, 2002], n_closed)
+        position_id = np.arange(1, n_closed + 1) + 10 ** 6
+
+        # balance operations: an initial deposit, then deposits and withdrawals
+        balance_time = np.sort(rng.integers(start, now, n_balance))
+        balance_time[0] = start
+        balance_profit = np.round(rng.uniform(-500, 2000, n_balance), 2)
+        balance_profit[0] = 10000.0
+
+        zeros = np.zeros(n_closed)
+        columns = {
+            "time_msc": np.concatenate((open_time, close_time, balance_time)),
+            "type": np.concatenate((direction, 1 - direction, np.full(n_balance, 2))),
+            "entry": np.concatenate((np.zeros(n_closed, int), np.ones(n_closed, int), np.zeros(n_balance, int))),
+            "magic": np.concatenate((np.tile(magic, 2), np.zeros(n_balance, int))),
+            "position_id": np.concatenate((position_id, position_id, np.zeros(n_balance, int))),
+            "reason": np.concatenate((np.full(n_closed, 3), rng.choice([3, 4, 5], n_closed), np.zeros(n_balance, int))),
+            "symbol": np.concatenate((symbol, symbol, np.full(n_balance, -1))),
+            "volume": np.concatenate((volume, volume, np.zeros(n_balance))),
+            "price": np.concatenate((open_price, close_price, np.zeros(n_balance))),
+            "commission": np.concatenate((np.round(-volume * 3.5, 2), zeros, np.zeros(n_balance))),
+            "swap": np.concatenate((zeros, np.round(rng.normal(0, 1, n_closed), 2), np.zeros(n_balance))),
+            "profit": np.concatenate((zeros, profit, balance_profit)),
+            "fee": np.zeros(2 * n_closed + n_balance)
+        }
+        order = np.argsort(columns["time_msc"], kind="stable")
+        self.deals = {name: column[order] for name, column in columns.items()}
+        self.deals["ticket"] = np.arange(1, len(order) + 1) + 10 ** 7
+
+        self.balance = float(sum(
+            self.deals[name].sum() for name in ("profit", "commission", "swap", "fee")))
+
+        # open positions, opened over the last few days
+        n_open = self.position_count
+        open_symbol = rng.integers(0, self.symbol_count, n_open)
+        self.positions = []
+        for i, (opened, symbol_code, price, direction, profit) in enumerate(zip(
+                rng.integers(now - 5 * 24 * 3600 * 1000, now, n_open).tolist(), open_symbol.tolist(),
+                (base_prices[open_symbol] * rng.uniform(0.9, 1.1, n_open)).tolist(),
+                rng.integers(0, 2, n_open).tolist(), np.round(rng.normal(0, 25, n_open), 2).tolist())):
+            ticket = 9 * 10 ** 7 + i
+            self.positions.append(TradePosition(
+                ticket, opened // 1000, opened, opened // 1000, opened, direction, 0, ticket, 3, 0.1, price,
+                0.0, 0.0, price * 1.001, 0.0, profit, self.symbols[symbol_code], "", ""))
+
+    def call(self, name: str):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def initialize(self, path: str = None, login: int = None, password: str = None, server: str = None,
+                   timeout: int = None, portable: bool = False):
+        self.call("initialize")
+        self.initialized = True
+        self.login = login
+        self.server = server
+        return True
+
+    def shutdown(self):
+        self.call("shutdown")
+        self.initialized = False
+        return True
+
+    def last_error(self):
+        return (1, "Success") if self.initialized else (-10004, "No IPC connection")
+
+    def account_info(self):
+        self.call("account_info")
+        if not self.initialized:
+            return None
+
+        profit = sum(p.profit for p in self.positions)
+        equity = self.balance + profit
+        margin = 10.0 * len(self.positions)
+        return AccountInfo(
+            self.login, 0, 100, 200, 0, True, True, 2, 2, False, self.balance, 0.0, profit, equity, margin,
+            equity - margin, (equity / margin * 100) if margin else 0.0, 50.0, 30.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+            "Synthetic Account", self.server, "USD", "Fake Broker Ltd")
+
+    def positions_get(self):
+        self.call("positions_get")
+        if not self.initialized:
+            return None
+        return tuple(self.positions)
+
+    def history_deals_get(self, date_from, date_to):
+        self.call("history_deals_get")
+        if not self.initialized:
+            return None
+
+        def msc(value):
+            return int(value.timestamp() * 1000) if isinstance(value, datetime) else int(value) * 1000
+
+        times = self.deals["time_msc"]
+        lo = np.searchsorted(times, msc(date_from), side="left")
+        hi = np.searchsorted(times, msc(date_to), side="right")
+
+        deals = {name: column[lo:hi].tolist() for name, column in self.deals.items()}
+        symbols = [self.symbols[code] if code >= 0 else "" for code in deals["symbol"]]
+        return tuple(
+            TradeDeal(ticket, ticket, time_msc // 1000, time_msc, deal_type, entry, magic, position_id, reason,
+                      volume, price, commission, swap, profit, fee, symbol, "", "")
+            for ticket, time_msc, deal_type, entry, magic, position_id, reason, volume, price, commission, swap,
+            profit, fee, symbol in zip(
+                deals["ticket"], deals["time_msc"], deals["type"], deals["entry"], deals["magic"],
+                deals["position_id"], deals["reason"], deals["volume"], deals["price"], deals["commission"],
+                deals["swap"], deals["profit"], deals["fee"], symbols)
+        )
+
+    def symbol_select(self, symbol: str, enable: bool = True):
+        self.call("symbol_select")
+        return self.initialized and symbol in self.symbols
+
+    def symbol_info(self, symbol: str):
+        self.call("symbol_info")
+        if not self.initialized or symbol not in self.symbols:
+            return None
+
+        digits = int(self.symbol_digits[self.symbols.index(symbol)])
+        return SymbolInfo(symbol, digits, 10.0 ** -digits, 100000.0, 1.0)
@@ -0,0 +1,48 @@
+import time
+from collections import OrderedDict
+
+
+class LruCache:
+    """LRU map whose entries also expire after idle_timeout seconds unused."""
+
+    def __init__(self, capacity: int, idle_timeout: float):
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.entries = OrderedDict()
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in list(self.entries):
+            value, last_used = self.entries[key]
+            if now - last_used > self.idle_timeout:
+                del self.entries[key]
+
+    def get(self, key):
+        self._expire()
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        self.entries[key] = (entry[0], time.monotonic())
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value):
+        self._expire()
+        self.entries[key] = (value, time.monotonic())
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def remove(self, key):
+        self.entries.pop(key, None)
+
+    def remove_value(self, value):
+        for key in [k for k, (v, _) in self.entries.items() if v == value]:
+            del self.entries[key]
+
+    def items(self):
+        """Live (key, value) pairs, least recently used first."""
+        self._expire()
+        return [(key, value) for key, (value, _) in self.entries.items()]
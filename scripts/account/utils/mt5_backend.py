@@ -0,0 +1,16 @@
+import os
+
+# metatrader5: the real MetaTrader5 package (Windows only)
+# fake: utils/fake_mt5.py, a synthetic account for benchmarks and local runs
+MT5_BACKEND = os.getenv("MT5_BACKEND", "metatrader5")
+
+
+def get_mt5_backend(name: str = None):
+    """The module (or module-like object) TerminalManager calls MetaTrader5 functions on."""
+    name = name or MT5_BACKEND
+    if name == "fake":
+        from utils.fake_mt5 import FakeMT5
+        return FakeMT5()
+
+    import MetaTrader5
+    return MetaTrader5
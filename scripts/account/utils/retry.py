@@ -0,0 +1,86 @@
+import os
+import time
+import random
+import asyncio
+import inspect
+from loguru import logger
+
+# attempts per MetaTrader5 call, the first one included
+RETRY_ATTEMPTS = int(os.getenv("MT5_RETRY_ATTEMPTS", 3))
+# delay before the first retry, doubled for each one after it up to RETRY_MAX_DELAY
+RETRY_BASE_DELAY = 0.1
+RETRY_MAX_DELAY = 2
+RETRY_MULTIPLIER = 2
+# share of each delay that is randomised, so terminals retrying together spread out
+RETRY_JITTER = 0.5
+# seconds one sync may spend before it stops retrying and works with what it has
+SYNC_TIME_BUDGET = float(os.getenv("SYNC_TIME_BUDGET", 120))
+
+
+class Deadline:
+    def __init__(self, seconds: float = SYNC_TIME_BUDGET):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+
+class RetryPolicy:
+    """Retries with exponential backoff and jitter, bounded by an optional Deadline.
+
+    A call is done when done(result) is true. By default that means any truthy
+    result, but callers pass their own check so a legitimate empty answer, e.g.
+    positions_get() returning () for an account with no open positions, ends the
+    loop without burning retries. permanent(result) stops early on failures a retry
+    cannot fix, such as rejected credentials.
+    """
+
+    def __init__(self, attempts: int = RETRY_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, multiplier: float = RETRY_MULTIPLIER, jitter: float = RETRY_JITTER):
+        self.attempts = max(attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    def delay(self, attempt: int):
+        """Seconds to wait after the given (0-based) failed attempt."""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return delay * (1 - self.jitter * random.random())
+
+    async def backoff(self, attempt: int, deadline: Deadline = None):
+        """Sleep before the next attempt, False when there is no next attempt or no time left for it."""
+        if attempt + 1 >= self.attempts:
+            return False
+
+        delay = self.delay(attempt)
+        if deadline and deadline.remaining() <= delay:
+            logger.warning("⌛ Sync time budget spent, not retrying")
+            return False
+
+        await asyncio.sleep(delay)
+        return True
+
+    async def run(self, call, name: str, done=bool, permanent=None, deadline: Deadline = None, on_retry=None):
+        """Call until done(result), returns the last result either way.
+
+        call may return a value or an awaitable.
+        """
+        attempt = 0
+        while True:
+            result = call()
+            if inspect.isawaitable(result):
+                result = await result
+
+            if done(result):
+                return result
+            if permanent and permanent(result):
+                return result
+
+            logger.info(f"Attempt {attempt + 1} failed for {name}")
+            if not await self.backoff(attempt, deadline):
+                return result
+
+            if on_retry:
+                on_retry(name)
+            attempt += 1
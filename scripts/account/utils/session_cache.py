@@ -0,0 +1,11 @@
+from utils.lru_cache import LruCache
+
+# seconds an idle logged-in session stays reusable before we log in again
+SESSION_IDLE_TIMEOUT = 300
+
+
+class SessionCache(LruCache):
+    """Logged-in sessions keyed by (login, server), least recently used and idle ones dropped."""
+
+    def __init__(self, capacity: int, idle_timeout: float = SESSION_IDLE_TIMEOUT):
+        super().__init__(capacity, idle_timeout)
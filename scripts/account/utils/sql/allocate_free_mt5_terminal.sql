@@ -1,4 +1,11 @@
-create or replace function allocate_free_mt5_terminal()
+drop function if exists allocate_free_mt5_terminal();
+drop function if exists allocate_free_mt5_terminal(text, integer);
+
+create or replace function allocate_free_mt5_terminal(
+  p_holder text default null,
+  p_lease_seconds integer default 120,
+  p_server text default null
+)
 returns table (
   id text,
   path text
@@ -8,24 +15,41 @@ as $$
 declare
   term record;
 begin
-  -- Lock one free terminal
-  select * into term
+  -- Lock one free terminal (or one whose lease expired without a heartbeat),
+  -- preferring one that served p_server recently so its Bases/<server> cache is warm
+  select mt5_terminals.* into term
   from mt5_terminals
-  where in_use = false
-  order by last_assigned nulls first
+  left join mt5_terminal_servers
+    on mt5_terminal_servers.terminal_id = mt5_terminals.id
+   and mt5_terminal_servers.server = p_server
+   and mt5_terminal_servers.last_served > now() - interval '7 days'
+  where (mt5_terminals.in_use = false
+     or mt5_terminals.lease_expires_at < now())
+    -- never a terminal the supervisor found crashed or not ready
+    and mt5_terminals.available
+  order by mt5_terminal_servers.server is null, mt5_terminals.last_assigned nulls first
   limit 1
-  for update skip locked;
+  for update of mt5_terminals skip locked;
 
   if not found then
     return;
   end if;
 
-  -- Mark it as in use
+  -- Mark it as in use and lease it to the caller
   update mt5_terminals
   set in_use = true,
-      last_assigned = now()
+      last_assigned = now(),
+      holder = p_holder,
+      lease_expires_at = now() + make_interval(secs => p_lease_seconds)
   where mt5_terminals.id = term.id;  -- ✅ Fully qualify the table column
 
+  -- Remember the server so the next account on this broker lands here
+  if p_server is not null then
+    insert into mt5_terminal_servers (terminal_id, server, last_served)
+    values (term.id, p_server, now())
+    on conflict (terminal_id, server) do update set last_served = excluded.last_served;
+  end if;
+
   -- Return the allocated terminal
   return query select term.id, term.path;
 end;
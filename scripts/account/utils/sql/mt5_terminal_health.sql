@@ -0,0 +1,6 @@
+-- Health the supervisor (scripts/account/supervisor.py) reports per terminal;
+-- allocate_free_mt5_terminal skips terminals that are not available
+alter table mt5_terminals
+  add column if not exists available boolean not null default true,
+  add column if not exists unavailable_reason text,
+  add column if not exists health_checked_at timestamp with time zone;
@@ -0,0 +1,42 @@
+alter table mt5_terminals
+  add column if not exists holder text,
+  add column if not exists lease_expires_at timestamp with time zone;
+
+-- Extend a lease, returns false when the caller no longer holds the terminal
+create or replace function renew_mt5_terminal_lease(
+  p_id text,
+  p_holder text,
+  p_lease_seconds integer default 120
+)
+returns boolean
+language plpgsql
+as $$
+begin
+  update mt5_terminals
+  set lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+  where mt5_terminals.id = p_id
+    and mt5_terminals.holder = p_holder
+    and mt5_terminals.in_use = true;
+
+  return found;
+end;
+$$;
+
+-- Return terminals whose lease expired (crashed or killed holders) to the pool
+create or replace function reap_expired_mt5_terminals()
+returns table (
+  id text
+)
+language plpgsql
+as $$
+begin
+  return query
+  update mt5_terminals
+  set in_use = false,
+      holder = null,
+      lease_expires_at = null
+  where mt5_terminals.in_use = true
+    and mt5_terminals.lease_expires_at < now()
+  returning mt5_terminals.id;
+end;
+$$;
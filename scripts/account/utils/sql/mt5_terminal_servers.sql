@@ -0,0 +1,7 @@
+-- Broker servers each terminal served recently (its Bases/<server> cache is warm)
+create table if not exists mt5_terminal_servers (
+  terminal_id text not null references mt5_terminals (id) on delete cascade,
+  server text not null,
+  last_served timestamp with time zone not null default now(),
+  primary key (terminal_id, server)
+);
@@ -2,7 +2,12 @@ create table mt5_terminals (
   id text primary key,
   path text not null,
   in_use boolean default false,
-  last_assigned timestamp with time zone default now()
+  last_assigned timestamp with time zone default now(),
+  holder text,
+  lease_expires_at timestamp with time zone,
+  available boolean not null default true,
+  unavailable_reason text,
+  health_checked_at timestamp with time zone
 );
 
 insert into mt5_terminals (id, path, in_use)
@@ -0,0 +1,88 @@
+import os
+import time
+import sqlite3
+
+SYMBOL_INDEX_PATH = os.getenv("SYMBOL_INDEX_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "symbols.sqlite3"))
+# seconds before a symbol's metadata is read from the terminal again
+SYMBOL_INDEX_TTL = 24 * 3600
+
+SYMBOL_FIELDS = ["trade_contract_size", "digits", "point", "trade_tick_value"]
+
+
+class SymbolIndex:
+    """Symbol metadata per broker server, in memory and on disk, expiring after ttl seconds."""
+
+    def __init__(self, path: str = SYMBOL_INDEX_PATH, ttl: float = SYMBOL_INDEX_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.connection = None
+        self.memory = {}
+
+    def connect(self):
+        if self.connection:
+            return self.connection
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # several worker processes share the file; within a process the connection is used
+        # from the session thread of TerminalManager.run_blocking, one call at a time
+        self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.connection.execute("pragma journal_mode=wal")
+        self.connection.execute("""
+            create table if not exists symbols (
+              server text not null,
+              symbol text not null,
+              trade_contract_size real,
+              digits integer,
+              point real,
+              trade_tick_value real,
+              updated_at real not null,
+              primary key (server, symbol)
+            )
+        """)
+        self.connection.commit()
+        return self.connection
+
+    def get_many(self, server: str, symbols: list):
+        """Fresh metadata for the symbols we have, as {symbol: info}."""
+        cutoff = time.time() - self.ttl
+        result = {}
+        missing = []
+
+        for symbol in symbols:
+            entry = self.memory.get((server, symbol))
+            if entry and entry[1] >= cutoff:
+                result[symbol] = entry[0]
+            else:
+                missing.append(symbol)
+
+        if not missing:
+            return result
+
+        rows = self.connect().execute(
+            f"select symbol, {', '.join(SYMBOL_FIELDS)}, updated_at from symbols "
+            f"where server = ? and updated_at >= ? and symbol in ({', '.join('?' for _ in missing)})",
+            (server, cutoff, *missing)
+        ).fetchall()
+
+        for symbol, *values, updated_at in rows:
+            info = dict(zip(SYMBOL_FIELDS, values))
+            self.memory[(server, symbol)] = (info, updated_at)
+            result[symbol] = info
+
+        return result
+
+    def put_many(self, server: str, infos: dict):
+        if not infos:
+            return
+
+        now = time.time()
+        for symbol, info in infos.items():
+            self.memory[(server, symbol)] = (info, now)
+
+        connection = self.connect()
+        with connection:
+            connection.executemany(
+                f"insert or replace into symbols (server, symbol, {', '.join(SYMBOL_FIELDS)}, updated_at) "
+                f"values (?, ?, {', '.join('?' for _ in SYMBOL_FIELDS)}, ?)",
+                [(server, symbol, *(info.get(name) for name in SYMBOL_FIELDS), now) for symbol, info in infos.items()]
+            )
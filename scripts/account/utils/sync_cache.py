@@ -0,0 +1,97 @@
+import os
+import time
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+
+# seconds a successful sync result is served again to identical requests, 0 turns caching off
+SYNC_RESULT_TTL = float(os.getenv("SYNC_RESULT_TTL", 10))
+SYNC_RESULT_CACHE_SIZE = 256
+
+
+def sync_key(login: int, password: str, server: str, *options):
+    """Cache key of a sync request. The password hash is part of it, so a result is only
+    ever shared with callers holding the same credentials."""
+    password_hash = hashlib.sha256(password.encode("utf-8")).hexdigest()
+    return (login, server, password_hash, json.dumps(options, sort_keys=True, default=str))
+
+
+class SyncCache:
+    """Single-flight deduplication plus a short-lived cache of sync results.
+
+    Concurrent requests with the same key share one in-flight sync. A successful
+    result is then served for ttl seconds without touching a terminal; failures are
+    shared with the requests already waiting but never cached.
+    """
+
+    def __init__(self, ttl: float = SYNC_RESULT_TTL, capacity: int = SYNC_RESULT_CACHE_SIZE):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.results = OrderedDict()
+        self.in_flight = {}
+
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.results.get(key)
+        if entry is None:
+            return None
+
+        result, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self.results[key]
+            return None
+
+        self.results.move_to_end(key)
+        return result
+
+    def put(self, key, result: dict):
+        if self.ttl <= 0:
+            return
+
+        self.results[key] = (result, time.monotonic() + self.ttl)
+        self.results.move_to_end(key)
+        while len(self.results) > self.capacity:
+            self.results.popitem(last=False)
+
+    async def run(self, key, sync, fresh: bool = False):
+        """Result of sync() for this key, shared with identical requests.
+
+        fresh skips the cached result and any sync already running, the new result is still cached.
+        """
+        if not fresh:
+            result = self.get(key)
+            if result is not None:
+                self.hits += 1
+                return result
+
+            task = self.in_flight.get(key)
+            if task:
+                self.shared += 1
+                # shielded, so one caller giving up does not cancel the sync for the others
+                return await asyncio.shield(task)
+
+        self.misses += 1
+        task = asyncio.ensure_future(sync())
+        self.in_flight[key] = task
+
+        def done(task):
+            if self.in_flight.get(key) is task:
+                del self.in_flight[key]
+            if not task.cancelled() and not task.exception() and task.result().get("status"):
+                self.put(key, task.result())
+
+        task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+    def metrics(self):
+        return {
+            "cached": len(self.results),
+            "in_flight": len(self.in_flight),
+            "hits": self.hits,
+            "shared": self.shared,
+            "misses": self.misses
+        }
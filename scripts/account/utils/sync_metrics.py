@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# histogram bucket upper bounds, in seconds
+SYNC_METRICS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+# where the worker writes its metrics; *.prom is Prometheus text (for the node_exporter
+# textfile collector), anything else JSON. Unset means no file.
+SYNC_METRICS_PATH = os.getenv("SYNC_METRICS_PATH")
+SYNC_METRICS_INTERVAL = 60
+
+
+class SyncTrace:
+    """Phase timings and counts of one account sync.
+
+    Spans nest, and a phase only gets its own time: symbol lookups made while
+    building closed trades count as "symbols", not "aggregation".
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.retries = {}
+        self.deals = 0
+        self.positions = 0
+        self.status = None
+        # time spent in child spans, one entry per open span
+        self.stack = []
+
+    @contextmanager
+    def span(self, phase: str):
+        started = time.perf_counter()
+        self.stack.append(0.0)
+        try:
+            yield
+        finally:
+            nested = self.stack.pop()
+            elapsed = time.perf_counter() - started
+            self.phases[phase] = self.phases.get(phase, 0.0) + elapsed - nested
+            if self.stack:
+                self.stack[-1] += elapsed
+
+    def retry(self, call: str):
+        self.retries[call] = self.retries.get(call, 0) + 1
+
+    def finish(self, status: bool):
+        self.status = status
+        self.phases["total"] = time.perf_counter() - self.started
+        return self.to_dict()
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "phases": self.phases,
+            "retries": self.retries,
+            "deals": self.deals,
+            "positions": self.positions
+        }
+
+
+class Histogram:
+    def __init__(self, buckets: list = SYNC_METRICS_BUCKETS):
+        self.buckets = buckets
+        # counts[i] observations <= buckets[i] and > buckets[i - 1], the last one is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float):
+        """Estimated like Prometheus' histogram_quantile, linear within the bucket."""
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    # beyond the largest bound, all we know is it is at least that
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+
+        return self.buckets[-1]
+
+
+class SyncMetrics:
+    """Latency histograms per sync phase plus retry, deal, position and sync counters."""
+
+    def __init__(self, buckets: list = SYNC_METRICS_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.retries = {}
+        self.deals = 0
+        self.positions = 0
+        self.syncs = {"ok": 0, "failed": 0}
+
+    def record(self, trace: dict):
+        with self.lock:
+            for phase, seconds in trace.get("phases", {}).items():
+                if phase not in self.phases:
+                    self.phases[phase] = Histogram(self.buckets)
+                self.phases[phase].observe(seconds)
+
+            for call, count in trace.get("retries", {}).items():
+                self.retries[call] = self.retries.get(call, 0) + count
+
+            self.deals += trace.get("deals", 0)
+            self.positions += trace.get("positions", 0)
+            self.syncs["ok" if trace.get("status") else "failed"] += 1
+
+    def to_json(self):
+        with self.lock:
+            return {
+                "syncs": dict(self.syncs),
+                "deals": self.deals,
+                "positions": self.positions,
+                "retries": dict(self.retries),
+                "phases": {
+                    phase: {
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "p50": histogram.quantile(0.5),
+                        "p90": histogram.quantile(0.9),
+                        "p99": histogram.quantile(0.99),
+                        "buckets": dict(zip([*map(str, histogram.buckets), "+Inf"], histogram.counts))
+                    } for phase, histogram in self.phases.items()
+                }
+            }
+
+    def to_prometheus(self):
+        lines = [
+            "# HELP mt5_sync_phase_seconds Time spent in each phase of an account sync.",
+            "# TYPE mt5_sync_phase_seconds histogram"
+        ]
+
+        with self.lock:
+            for phase, histogram in self.phases.items():
+                cumulative = 0
+                for bound, count in zip([*map(str, histogram.buckets), "+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f'mt5_sync_phase_seconds_bucket{{phase="{phase}",le="{bound}"}} {cumulative}')
+                lines.append(f'mt5_sync_phase_seconds_sum{{phase="{phase}"}} {histogram.sum}')
+                lines.append(f'mt5_sync_phase_seconds_count{{phase="{phase}"}} {histogram.count}')
+
+            lines += [
+                "# HELP mt5_sync_retries_total Failed MetaTrader5 calls that were retried.",
+                "# TYPE mt5_sync_retries_total counter",
+                *(f'mt5_sync_retries_total{{call="{call}"}} {count}' for call, count in self.retries.items()),
+                "# HELP mt5_syncs_total Account syncs by outcome.",
+                "# TYPE mt5_syncs_total counter",
+                *(f'mt5_syncs_total{{status="{status}"}} {count}' for status, count in self.syncs.items()),
+                "# HELP mt5_sync_deals_total History deals fetched from terminals.",
+                "# TYPE mt5_sync_deals_total counter",
+                f"mt5_sync_deals_total {self.deals}",
+                "# HELP mt5_sync_positions_total Open positions read from terminals.",
+                "# TYPE mt5_sync_positions_total counter",
+                f"mt5_sync_positions_total {self.positions}"
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.to_json(), indent=2)
+
+        # written next to the target and renamed, so a scraper never reads half a file
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+
+
+_sync_metrics = None
+
+
+def get_sync_metrics():
+    global _sync_metrics
+    if _sync_metrics is None:
+        _sync_metrics = SyncMetrics()
+    return _sync_metrics
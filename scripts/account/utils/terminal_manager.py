@@ -1,9 +1,25 @@
-from utils.database import supabase
+from utils.allocator import get_allocator, new_holder_id, LeaseHeartbeat
+from utils.mt5_backend import get_mt5_backend
+from utils.admission import AdmissionQueue
 from datetime import datetime, timezone
-from collections import defaultdict
+from utils.session_cache import SESSION_IDLE_TIMEOUT
+from utils.deal_store import DealStore
+from utils.deal_arrays import deals_to_array, aggregate_positions
+from utils.symbol_index import SymbolIndex
+from utils.trade_stats import TradeStats
+from utils.sync_metrics import SyncTrace, get_sync_metrics
+from utils.retry import RetryPolicy, Deadline
+from utils.equity_curve import EquityCurve, CURVE_INTERVALS, EQUITY_CURVE_INTERVAL
 from loguru import logger
 import asyncio
+import functools
+import hashlib
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+import time
+from dateutil import parser
 from dateutil.relativedelta import relativedelta
+import numpy as np
 
 
 TRADE_DEAL_TYPES = {
@@ -54,16 +70,60 @@ MARGIN_MODES = {
 }
 
 DELAY_FOR_ACCOUNT_FETCH = 0
-DELAY_FOR_ACCOUNT_FETCH_RE_ENTRY = 0.25
+# history is fetched in windows of this many months
+HISTORY_CHUNK_MONTHS = 1
+
+# sections a sync can return, and the terminal data each one needs:
+# account -> account_info(), positions -> positions_get(), history -> history_deals_get()
+SYNC_SECTIONS = {
+    "account": {"account"},
+    "account_info": {"account", "positions", "history"},
+    "open_trades": {"positions"},
+    "closed_trades": {"history"},
+    "balance_trades": {"history"},
+    "equity_curve": {"history"},
+    "raw": {"account", "positions", "history"}
+}
+REFINED_SECTIONS = ["account_info", "balance_trades", "open_trades", "closed_trades"]
 
-class TerminalManager:
-    import MetaTrader5 as mt5
-    retry_limit = 3
 
-    def __init__(self):
-        self.symbols_info = {}
+def to_msc(date: datetime):
+    return int(date.timestamp() * 1000)
+
+
+def from_msc(time_msc: int):
+    return datetime.fromtimestamp(time_msc / 1000)
+
 
-    async def get_available_terminal(terminal_number = None):
+def is_authorization_error(error):
+    return bool(error) and error[0] == -6 and error[1] == "Terminal: Authorization failed"
+
+class TerminalManager:
+    # backoff for every MetaTrader5 call, see utils/retry.py
+    retry_policy = RetryPolicy()
+    # requests of this process waiting for a free terminal
+    admission = AdmissionQueue()
+
+    def __init__(self, mt5 = None):
+        # the MetaTrader5 module, or a stand-in with the same functions, see utils/mt5_backend.py
+        self.mt5 = mt5 or get_mt5_backend()
+        self.symbol_index = SymbolIndex()
+        # broker server of the connected account, keys the symbol index
+        self.server = None
+        # owner of the terminal leases this manager takes, see utils/allocator.py
+        self.holder = new_holder_id()
+        self.heartbeat = None
+        # the account a pinned terminal is still logged in to, see connect()
+        self.session = None
+        self.deal_store = DealStore()
+        # phase timings of the current sync, see utils/sync_metrics.py
+        self.trace = SyncTrace()
+        # time budget of the current sync, retries stop once it is spent
+        self.deadline = None
+        # one thread per session for every blocking MetaTrader5 and database call
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mt5-session")
+
+    async def get_available_terminal(terminal_number = None, holder = None, server = None):
         if terminal_number and terminal_number != 0:
             logger.success(f"🟢 Terminal T{terminal_number} allocated.")
             return {
@@ -75,21 +135,17 @@ class TerminalManager:
                 }
             }
             
-        response = (
-            supabase.rpc("allocate_free_mt5_terminal")
-            .execute()
-        )
+        # the allocator is a database round-trip, kept off the event loop; so is building it on first use
+        terminal = await asyncio.to_thread(lambda: get_allocator().allocate(holder or new_holder_id(), server=server))
 
-        terminals = response.data
-
-        if len(terminals):
-            logger.success(f"🟢 Terminal {terminals[0].get("id")} allocated.")
+        if terminal:
+            logger.success(f"🟢 Terminal {terminal.get('id')} allocated.")
             return {
                 "status": True,
-                "message": f"🟢 Terminal {terminals[0].get("id")} allocated.",
+                "message": f"🟢 Terminal {terminal.get('id')} allocated.",
                 "data": {
-                    "id": terminals[0].get("id"),
-                    "path": terminals[0].get("path")
+                    "id": terminal.get("id"),
+                    "path": terminal.get("path")
                 }
             }
         else:
@@ -98,20 +154,13 @@ class TerminalManager:
                 "message": "❌ No free terminals."
             }
 
-    async def release_terminal(terminal_id: str, terminal_number = None):
+    async def release_terminal(terminal_id: str, terminal_number = None, holder = None):
         if terminal_number and terminal_number != 0:
             logger.success(f"🔵 Terminal {terminal_id} released.")
             return True
         
         try:
-            response = (
-                supabase.table("mt5_terminals")
-                .update({"in_use": False})
-                .eq("id", terminal_id)
-                .execute()
-            )
-
-            if len(response.data):
+            if await asyncio.to_thread(lambda: get_allocator().release(terminal_id, holder)):
                 logger.success(f"🔵 Terminal {terminal_id} released.")
                 return True
             else:
@@ -121,121 +170,313 @@ class TerminalManager:
             return False
         
 
-    async def get_refined_account_data(self, login: str, password: str, server: str):
+    async def connect(self, login: str, password: str, server: str, terminal_number = None, timeout = None):
+        self.server = server
+
+        with self.trace.span("session_check"):
+            session_live = await self.is_session_live(login, password, server, terminal_number)
+
+        if session_live:
+            self.session["last_used"] = time.monotonic()
+            logger.info(f"♻️ Reusing session for {login} on {self.session['terminal'].get('data').get('id')}")
+            return self.session["terminal"], None
+
         # Shut down any existing connection
-        self.mt5.shutdown()
-        terminal = await TerminalManager.get_available_terminal()
+        await self.run_blocking(self.mt5.shutdown)
+        self.session = None
+        with self.trace.span("allocation"):
+            terminal = await self.acquire_terminal(terminal_number, timeout, server)
 
         if not terminal.get("status"):
             logger.warning(terminal.get("message"))
-            return {
+            return None, {
                 "status": False,
                 "message": terminal.get("message")
             }
 
-        def initialize_mt5():
-            # logic to retry empty initialize_mt5
-            for attempt in range(self.retry_limit):
-                initialize = self.mt5.initialize(path=terminal.get("data").get(
-                    "path"), login=login, password=password, server=server, timeout=5000, portable=True)
-                
-                if initialize:
-                    return initialize
-                logger.info(f"Attempt {attempt + 1} failed for initialize_mt5")
+        try:
+            if not terminal_number:
+                # keep the lease alive while we log in and sync, however long that takes
+                allocator = await asyncio.to_thread(get_allocator)
+                self.heartbeat = LeaseHeartbeat(allocator, terminal.get("data").get("id"), self.holder).start()
+
+            last_error = None
+
+            def initialize_mt5():
+                # last_error() read right after the attempt, on the session thread like every MetaTrader5 call
+                nonlocal last_error
+                result = self.mt5.initialize(path=terminal.get("data").get("path"), login=login, password=password,
+                                             server=server, timeout=5000, portable=True)
+                last_error = None if result else self.mt5.last_error()
+                return result
+
+            initialize = await self.call_mt5(
+                "initialize_mt5", initialize_mt5, span="initialize",
+                # wrong credentials stay wrong, retrying only risks locking the account
+                permanent=lambda _: is_authorization_error(last_error))
+
+            if not initialize:
+                error = last_error
+                await self.disconnect(terminal, terminal_number)
+                logger.warning(f"abort mt op -> {error[1]}")
             
-            return None
+                if is_authorization_error(error):
+                    return None, {
+                        "status": False,
+                        "message": f"❌ Invalid trading account credentials"
+                    }
+                else:
+                    return None, {
+                        "status": False,
+                        "message": f"❌ Could not initailize trading account"
+                    }
+
+            if terminal_number:
+                # only a pinned terminal stays ours between syncs, so only it can keep a session
+                self.session = {
+                    "key": (login, server),
+                    "password": hashlib.sha256(password.encode("utf-8")).hexdigest(),
+                    "terminal_number": terminal_number,
+                    "terminal": terminal,
+                    "last_used": time.monotonic()
+                }
         
-        initialize = initialize_mt5()
+            await asyncio.sleep(DELAY_FOR_ACCOUNT_FETCH)
+        except BaseException:
+            # an initialize that raised (or a cancelled sync) must not leave the heartbeat
+            # renewing a lease nobody holds
+            await self.disconnect(terminal, terminal_number)
+            raise
+
+        return terminal, None
+
+    async def acquire_terminal(self, terminal_number = None, timeout = None, server = None):
+        if terminal_number:
+            return await TerminalManager.get_available_terminal(terminal_number, self.holder)
+
+        async def try_allocate():
+            # prefer a terminal whose Bases cache is already warm for this broker
+            terminal = await TerminalManager.get_available_terminal(None, self.holder, server)
+            return terminal if terminal.get("status") else None
+
+        # wait in line for a terminal instead of failing as soon as the pool is exhausted
+        terminal, message = await TerminalManager.admission.admit(try_allocate, timeout)
+        return terminal or {
+            "status": False,
+            "message": message
+        }
 
-        if not initialize:
-            error = self.mt5.last_error()
-            self.mt5.shutdown()
-            await TerminalManager.release_terminal(terminal.get("data").get("id"))
-            logger.warning(f"abort mt op -> {error[1]}")
-            
-            if error and error[0] == -6 and error[1] == "Terminal: Authorization failed":
+    async def is_session_live(self, login: str, password: str, server: str, terminal_number = None):
+        session = self.session
+        if not session or not terminal_number or session["terminal_number"] != terminal_number:
+            return False
+
+        if session["key"] != (login, server):
+            return False
+
+        if session["password"] != hashlib.sha256(password.encode("utf-8")).hexdigest():
+            return False
+
+        if time.monotonic() - session["last_used"] > SESSION_IDLE_TIMEOUT:
+            return False
+
+        # cheap local check that the terminal is still logged in to this account
+        info = await self.run_blocking(self.mt5.account_info)
+        return bool(info) and info.login == login
+
+    async def disconnect(self, terminal, terminal_number = None):
+        if self.session and terminal_number:
+            # keep the pinned terminal logged in for the next sync of this account
+            self.session["last_used"] = time.monotonic()
+            return
+
+        if self.heartbeat:
+            self.heartbeat.stop()
+            self.heartbeat = None
+
+        await self.run_blocking(self.mt5.shutdown)
+        await TerminalManager.release_terminal(terminal.get("data").get("id"), terminal_number, self.holder)
+        TerminalManager.admission.notify()
+
+    def close(self):
+        # a resident manager lives as long as its process; one-shot use (index.py, tests,
+        # benchmarks) closes it so the session thread does not outlive it
+        if self.heartbeat:
+            self.heartbeat.stop()
+            self.heartbeat = None
+        self.executor.shutdown(wait=False)
+
+    async def get_refined_account_data(self, login: str, password: str, server: str, start_date = None, end_date = None,
+                                       terminal_number = None, timeout = None):
+        data = await self.sync_account(login, password, server, REFINED_SECTIONS, start_date, end_date,
+                                       terminal_number, timeout)
+        if not data.get("status"):
+            return data
+
+        return {
+            "status": True,
+            "message": "🟢 Account synced and verified successfully",
+            "data": data.get("data")
+        }
+
+    async def sync_account(self, login: str, password: str, server: str, sections: list, start_date = None,
+                           end_date = None, terminal_number = None, timeout = None, curve_interval = EQUITY_CURVE_INTERVAL):
+        # fetch plan: only the MetaTrader5 calls the requested sections depend on are made
+        self.trace = SyncTrace()
+        self.deadline = Deadline()
+        sections = list(dict.fromkeys(sections or REFINED_SECTIONS))
+        unknown = [s for s in sections if s not in SYNC_SECTIONS]
+        if unknown:
+            return {
+                "status": False,
+                "message": f"❌ Unknown sections: {', '.join(unknown)}"
+            }
+
+        if "equity_curve" in sections and curve_interval not in CURVE_INTERVALS:
+            return {
+                "status": False,
+                "message": f"❌ Unknown equity curve interval: {curve_interval}"
+            }
+
+        inputs = set().union(*(SYNC_SECTIONS[s] for s in sections))
+
+        if "history" in inputs:
+            # the requested window is checked before a terminal is allocated and logged in
+            try:
+                start_date, end_date = TerminalManager.get_history_window(start_date, end_date)
+            except (ValueError, OverflowError):
                 return {
                     "status": False,
-                    "message": f"❌ Invalid trading account credentials"
+                    "message": "❌ Invalid start_date or end_date"
                 }
-            else:
+
+            if start_date >= end_date:
                 return {
                     "status": False,
-                    "message": f"❌ Could not initailize trading account"
+                    "message": "❌ start_date must be before end_date"
                 }
-        
-        await asyncio.sleep(DELAY_FOR_ACCOUNT_FETCH)
-        
-        # history deals
-        history_deals = await self.get_history_deals()
-        
-        # balance trades
-        balance_trades = TerminalManager.get_balance_trades(history_deals)
-
-        # closed positions
-        closed_trades = await self.get_closed_trades(history_deals)
 
-        # open positions
-        open_trades = await self.get_open_trades()
+        terminal, error = await self.connect(login, password, server, terminal_number, timeout)
 
-        # account info
-        account_info = await self.get_account_info(open_trades, closed_trades, balance_trades)
+        if error:
+            self.record_trace(login, False)
+            return error
 
-        self.mt5.shutdown()
-        await TerminalManager.release_terminal(terminal.get("data").get("id"))
+        synced = False
+        try:
+            account = await self.fetch_account_info() if "account" in inputs else None
+            positions = await self.fetch_positions() if "positions" in inputs else None
+
+            if "history" in inputs:
+                # history deals of the requested window, merged into the local deal store
+                with self.trace.span("history"):
+                    await self.sync_history_deals(login, server, start_date, end_date)
+                since_msc, until_msc = to_msc(start_date), to_msc(end_date)
+
+            results = {}
+
+            if "balance_trades" in sections or "account_info" in sections:
+                with self.trace.span("store"):
+                    results["balance_trades"] = await self.run_blocking(
+                        self.deal_store.load, login, server, since_msc, until_msc, deal_type=2)
+
+            if "closed_trades" in sections or "account_info" in sections:
+                # closed positions, from the columnar copy of the stored deals
+                with self.trace.span("store"):
+                    deal_array = await self.run_blocking(self.deal_store.array, login, server, since_msc, until_msc)
+                with self.trace.span("aggregation"):
+                    results["closed_trades"] = await self.get_closed_trades(deal_array=deal_array)
+
+            with self.trace.span("aggregation"):
+                if "open_trades" in sections or "account_info" in sections:
+                    results["open_trades"] = await self.get_open_trades(positions or ())
+
+                if "account_info" in sections:
+                    results["account_info"] = await self.get_account_info(
+                        results["open_trades"], results["closed_trades"], results["balance_trades"], account)
+
+                if "equity_curve" in sections:
+                    results["equity_curve"] = await self.run_blocking(self.get_equity_curve, login, server, curve_interval)
+
+                if "account" in sections:
+                    results["account"] = account._asdict() if account else None
+
+            if "raw" in sections:
+                with self.trace.span("store"):
+                    results["raw"] = {
+                        "account_info": account._asdict() if account else None,
+                        "positions": [p._asdict() for p in positions or []],
+                        "history_deals": await self.run_blocking(self.deal_store.load, login, server, since_msc, until_msc)
+                    }
+            synced = True
+        finally:
+            # always hand the terminal back, even when a step above raises
+            with self.trace.span("release"):
+                await self.disconnect(terminal, terminal_number)
+            self.record_trace(login, synced)
 
         return {
             "status": True,
-            "message": "🟢 Account synced and verified successfully",
-            "data": {
-                "account_info": account_info,
-                "balance_trades": balance_trades,
-                "open_trades": open_trades,
-                "closed_trades": closed_trades
-
-            }
+            "message": "🟢 Account synced successfully",
+            "data": {section: results[section] for section in sections}
         }
 
-    async def get_account_info(self, open_trades, closed_trades, balance_trades):
-        # logic to retry empty account_info
-        async def account_info():
-            for attempt in range(self.retry_limit):
-                info = self.mt5.account_info()
-                if info:
-                    return info
-                logger.info(f"Attempt {attempt + 1} failed for account_info")
-                await asyncio.sleep(DELAY_FOR_ACCOUNT_FETCH_RE_ENTRY)
-            
+    def record_trace(self, login, status):
+        trace = self.trace.finish(status)
+        get_sync_metrics().record(trace)
+        logger.info(f"⏱️ Sync of {login} took {trace['phases']['total']:.3f}s: " + ", ".join(
+            f"{phase} {seconds:.3f}s" for phase, seconds in trace["phases"].items() if phase != "total"))
+
+    async def run_blocking(self, call, *args, **kwargs):
+        # MetaTrader5 and the local stores block, so they run on this session's own thread
+        # and the event loop stays free for other requests, heartbeats and metrics
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(call, *args, **kwargs))
+
+    async def call_mt5(self, name: str, call, span: str = None, done = bool, permanent = None):
+        # one MetaTrader5 call under the shared retry policy and the sync's time budget;
+        # call may also be a coroutine function built from other call_mt5 calls
+        async def run_call():
+            if inspect.iscoroutinefunction(call):
+                return await call()
+            return await self.run_blocking(call)
+
+        async def timed_call():
+            if not span:
+                return await run_call()
+            with self.trace.span(span):
+                return await run_call()
+
+        return await TerminalManager.retry_policy.run(
+            timed_call, name, done=done, permanent=permanent, deadline=self.deadline, on_retry=self.trace.retry)
+
+    async def fetch_account_info(self):
+        info = await self.call_mt5("account_info", self.mt5.account_info, span="account_info")
+        return info or None
+
+    async def fetch_positions(self):
+        # MetaTrader5 answers () for an account without open positions and None on failure,
+        # so only None is retried
+        positions = await self.call_mt5("get_positions", self.mt5.positions_get, span="positions",
+                                        done=lambda positions: positions is not None)
+
+        if positions is None:
+            logger.warning(f"positions -> {await self.run_blocking(self.mt5.last_error)}")
             return None
-        
-        account_info = await account_info()
+
+        self.trace.positions += len(positions)
+        return positions
+
+    async def get_account_info(self, open_trades, closed_trades, balance_trades, account_info = None):
+        if account_info is None:
+            account_info = await self.fetch_account_info()
         if not account_info:
             return None
 
         account_info_dict = account_info._asdict()
-        deposits = sum(t["profit"] for t in balance_trades if t["profit"] >= 0)
-        withdrawals = sum(t["profit"] for t in balance_trades if t["profit"] < 0)
-            
-        total_trades = sum([len(open_trades), len(closed_trades)])
-
-
-        winning_trades = [t for t in closed_trades if t["profit"] > 0] + [t for t in open_trades if t["profit"] > 0]
-        average_win = sum(t["profit"] for t in winning_trades) / \
-            len(winning_trades) if winning_trades else 0
-        won_trades_percent = (len(winning_trades) /
-                              len(closed_trades + open_trades)) * 100 if len(closed_trades + open_trades) > 0 else 0
-        total_pips = sum(t.get("pips", 0) for t in closed_trades)
-
-        closed_trades_profit = sum([d["profit"] for d in closed_trades])
-        open_trades_profit = sum([d["profit"] for d in open_trades])
-        total_profit = sum([closed_trades_profit, open_trades_profit])
-        
+        # every trade and balance deal is visited once, see utils/trade_stats.py
+        stats = TradeStats.collect(closed_trades, open_trades, balance_trades).result()
         balance = account_info_dict["balance"]
 
-        gain = (sum([d["gain"] for d in closed_trades]) / len(closed_trades)) if len(closed_trades) > 0 else 0
-
-        swap = sum([d["swap"] for d in closed_trades]) + sum([d["swap"] for d in open_trades])
-
         return {
             "balance": balance,
             "leverage": account_info_dict["leverage"],
@@ -243,16 +484,16 @@ class TerminalManager:
             "trade_mode": TRADE_MODES.get(account_info_dict["trade_mode"], account_info_dict["trade_mode"]),
             "currency": account_info_dict["currency"],
             "equity": account_info_dict["equity"],
-            "swap": swap,
-            "profit": (balance - (withdrawals)) - deposits,
-            "gain": gain,
-            "deposits": deposits,
-            "withdrawals": withdrawals,
-            "trades": total_trades,
-            "average_win": average_win,
+            "swap": stats["swap"],
+            "profit": (balance - (stats["withdrawals"])) - stats["deposits"],
+            "gain": stats["gain"],
+            "deposits": stats["deposits"],
+            "withdrawals": stats["withdrawals"],
+            "trades": stats["trades"],
+            "average_win": stats["average_win"],
             "margin_mode": MARGIN_MODES.get(account_info_dict["margin_mode"], account_info_dict["margin_mode"]),
-            "won_trades_percent": won_trades_percent,
-            "pips": round(total_pips / 1000, 2),
+            "won_trades_percent": stats["won_trades_percent"],
+            "pips": stats["pips"],
             "commission_blocked": account_info_dict["commission_blocked"],
             "name": account_info_dict["name"],
             "company": account_info_dict["company"],
@@ -271,66 +512,166 @@ class TerminalManager:
             "margin_initial": account_info_dict["margin_initial"],
             "margin_maintenance": account_info_dict["margin_maintenance"],
             "assets": account_info_dict["assets"],
-            "liabilities": account_info_dict["liabilities"]
+            "liabilities": account_info_dict["liabilities"],
+            "profit_factor": stats["profit_factor"],
+            "expectancy": stats["expectancy"],
+            "average_loss": stats["average_loss"],
+            "largest_win": stats["largest_win"],
+            "largest_loss": stats["largest_loss"],
+            "by_symbol": stats["by_symbol"],
+            "by_magic": stats["by_magic"]
         }
 
-    async def get_history_deals(self):
-        # logic to retry empty history deals
-        async def history_deals():
-            end_date = datetime.now() + relativedelta(days=1)
-            start_date = (end_date - relativedelta(years=3)) + relativedelta(days=1)
-
-            for attempt in range(self.retry_limit):
-                deals = self.mt5.history_deals_get(start_date, end_date)
-                if deals:
-                    return deals
-                logger.info(f"Attempt {attempt + 1} failed for get_history_deals")
-                await asyncio.sleep(DELAY_FOR_ACCOUNT_FETCH_RE_ENTRY)
-            
+    def get_equity_curve(self, login, server, interval = EQUITY_CURVE_INTERVAL):
+        # over every stored deal rather than the requested window, so drawdown covers the known history;
+        # the checkpoint in the deal store means a sync only folds in the deals it added
+        deals, _ = self.deal_store.array(login, server)
+        name = f"equity_curve:{interval or 'deal'}"
+        curve = EquityCurve(interval, self.deal_store.checkpoint(login, server, name))
+
+        rebuilt = not curve.matches(deals)
+        if rebuilt:
+            # deals older than the checkpoint were merged since, start over
+            curve = EquityCurve(interval)
+
+        if curve.extend(deals) or rebuilt:
+            # only the points this sync added (or the last bucket it changed) are written
+            self.deal_store.save_checkpoint(login, server, name, curve.to_state(), curve.points, curve.points_from)
+
+        return curve.result(self.deal_store.checkpoint_points(login, server, name))
+
+    def get_history_window(start_date = None, end_date = None):
+        # requested window, or the last three years; dates may be datetimes or date strings
+        if isinstance(start_date, str):
+            start_date = parser.parse(start_date) if start_date.strip() else None
+        if isinstance(end_date, str):
+            end_date = parser.parse(end_date) if end_date.strip() else None
+        if not isinstance(start_date, (datetime, type(None))) or not isinstance(end_date, (datetime, type(None))):
+            raise ValueError("start_date and end_date must be datetimes or date strings")
+
+        # "…Z" from JS toISOString() parses timezone-aware; everything here (datetime.now(),
+        # from_msc) is naive local time, so aware dates are converted to that
+        if start_date and start_date.tzinfo:
+            start_date = start_date.astimezone().replace(tzinfo=None)
+        if end_date and end_date.tzinfo:
+            end_date = end_date.astimezone().replace(tzinfo=None)
+
+        end_date = end_date or datetime.now() + relativedelta(days=1)
+        start_date = start_date or (end_date - relativedelta(years=3)) + relativedelta(days=1)
+        return start_date, end_date
+
+    def iter_history_windows(start_date, end_date):
+        # bounded windows, so one history_deals_get call never returns years of deals
+        window_start = start_date
+        while window_start < end_date:
+            window_end = min(window_start + relativedelta(months=HISTORY_CHUNK_MONTHS), end_date)
+            yield window_start, window_end
+            window_start = window_end
+
+    async def iter_history_deals(self, start_date, end_date):
+        # history deals of the window, one chunk of dicts at a time; None for a window that failed
+        for window_start, window_end in TerminalManager.iter_history_windows(start_date, end_date):
+            deals = await self.fetch_history_deals(window_start, window_end, allow_empty=True)
+            yield None if deals is None else [d._asdict() for d in deals]
+
+    async def get_history_deals(self, login, server, start_date = None, end_date = None):
+        start_date, end_date = TerminalManager.get_history_window(start_date, end_date)
+        await self.sync_history_deals(login, server, start_date, end_date)
+        return await self.run_blocking(self.deal_store.load, login, server, to_msc(start_date), to_msc(end_date))
+
+    async def sync_history_deals(self, login, server, start_date, end_date):
+        # bring the local deal store up to date for the window: history older than what we
+        # have ever fetched, plus deals since the last fetch
+        covered_from, covered_to = await self.run_blocking(self.deal_store.coverage, login, server)
+        ranges = []
+
+        if covered_from is None:
+            ranges.append((start_date, end_date))
+        else:
+            if to_msc(start_date) < covered_from:
+                ranges.append((start_date, from_msc(covered_from)))
+            if to_msc(end_date) > covered_to:
+                # re-read a day before the last fetch to cover the broker's server-time offset,
+                # duplicates are merged by ticket
+                fetch_from = max(start_date, from_msc(covered_to) - relativedelta(days=1))
+                ranges.append((fetch_from, end_date))
+
+        for fetch_from, fetch_to in ranges:
+            async def fetch_range():
+                fetched = 0
+                # windows share their boundaries, duplicates are merged by ticket
+                async for deals in self.iter_history_deals(fetch_from, fetch_to):
+                    if deals is None:
+                        return None
+                    await self.run_blocking(self.deal_store.merge, login, server, deals)
+                    fetched += len(deals)
+                return fetched
+
+            # right after login the terminal may not have loaded the history yet, so a first
+            # sync that finds nothing at all is retried; a window that failed is not
+            fetched = await self.call_mt5("history_sync", fetch_range,
+                                          done=lambda fetched: fetched is None or fetched or covered_from is not None)
+
+            if fetched is None:
+                # leave the range uncovered so the next sync asks for it again
+                logger.warning(f"❌ History from {fetch_from} to {fetch_to} could not be fetched")
+                continue
+
+            # never past now, deals can still arrive for the rest of a window that ends in the future
+            await self.run_blocking(self.deal_store.mark_covered, login, server, to_msc(fetch_from),
+                                    min(to_msc(fetch_to), to_msc(datetime.now())))
+
+    async def fetch_history_deals(self, start_date, end_date, allow_empty = False):
+        # None is a failure; () is a window without deals, retried only when not allow_empty
+        deals = await self.call_mt5(
+            "get_history_deals", lambda: self.mt5.history_deals_get(start_date, end_date), span="history_deals_get",
+            done=lambda deals: bool(deals) or (allow_empty and deals is not None))
+
+        if deals is None:
+            logger.warning(f"deals -> {await self.run_blocking(self.mt5.last_error)}")
             return None
-        
 
-        deals = await history_deals()
-        
-        if not deals:
-            logger.warning("deals -> ", self.mt5.last_error())
-            return []
+        self.trace.deals += len(deals)
+        return deals
+
 
-        return [d._asdict() for d in deals]
+    async def get_symbols_info(self, symbols: list):
+        # metadata for every symbol a sync needs, loaded in one batch before the trade loops:
+        # the per-server index first, then the terminal for missing or expired symbols
+        with self.trace.span("symbols"):
+            symbols = list(dict.fromkeys(symbols))
+            symbols_info = await self.run_blocking(self.symbol_index.get_many, self.server, symbols)
+            fetched = {}
 
+            for symbol in symbols:
+                if symbol in symbols_info:
+                    continue
+
+                info = await self.fetch_symbol_info(symbol)
+                if info:
+                    fetched[symbol] = info
+
+            await self.run_blocking(self.symbol_index.put_many, self.server, fetched)
+        return {**symbols_info, **fetched}
 
     async def get_symbol_info(self, symbol):
+        return (await self.get_symbols_info([symbol])).get(symbol)
+
+    async def fetch_symbol_info(self, symbol):
         try:
-            existing_symbol_info = self.symbols_info.get(symbol, False)
-            
-            if existing_symbol_info:
-                return existing_symbol_info
-
-            if self.mt5.symbol_select(symbol, True):
-                # logic to retry empty symbol info
-                async def get_symbols():
-                    for attempt in range(self.retry_limit):
-                        info = self.mt5.symbol_info(symbol)
-                        if info:
-                            return info
-                        logger.info(f"Attempt {attempt + 1} failed for get_symbol_info")
-                        await asyncio.sleep(DELAY_FOR_ACCOUNT_FETCH_RE_ENTRY)
-                    
-                    return None
-        
-                info = await get_symbols()
+            if await self.run_blocking(self.mt5.symbol_select, symbol, True):
+                info = await self.call_mt5("get_symbol_info", lambda: self.mt5.symbol_info(symbol))
                 
                 if info:
                     symbol_dict = info._asdict()
-                    new_symbol_info = {
-                        "trade_contract_size": symbol_dict.get("trade_contract_size", 0)
+                    return {
+                        "trade_contract_size": symbol_dict.get("trade_contract_size", 0),
+                        "digits": symbol_dict.get("digits", 5),
+                        "point": symbol_dict.get("point", 0),
+                        "trade_tick_value": symbol_dict.get("trade_tick_value", 0)
                     }
-                    
-                    self.symbols_info[symbol] = new_symbol_info
-                    
-                    return new_symbol_info
 
-            logger.warning("symbol -> ", self.mt5.last_error())
+            logger.warning(f"symbol -> {await self.run_blocking(self.mt5.last_error)}")
         except Exception as e:
             logger.warning("❌ Failed to get symbol data")
 
@@ -348,25 +689,15 @@ class TerminalManager:
         return change_percent
 
 
-    async def get_open_trades(self):
-        # logic to retry empty open trades
-        async def get_positions():
-            for attempt in range(self.retry_limit):
-                positions = self.mt5.positions_get()
-                if positions:
-                    return positions
-                logger.info(f"Attempt {attempt + 1} failed for get_open_trades")
-                await asyncio.sleep(DELAY_FOR_ACCOUNT_FETCH_RE_ENTRY)
-            
-            return None
-        
-        positions = await get_positions()
+    async def get_open_trades(self, positions = None):
+        if positions is None:
+            positions = await self.fetch_positions()
 
         if not positions:
-            logger.warning("positions -> ", self.mt5.last_error())
             return []
 
         open_trades = [d._asdict() for d in positions]
+        symbols_info = await self.get_symbols_info([t["symbol"] for t in open_trades])
         result = []
 
         for open_trade in open_trades:
@@ -378,7 +709,7 @@ class TerminalManager:
                     open_trade["volume"])) * 100) if open_trade["price_open"] > 0 else 0
             
             symbol = open_trade["symbol"]
-            symbol_info = await self.get_symbol_info(symbol)
+            symbol_info = symbols_info.get(symbol, {})
 
             contract_size = symbol_info.get("trade_contract_size", 0)
             
@@ -408,56 +739,38 @@ class TerminalManager:
         return result
 
     
-    async def get_closed_trades(self, history_deals: list):
-        # group deals by position_id (only positive position ids)
-        trades_by_position = defaultdict(list)
-        for d in history_deals:
-            pid = d.get("position_id", 0)
-            if pid and pid > 0:
-                trades_by_position[pid].append(d)
-
-        result = []
+    async def get_closed_trades(self, history_deals: list = None, deal_array = None):
+        # columnar deals grouped by position_id (only positive position ids), see utils/deal_arrays.py
+        deals, symbols = deal_array if deal_array is not None else deals_to_array(history_deals or [])
+        positions = aggregate_positions(deals)
 
-        for position_id, deals in trades_by_position.items():
-            # split into opens, closes and others
-            open_deals = [d for d in deals if d.get("entry") == 0]
-            close_deals = [d for d in deals if d.get("entry") == 1]
-            if not open_deals or not close_deals:
-                # skip if not a fully opened & closed position (you can change this behavior)
-                continue
+        if positions is None or not len(positions["position_id"]):
+            return []
 
-            # totals and VWAPs
-            total_open_vol = sum(d.get("volume", 0.0) for d in open_deals)
-            total_close_vol = sum(d.get("volume", 0.0) for d in close_deals) or total_open_vol
+        # symbol info for every traded symbol up front instead of per position
+        codes = np.unique(positions["symbol"]).tolist()
+        symbols_info = await self.get_symbols_info([symbols[code] for code in codes])
 
-            # VWAP open price (weighted by volume)
-            open_price_vwap = sum(d.get("price", 0.0) * d.get("volume", 0.0) for d in open_deals) / total_open_vol
-            close_price_vwap = sum(d.get("price", 0.0) * d.get("volume", 0.0) for d in close_deals) / total_close_vol
+        result = []
 
-            # aggregate fees/swaps/commissions and raw profit
-            total_commission = sum(d.get("commission", 0.0) for d in deals)
-            total_swap = sum(d.get("swap", 0.0) for d in deals)
-            total_fee = sum(d.get("fee", 0.0) for d in deals)
-            total_profit_only = sum(d.get("profit", 0.0) for d in deals)
+        for position_id, deal_type, entry, magic, reason, symbol_code, total_open_vol, open_price_vwap, \
+                close_price_vwap, total_commission, total_swap, total_fee, total_profit_only, open_time_ms, \
+                close_time_ms in zip(*(positions[k].tolist() for k in (
+                    "position_id", "type", "entry", "magic", "reason", "symbol", "volume", "open_price",
+                    "close_price", "commission", "swap", "fee", "profit", "open_time_msc", "close_time_msc"))):
 
             # terminal-style net profit for the position (what the terminal shows)
             profit_net = total_profit_only + total_swap + total_commission + total_fee
 
-            # times (use time_msc when available)
-            open_time_ms = min(d.get("time_msc", d.get("time", 0) * 1000) for d in open_deals)
-            close_time_ms = max(d.get("time_msc", d.get("time", 0) * 1000) for d in close_deals)
             open_time = datetime.fromtimestamp(open_time_ms / 1000.0, tz=timezone.utc)
             close_time = datetime.fromtimestamp(close_time_ms / 1000.0, tz=timezone.utc)
             duration_minutes = (close_time - open_time).total_seconds() / 60.0
 
             # direction & representative fields (take from first open deal)
-            rep_open = open_deals[0]
-            rep_close = close_deals[-1]
-            direction = TRADE_DEAL_TYPES.get(rep_open.get("type"), "UNKNOWN")
-            symbol = rep_open.get("symbol")
+            direction = TRADE_DEAL_TYPES.get(deal_type, "UNKNOWN")
+            symbol = symbols[symbol_code]
 
-            # symbol info (await your existing symbol lookup)
-            symbol_info = await self.get_symbol_info(symbol)
+            symbol_info = symbols_info.get(symbol, {})
             contract_size = symbol_info.get("trade_contract_size", 1)
             digits = symbol_info.get("digits", 5)
 
@@ -488,9 +801,9 @@ class TerminalManager:
                 "symbol": symbol,
                 "type": direction,
                 "volume": total_open_vol,
-                "entry": rep_open.get("entry"),
-                "magic": rep_open.get("magic"),
-                "reason": rep_open.get("reason"),
+                "entry": entry,
+                "magic": magic,
+                "reason": reason,
                 # return aggregated commission/swap/fee for the position
                 "commission": total_commission,
                 "swap": total_swap,
@@ -518,100 +831,14 @@ class TerminalManager:
         return [d for d in history_deals if d["type"] == 2]
     
 
-    async def get_raw_account_data(self, login, password, server):
-        self.mt5.shutdown()
-        terminal = await TerminalManager.get_available_terminal()
-        
-        if not terminal.get("status"):
-            logger.warning(terminal.get("message"))
-            return {
-                "status": False,
-                "message": terminal.get("message")
-            }
-
-        def initialize_mt5():
-            # logic to retry empty initialize_mt5
-            for attempt in range(self.retry_limit):
-                initialize = self.mt5.initialize(path=terminal.get("data").get(
-                    "path"), login=login, password=password, server=server, timeout=5000, portable=True)
-                
-                if initialize:
-                    return initialize
-                logger.info(f"Attempt {attempt + 1} failed for initialize_mt5")
-            
-            return None
-        
-        initialize = initialize_mt5()
-
-        if not initialize:
-            error = self.mt5.last_error()
-            self.mt5.shutdown()
-            await TerminalManager.release_terminal(terminal.get("data").get("id"))
-            logger.warning(f"abort mt op -> {error[1]}")
-            
-            if error and error[0] == -6 and error[1] == "Terminal: Authorization failed":
-                return {
-                    "status": False,
-                    "message": f"❌ Invalid trading account credentials"
-                }
-            else:
-                return {
-                    "status": False,
-                    "message": f"❌ Could not initailize trading account"
-                } 
-        
-        await asyncio.sleep(DELAY_FOR_ACCOUNT_FETCH)
-
-        async def account_info():
-            for attempt in range(self.retry_limit):
-                info = self.mt5.account_info()
-                if info:
-                    return info
-                logger.info(f"Attempt {attempt + 1} failed for account_info")
-                await asyncio.sleep(DELAY_FOR_ACCOUNT_FETCH_RE_ENTRY)
-            
-            return None
-        account_info = await account_info()._asdict()
-        
-        
-        async def get_positions():
-            for attempt in range(self.retry_limit):
-                positions = self.mt5.positions_get()
-                if positions:
-                    return positions
-                logger.info(f"Attempt {attempt + 1} failed for get_positions")
-                await asyncio.sleep(DELAY_FOR_ACCOUNT_FETCH_RE_ENTRY)
-            
-            return None
-        positions = [p._asdict() for p in await get_positions() or []]
-
-
-        async def history_deals():
-            end_date = datetime.now() + relativedelta(days=1)
-            start_date = (end_date - relativedelta(years=3)) + relativedelta(days=1)
-        
-            for attempt in range(self.retry_limit):
-                history = self.mt5.history_deals_get(
-                    start_date, end_date)
-                if history:
-                    return history
-                logger.info(f"Attempt {attempt + 1} failed for history_deals")
-                await asyncio.sleep(DELAY_FOR_ACCOUNT_FETCH_RE_ENTRY)
-            
-            return None
-        
-        history = [d._asdict() for d in await history_deals() or []]
-        
-        
-        self.mt5.shutdown()
-        await TerminalManager.release_terminal(terminal.get("data").get("id"))
+    async def get_raw_account_data(self, login, password, server, start_date = None, end_date = None,
+                                   terminal_number = None, timeout = None):
+        data = await self.sync_account(login, password, server, ["raw"], start_date, end_date, terminal_number, timeout)
+        if not data.get("status"):
+            return data
 
         return {
             "status": True,
             "message": "🟢 Account fetched successfully",
-            "data": {
-                "account_info": account_info,
-                "positions": positions,
-                "history_deals": history
-            }
+            "data": data.get("data").get("raw")
         }
@@ -0,0 +1,108 @@
+from collections import defaultdict
+
+
+class TradeStats:
+    """Account statistics gathered in one pass over closed trades, open trades and balance deals.
+
+    Risk metrics (profit factor, expectancy, largest win and loss) and the per-symbol and
+    per-magic breakdowns cover closed trades only, an open trade's profit is not final.
+    """
+
+    def __init__(self):
+        self.trades = 0
+        self.closed = 0
+        self.winning = 0
+        self.winning_profit = 0.0
+        self.closed_swap = 0.0
+        self.open_swap = 0.0
+        self.pips = 0.0
+        self.gain = 0.0
+
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.losing = 0
+        self.largest_win = 0.0
+        self.largest_loss = 0.0
+
+        self.deposits = 0.0
+        self.withdrawals = 0.0
+
+        self.by_symbol = defaultdict(TradeStats.new_breakdown)
+        self.by_magic = defaultdict(TradeStats.new_breakdown)
+
+    @staticmethod
+    def new_breakdown():
+        return {"trades": 0, "won": 0, "profit": 0.0, "swap": 0.0, "volume": 0.0, "pips": 0.0}
+
+    def add_closed(self, trade: dict):
+        profit = trade["profit"]
+        self.trades += 1
+        self.closed += 1
+        self.closed_swap += trade["swap"]
+        self.pips += trade.get("pips", 0)
+        self.gain += trade["gain"]
+
+        if profit > 0:
+            self.winning += 1
+            self.winning_profit += profit
+            self.gross_profit += profit
+            self.largest_win = max(self.largest_win, profit)
+        elif profit < 0:
+            self.losing += 1
+            self.gross_loss += profit
+            self.largest_loss = min(self.largest_loss, profit)
+
+        # magic numbers are keyed as strings, which is what they become in the JSON response anyway
+        for breakdown in (self.by_symbol[trade["symbol"]], self.by_magic[str(trade["magic"])]):
+            breakdown["trades"] += 1
+            breakdown["won"] += profit > 0
+            breakdown["profit"] += profit
+            breakdown["swap"] += trade["swap"]
+            breakdown["volume"] += trade["volume"]
+            breakdown["pips"] += trade.get("pips", 0)
+
+    def add_open(self, trade: dict):
+        self.trades += 1
+        self.open_swap += trade["swap"]
+
+        if trade["profit"] > 0:
+            self.winning += 1
+            self.winning_profit += trade["profit"]
+
+    def add_balance(self, deal: dict):
+        if deal["profit"] >= 0:
+            self.deposits += deal["profit"]
+        else:
+            self.withdrawals += deal["profit"]
+
+    @staticmethod
+    def collect(closed_trades: list, open_trades: list, balance_trades: list):
+        stats = TradeStats()
+        for trade in closed_trades:
+            stats.add_closed(trade)
+        for trade in open_trades:
+            stats.add_open(trade)
+        for deal in balance_trades:
+            stats.add_balance(deal)
+        return stats
+
+    def result(self):
+        return {
+            "trades": self.trades,
+            "swap": self.closed_swap + self.open_swap,
+            "gain": self.gain / self.closed if self.closed else 0,
+            "deposits": self.deposits,
+            "withdrawals": self.withdrawals,
+            "average_win": self.winning_profit / self.winning if self.winning else 0,
+            "won_trades_percent": (self.winning / self.trades) * 100 if self.trades else 0,
+            "pips": round(self.pips / 1000, 2),
+            # gross profit over gross loss, None while there is no losing trade to divide by
+            "profit_factor": self.gross_profit / -self.gross_loss if self.gross_loss else None,
+            # average net profit per closed trade
+            "expectancy": (self.gross_profit + self.gross_loss) / self.closed if self.closed else 0,
+            "average_loss": self.gross_loss / self.losing if self.losing else 0,
+            "largest_win": self.largest_win,
+            "largest_loss": self.largest_loss,
+            "by_symbol": dict(self.by_symbol),
+            "by_magic": dict(self.by_magic)
+        }
@@ -0,0 +1,214 @@
+from utils.terminal_manager import TerminalManager
+from utils.dispatcher import TerminalPool, parse_terminal_range
+from utils.equity_curve import EQUITY_CURVE_INTERVAL
+from utils.sync_metrics import get_sync_metrics, SYNC_METRICS_PATH, SYNC_METRICS_INTERVAL
+from utils.allocator import get_allocator, TERMINAL_LEASE_TTL
+from utils.sync_cache import SyncCache, sync_key
+from utils.admission import AdmissionQueue, ADMISSION_TIMEOUT
+import os
+import sys
+# json_lines.py in the scripts folder is shared by the resident workers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from json_lines import serve_stdin, serve_lines
+import time
+import asyncio
+import json
+import argparse
+from loguru import logger
+
+# Resident account-sync worker.
+# Reads one JSON request per line and writes one JSON response per line, so the
+# MetaTrader5/supabase imports and the TerminalManager stay warm between syncs.
+#
+# request:  {"id": "1", "login": 123, "password": "...", "server": "...", "start_date": null, "end_date": null}
+# response: {"id": "1", "status": true, "message": "...", "data": {...}}
+#
+# "sections" (e.g. ["account", "open_trades"]) limits the sync to those parts, see
+# SYNC_SECTIONS in utils/terminal_manager.py; without it the full refined data is returned.
+# "curve_interval" ("day", "hour" or null for every deal) sets the equity_curve resolution.
+# "timeout" (seconds, ADMISSION_TIMEOUT by default) bounds how long a request waits in line
+# and for a free terminal, both waits together.
+# Identical requests share one in-flight sync and a successful result is reused for
+# SYNC_RESULT_TTL seconds, "fresh": true asks for a new sync regardless.
+#
+# {"id": "2", "command": "metrics"} returns the terminal wait-queue metrics and the per-phase
+# sync latency histograms; add "format": "prometheus" for them in Prometheus text format.
+
+
+class AccountWorker:
+    def __init__(self, pool: TerminalPool = None):
+        self.terminal_manager = TerminalManager()
+        # one MetaTrader5 connection per process, so without a pool syncs run one at a time;
+        # they wait for it in an admission line, with the same deadline and length cap as the pool
+        self.lock = asyncio.Lock()
+        self.admission = AdmissionQueue()
+        self.pool = pool
+        self.cache = SyncCache()
+
+    async def sync(self, login: int, password: str, server: str, start_date: str = None, end_date: str = None,
+                   timeout: float = None, sections: list = None, curve_interval: str = EQUITY_CURVE_INTERVAL,
+                   fresh: bool = False):
+        # a dashboard refresh and a participation check of the same account share one sync
+        key = sync_key(login, password, server, start_date or None, end_date or None, sections, curve_interval)
+        return await self.cache.run(key, lambda: self.run_sync(
+            login, password, server, start_date, end_date, timeout, sections, curve_interval), fresh)
+
+    async def run_sync(self, login: int, password: str, server: str, start_date: str = None, end_date: str = None,
+                       timeout: float = None, sections: list = None, curve_interval: str = EQUITY_CURVE_INTERVAL):
+        if self.pool:
+            return await self.pool.sync(login, password, server, start_date, end_date, timeout, sections,
+                                        curve_interval)
+
+        async def take_lock():
+            if self.lock.locked():
+                return None
+            await self.lock.acquire()
+            return True
+
+        # one budget for the line here and the wait for a terminal after it
+        timeout = ADMISSION_TIMEOUT if timeout is None else timeout
+        started = time.monotonic()
+        admitted, message = await self.admission.admit(take_lock, timeout)
+        if not admitted:
+            return {
+                "status": False,
+                "message": message
+            }
+
+        try:
+            # what is left of the deadline goes to waiting for a terminal
+            timeout = max(timeout - (time.monotonic() - started), 0)
+            if sections:
+                return await self.terminal_manager.sync_account(
+                    login, password, server, sections, start_date, end_date, timeout=timeout,
+                    curve_interval=curve_interval)
+            return await self.terminal_manager.get_refined_account_data(
+                login, password, server, start_date, end_date, timeout=timeout)
+        finally:
+            self.lock.release()
+            self.admission.notify()
+
+    def metrics(self, format: str = None):
+        if format == "prometheus":
+            return {
+                "status": True,
+                "data": get_sync_metrics().to_prometheus()
+            }
+
+        admission = self.pool.admission if self.pool else self.admission
+        return {
+            "status": True,
+            "data": {
+                "admission": admission.metrics(),
+                "terminals": TerminalManager.admission.metrics(),
+                "cache": self.cache.metrics(),
+                "sync": get_sync_metrics().to_json()
+            }
+        }
+
+    async def handle_line(self, line: str):
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            return {"id": None, "status": False, "message": "Invalid request"}
+
+        request_id = request.get("id")
+        if request.get("command") == "metrics":
+            return {"id": request_id, **self.metrics(request.get("format"))}
+
+        login = request.get("login")
+        password = request.get("password")
+        server = request.get("server")
+
+        if not login or not password or not server:
+            return {"id": request_id, "status": False, "message": "Invalid request"}
+
+        try:
+            data = await self.sync(int(login), password, server, request.get("start_date"), request.get("end_date"),
+                                   request.get("timeout"), request.get("sections"),
+                                   request.get("curve_interval", EQUITY_CURVE_INTERVAL), bool(request.get("fresh")))
+        except Exception as e:
+            logger.exception(f"❌ Account sync failed for {login}: {e}")
+            data = {"status": False, "message": "❌ Account sync failed"}
+
+        return {"id": request_id, **data}
+
+    async def reap_terminals(self):
+        # terminals leased by a crashed or killed process go back to the pool once their lease expires
+        while True:
+            await asyncio.sleep(TERMINAL_LEASE_TTL)
+            try:
+                # a database round-trip (and the client setup on first use), kept off the event loop
+                reaped = await asyncio.to_thread(lambda: get_allocator().reap())
+                if reaped:
+                    logger.warning(f"♻️ Reaped expired terminal leases: {', '.join(reaped)}")
+            except Exception as e:
+                logger.warning(f"❌ Failed to reap terminal leases: {e}")
+
+    async def export_metrics(self, path: str):
+        while True:
+            await asyncio.sleep(SYNC_METRICS_INTERVAL)
+            try:
+                get_sync_metrics().write(path)
+            except Exception as e:
+                logger.warning(f"❌ Failed to write sync metrics to {path}: {e}")
+
+    async def serve_stdin(self):
+        await serve_stdin(self.handle_line)
+
+    async def serve_socket(self, host: str, port: int):
+        async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            async def handle_line(line: bytes):
+                return await self.handle_line(line.decode("utf-8"))
+
+            async def write_line(response: str):
+                writer.write((response + "\n").encode("utf-8"))
+                await writer.drain()
+
+            try:
+                await serve_lines(reader.readline, handle_line, write_line)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle_client, host, port)
+        logger.success(f"🟢 Account worker listening on {host}:{port}")
+
+        async with server:
+            await server.serve_forever()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Resident account-sync worker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="serve on a local socket instead of stdin")
+    parser.add_argument("--terminals", default=None,
+                        help="run one worker process per terminal, e.g. 32, 1-32 or 1,2,5")
+    parser.add_argument("--metrics-path", default=SYNC_METRICS_PATH,
+                        help=f"write sync metrics here every {SYNC_METRICS_INTERVAL}s, *.prom for Prometheus text")
+    args = parser.parse_args()
+
+    pool = None
+    if args.terminals:
+        pool = TerminalPool(parse_terminal_range(args.terminals))
+        await pool.start()
+
+    worker = AccountWorker(pool)
+    reaper = asyncio.create_task(worker.reap_terminals())
+    exporter = asyncio.create_task(worker.export_metrics(args.metrics_path)) if args.metrics_path else None
+
+    try:
+        if args.port:
+            await worker.serve_socket(args.host, args.port)
+        else:
+            await worker.serve_stdin()
+    finally:
+        reaper.cancel()
+        if exporter:
+            exporter.cancel()
+        if pool:
+            await pool.stop()
+        worker.terminal_manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
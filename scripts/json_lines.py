@@ -0,0 +1,42 @@
+import sys
+import json
+import asyncio
+
+# The request loop shared by the resident workers (account/worker.py, validate/worker.py):
+# one JSON request per line in, one JSON response per line out.
+
+
+async def serve_lines(read_line, handle_line, write_line):
+    """Answers every line from read_line() with handle_line(line) until read_line() returns nothing."""
+    tasks = set()
+
+    async def respond(line):
+        await write_line(json.dumps(await handle_line(line)))
+
+    while True:
+        line = await read_line()
+        if not line:
+            break
+        if not line.strip():
+            continue
+
+        # responses carry the request id, so they may complete out of order
+        task = asyncio.create_task(respond(line))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def serve_stdin(handle_line):
+    loop = asyncio.get_running_loop()
+
+    async def read_line():
+        return await loop.run_in_executor(None, sys.stdin.readline)
+
+    async def write_line(response: str):
+        sys.stdout.write(response + "\n")
+        sys.stdout.flush()
+
+    await serve_lines(read_line, handle_line, write_line)
@@ -1,8 +1,9 @@
-import subprocess
 import os
 import sys
 import json
 import re
+from utils.compile_cache import CompileCache, compile_key
+from utils.compile_scheduler import METAEDITOR_PATH, COMPILE_TIMEOUT, run_metaeditor
 
 def parse_log(log_content):
     errors = []
@@ -27,13 +28,156 @@ def parse_log(log_content):
 
     return errors, stats
 
-def compile_ea(metaeditor_path, source_file, log_file, ex_file_path, raw_file_path):
+def has_result(log_content):
+    # MetaEditor ends every file it compiled with a "Result: N errors, M warnings" line
+    return any(line.lower().startswith("result:") for line in log_content.splitlines())
+
+def split_log(log_content, source_files):
+    # a folder compile writes one log for every file; diagnostic lines start with the path of
+    # the file they belong to, and lines from its includes follow the file being compiled
+    by_path = {os.path.abspath(f).lower(): f for f in source_files}
+    by_name = {os.path.basename(f).lower(): f for f in source_files}
+    lines = {f: [] for f in source_files}
+    result_lines = []
+    current = None
+    started_since_result = False
+
+    for line in log_content.splitlines():
+        path = re.match(r"^(.*?\.mq[45])\b", line.strip(), re.IGNORECASE)
+        if path:
+            source = by_path.get(os.path.abspath(path.group(1)).lower()) or by_name.get(os.path.basename(path.group(1)).lower())
+            if source and source != current:
+                current = source
+                started_since_result = True
+
+        if line.lower().startswith("result:"):
+            # one result line per file; a second one without a new file is the batch summary
+            if current and started_since_result:
+                result_lines.append((current, line))
+            started_since_result = False
+            continue
+
+        if current:
+            lines[current].append(line)
+
+    # a single result line for several files is only the batch summary
+    if len(result_lines) > 1 or len(source_files) == 1:
+        for source, line in result_lines:
+            lines[source].append(line)
+
+    return {source: "\n".join(source_lines) for source, source_lines in lines.items()}
+
+def timeout_result(timeout):
+    # reported like a compile error, and never cached
+    return {
+        "errors": [{"line": 0, "column": 0, "type": "error", "error": f"Compilation timed out after {timeout:g} seconds"}],
+        "stats": {"errors": 1, "warnings": 0},
+        "timed_out": True
+    }
+
+def cleanup_files(files):
+    for f in files:
+        try:
+            if os.path.exists(f):
+                os.remove(f)
+        except Exception:
+            pass
+
+def compile_batch(metaeditor_path, staging_dir, log_file, cache=None, worker=None, timeout=COMPILE_TIMEOUT):
+    # every .mq5/.mq4 in staging_dir in one MetaEditor run, results keyed by file name;
+    # with a worker (utils/compile_scheduler.py) its MetaEditor copy runs the compile
+    source_files = sorted(
+        os.path.join(staging_dir, name) for name in os.listdir(staging_dir)
+        if name.lower().endswith((".mq5", ".mq4"))
+    )
+    results = {}
+    keys = {}
+
+    try:
+        for source_file in source_files:
+            if cache:
+                try:
+                    keys[source_file] = compile_key(metaeditor_path, source_file)
+                    cached = cache.get(keys[source_file])
+                    if cached:
+                        results[source_file] = cached
+                except Exception:
+                    keys.pop(source_file, None)
+
+        # cached sources leave the folder, so the MetaEditor run only compiles the others
+        for source_file in results:
+            cleanup_files([source_file, os.path.splitext(source_file)[0]])
+        pending = [source_file for source_file in source_files if source_file not in results]
+
+        if pending:
+            # the timeout is per file, the batch gets it once for every file in it
+            batch_timeout = (worker.timeout if worker else timeout) * len(pending)
+            if worker:
+                finished = worker.run(staging_dir, log_file, pending[0], batch_timeout)
+            else:
+                finished = run_metaeditor(metaeditor_path, staging_dir, log_file, timeout=batch_timeout)
+
+            if not finished:
+                for source_file in pending:
+                    results[source_file] = timeout_result(batch_timeout)
+
+            log_content = ""
+            if os.path.exists(log_file):
+                with open(log_file, "r", encoding="utf-16") as f:
+                    log_content = f.read()
+
+            for source_file, file_log in split_log(log_content, pending).items():
+                if source_file in results:
+                    continue
+
+                errors, stats = parse_log(file_log)
+                results[source_file] = {
+                    "errors": errors,
+                    "stats": stats
+                }
+
+                # only a file MetaEditor reported on is a known result, no log lines is not a clean compile
+                if has_result(file_log) and source_file in keys:
+                    try:
+                        cache.put(keys[source_file], results[source_file])
+                    except Exception:
+                        pass
+
+    except Exception as e:
+        results = {}
+    finally:
+        # cleanup: every source with its compiled .ex5/.ex4 and the raw upload, and the log
+        for source_file in source_files:
+            stem, extension = os.path.splitext(source_file)
+            cleanup_files([source_file, stem + extension.lower().replace("mq", "ex"), stem])
+        cleanup_files([log_file])
+
+    return {
+        os.path.basename(source_file): results.get(source_file, {"errors": [], "stats": {}})
+        for source_file in source_files
+    }
+
+def compile_ea(metaeditor_path, source_file, log_file, ex_file_path, raw_file_path, cache=None, worker=None,
+               timeout=COMPILE_TIMEOUT):
     try:
-        subprocess.run(
-            [metaeditor_path, f"/compile:{source_file}", f"/log:{log_file}"],
-            capture_output=True,
-            text=True
-        )
+        # the same source with the same includes and compiler gives the same result, skip MetaEditor
+        key = None
+        if cache:
+            try:
+                key = compile_key(metaeditor_path, source_file)
+                cached = cache.get(key)
+                if cached:
+                    return cached
+            except Exception:
+                key = None
+
+        # a hung MetaEditor is killed with everything it started, the request gets a timeout error
+        if worker:
+            finished = worker.run(source_file, log_file, source_file)
+        else:
+            finished = run_metaeditor(metaeditor_path, source_file, log_file, timeout=timeout)
+        if not finished:
+            return timeout_result(worker.timeout if worker else timeout)
 
         result_obj = {
             "errors": [],
@@ -49,6 +193,12 @@ def compile_ea(metaeditor_path, source_file, log_file, ex_file_path, raw_file_pa
             result_obj["errors"] = errors
             result_obj["stats"] = stats
 
+            if key and has_result(log_content):
+                try:
+                    cache.put(key, result_obj)
+                except Exception:
+                    pass
+
 
     except Exception as e:
         return {
@@ -68,6 +218,20 @@ def compile_ea(metaeditor_path, source_file, log_file, ex_file_path, raw_file_pa
     return result_obj
 
 if __name__ == "__main__":
+    metaeditor_path = METAEDITOR_PATH
+
+    if len(sys.argv) == 3 and sys.argv[1] == "--batch":
+        # python index.py --batch <staging_dir>: compile every file of the folder at once
+        staging_dir = os.path.abspath(sys.argv[2])
+
+        log_file_dir = os.path.join(os.getcwd(), "logs")
+        os.makedirs(log_file_dir, exist_ok=True)
+        log_file = os.path.join(log_file_dir, f"batch-{os.path.basename(staging_dir)}.log")
+
+        result = compile_batch(metaeditor_path, staging_dir, log_file, CompileCache())
+        print(json.dumps(result))
+        sys.exit(0)
+
     if len(sys.argv) < 3:
         print(json.dumps({"error": "Missing args"}))
         sys.exit(1)
@@ -81,10 +245,8 @@ if __name__ == "__main__":
     os.makedirs(log_file_dir, exist_ok=True)
     
     log_file = os.path.join(log_file_dir, f"{filename}.log")
-    
-    metaeditor_path = r"C:\MQ45\Metatrader5\MetaEditor64.exe"
 
     # Run compiler and return JSON result
-    result = compile_ea(metaeditor_path, file_path, log_file, ex_file_path, raw_file_path)
+    result = compile_ea(metaeditor_path, file_path, log_file, ex_file_path, raw_file_path, CompileCache())
     print(json.dumps(result))
 
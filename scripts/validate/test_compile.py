@@ -0,0 +1,182 @@
+import index
+from index import compile_batch, split_log, parse_log
+from utils.compile_cache import CompileCache, compile_key
+import os
+import tempfile
+import unittest
+
+# Batch compiles and the compile cache, with a stand-in for MetaEditor that writes the log
+# a folder compile would.
+#
+#   python -m pytest -q test_compile.py
+
+SOURCE = "int OnInit() { return 0; }\n"
+
+
+def file_log(path, errors=0):
+    lines = [f"{path} : information: compiling '{os.path.basename(path)}'"]
+    lines += [f"{path}({line + 1},5) : error 256: undeclared identifier" for line in range(errors)]
+    return lines + [f"Result: {errors} errors, 0 warnings"]
+
+
+class FakeMetaEditor:
+    """Writes a folder compile's log for the .mq5 files it finds, `errors` per file name."""
+
+    def __init__(self, errors=None, silent=()):
+        self.errors = errors or {}
+        # files MetaEditor writes nothing about
+        self.silent = silent
+        self.compiled = []
+
+    def __call__(self, executable, target, log_file, include=None, timeout=None):
+        names = sorted(name for name in os.listdir(target) if name.endswith(".mq5"))
+        self.compiled.append(names)
+
+        lines = []
+        for name in names:
+            if name not in self.silent:
+                lines += file_log(os.path.join(target, name), self.errors.get(name, 0))
+        lines.append(f"Result: {sum(self.errors.values())} errors, 0 warnings")
+
+        with open(log_file, "w", encoding="utf-16") as f:
+            f.write("\n".join(lines))
+        return True
+
+
+class SplitLogTest(unittest.TestCase):
+    def test_lines_go_to_their_file(self):
+        sources = [os.path.abspath(name) for name in ("a.mq5", "b.mq5")]
+        log = "\n".join(file_log(sources[0], 2) + file_log(sources[1]) + ["Result: 2 errors, 0 warnings"])
+
+        logs = split_log(log, sources)
+        errors, stats = parse_log(logs[sources[0]])
+        self.assertEqual(stats, {"errors": 2, "warnings": 0})
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(parse_log(logs[sources[1]])[1], {"errors": 0, "warnings": 0})
+        # the batch summary belongs to no file
+        self.assertNotIn("Result: 2 errors", logs[sources[1]])
+
+    def test_single_summary_is_not_a_file_result(self):
+        sources = [os.path.abspath(name) for name in ("a.mq5", "b.mq5")]
+        log = "\n".join(file_log(sources[0])[:1] + ["Result: 0 errors, 0 warnings"])
+
+        logs = split_log(log, sources)
+        self.assertNotIn("Result:", logs[sources[0]])
+        self.assertEqual(logs[sources[1]], "")
+
+
+class CompileKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.metaeditor_path = os.path.join(self.folder.name, "metaeditor64.exe")
+        open(self.metaeditor_path, "w").close()
+        self.source = self.write("Experts/ea.mq5", '#include "Local.mqh"\n#include <Trade/Trade.mqh>\n' + SOURCE)
+        self.write("Experts/Local.mqh", "int local;\n")
+        self.write("MQL5/Include/Trade/Trade.mqh", "class CTrade {};\n")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.folder.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def key(self):
+        return compile_key(self.metaeditor_path, self.source)
+
+    def test_same_sources_same_key(self):
+        self.assertEqual(self.key(), self.key())
+
+    def test_quoted_include_is_relative_to_the_file(self):
+        key = self.key()
+        self.write("Experts/Local.mqh", "int local = 1;\n")
+        self.assertNotEqual(self.key(), key)
+
+    def test_angle_include_comes_from_the_library(self):
+        key = self.key()
+        # a Trade.mqh beside the expert is not the one <Trade/Trade.mqh> means
+        self.write("Experts/Trade/Trade.mqh", "class CTrade { int x; };\n")
+        self.assertEqual(self.key(), key)
+
+        self.write("MQL5/Include/Trade/Trade.mqh", "class CTrade { int x; };\n")
+        self.assertNotEqual(self.key(), key)
+
+    def test_nested_include_changes_the_key(self):
+        self.write("MQL5/Include/Trade/Trade.mqh", '#include "Helpers.mqh"\nclass CTrade {};\n')
+        key = self.key()
+        self.write("MQL5/Include/Trade/Helpers.mqh", "int helper;\n")
+        self.assertNotEqual(self.key(), key)
+
+    def test_missing_include_is_part_of_the_key(self):
+        os.remove(os.path.join(self.folder.name, "Experts/Local.mqh"))
+        key = self.key()
+        self.write("Experts/Local.mqh", "int local;\n")
+        self.assertNotEqual(self.key(), key)
+
+    def test_recursive_include(self):
+        self.write("Experts/Local.mqh", '#include "Local.mqh"\nint local;\n')
+        self.assertEqual(len(self.key()), 64)
+
+
+class CompileBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.metaeditor_path = os.path.join(self.folder.name, "metaeditor64.exe")
+        open(self.metaeditor_path, "w").close()
+        self.cache = CompileCache(os.path.join(self.folder.name, "cache.sqlite3"))
+        self.run_metaeditor = index.run_metaeditor
+
+    def tearDown(self):
+        index.run_metaeditor = self.run_metaeditor
+        self.folder.cleanup()
+
+    def compile(self, metaeditor, sources):
+        staging_dir = tempfile.mkdtemp(dir=self.folder.name)
+        for name, content in sources.items():
+            with open(os.path.join(staging_dir, name), "w") as f:
+                f.write(content)
+
+        index.run_metaeditor = metaeditor
+        return compile_batch(self.metaeditor_path, staging_dir, os.path.join(self.folder.name, "batch.log"), self.cache)
+
+    def test_results_per_file(self):
+        result = self.compile(FakeMetaEditor({"b.mq5": 1}), {"a.mq5": SOURCE, "b.mq5": SOURCE + "x;\n"})
+        self.assertEqual(result["a.mq5"]["stats"], {"errors": 0, "warnings": 0})
+        self.assertEqual(result["b.mq5"]["stats"], {"errors": 1, "warnings": 0})
+
+    def test_cached_files_are_not_recompiled(self):
+        self.compile(FakeMetaEditor(), {"a.mq5": SOURCE})
+
+        metaeditor = FakeMetaEditor()
+        result = self.compile(metaeditor, {"a.mq5": SOURCE, "b.mq5": SOURCE + "// b\n"})
+        self.assertEqual(metaeditor.compiled, [["b.mq5"]])
+        self.assertEqual(set(result), {"a.mq5", "b.mq5"})
+
+        # everything cached, no MetaEditor run at all
+        metaeditor = FakeMetaEditor()
+        result = self.compile(metaeditor, {"a.mq5": SOURCE, "b.mq5": SOURCE + "// b\n"})
+        self.assertEqual(metaeditor.compiled, [])
+        self.assertEqual(result["b.mq5"]["stats"], {"errors": 0, "warnings": 0})
+
+    def test_file_without_result_is_not_cached(self):
+        sources = {"a.mq5": SOURCE, "b.mq5": SOURCE + "// b\n", "c.mq5": SOURCE + "// c\n"}
+        self.compile(FakeMetaEditor(silent=("c.mq5",)), sources)
+
+        metaeditor = FakeMetaEditor()
+        self.compile(metaeditor, sources)
+        self.assertEqual(metaeditor.compiled, [["c.mq5"]])
+
+    def test_staging_dir_is_emptied(self):
+        staging_dir = tempfile.mkdtemp(dir=self.folder.name)
+        with open(os.path.join(staging_dir, "a.mq5"), "w") as f:
+            f.write(SOURCE)
+        index.run_metaeditor = FakeMetaEditor()
+        compile_batch(self.metaeditor_path, staging_dir, os.path.join(self.folder.name, "batch.log"), self.cache)
+        self.assertEqual(os.listdir(staging_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import hashlib
+
+COMPILE_CACHE_PATH = os.getenv("COMPILE_CACHE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "compile_cache.sqlite3"))
+# total size of the stored results, least recently used ones are evicted past it
+COMPILE_CACHE_MAX_BYTES = int(os.getenv("COMPILE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# bump to drop every stored result, e.g. after a parse_log change
+COMPILE_CACHE_VERSION = 1
+
+INCLUDE_PATTERN = re.compile(r'^\s*#include\s*([<"])([^>"]+)[>"]', re.MULTILINE)
+
+
+def read_source(path):
+    with open(path, "rb") as f:
+        content = f.read()
+
+    # MetaEditor saves sources as UTF-16 with a BOM, other editors as UTF-8 or ANSI
+    if content.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return content, content.decode("utf-16", errors="ignore")
+    return content, content.decode("utf-8", errors="ignore")
+
+
+def include_folder(metaeditor_path, source_file):
+    # <file.mqh> resolves against the installation's MQL5/Include (MQL4/Include for .mq4)
+    language = "MQL4" if source_file.lower().endswith(".mq4") else "MQL5"
+    return os.path.join(os.path.dirname(metaeditor_path), language, "Include")
+
+
+def compiler_version(metaeditor_path):
+    # a MetaEditor update replaces the executable, so its size and mtime identify the build
+    if os.getenv("METAEDITOR_VERSION"):
+        return os.getenv("METAEDITOR_VERSION")
+    try:
+        stat = os.stat(metaeditor_path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+    except OSError:
+        return "missing"
+
+
+def compile_key(metaeditor_path, source_file):
+    """sha256 of the source, every #include it pulls in (recursively) and the compiler build."""
+    digest = hashlib.sha256()
+    digest.update(f"v{COMPILE_CACHE_VERSION}\0{compiler_version(metaeditor_path)}\0".encode())
+    digest.update(os.path.splitext(source_file)[1].lower().encode() + b"\0")
+
+    library = include_folder(metaeditor_path, source_file)
+    seen = set()
+    pending = [(os.path.abspath(source_file), None)]
+
+    while pending:
+        path, name = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+
+        try:
+            content, text = read_source(path)
+        except OSError:
+            # a missing include is part of the key too, it fails now and may exist later
+            digest.update(f"missing:{name}\0".encode())
+            continue
+
+        digest.update(f"file:{name}\0".encode())
+        digest.update(hashlib.sha256(content).digest())
+
+        for quote, include in INCLUDE_PATTERN.findall(text):
+            include = include.replace("\\", os.sep)
+            if quote == '"':
+                # "file.mqh" is relative to the including file, then the library folder
+                local = os.path.join(os.path.dirname(path), include)
+                target = local if os.path.exists(local) else os.path.join(library, include)
+            else:
+                target = os.path.join(library, include)
+            pending.append((os.path.abspath(target), include))
+
+    return digest.hexdigest()
+
+
+class CompileCache:
+    """parse_log results of earlier compiles, keyed by compile_key, in a size-bounded SQLite file."""
+
+    def __init__(self, path=COMPILE_CACHE_PATH, max_bytes=COMPILE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.connection = None
+        # the resident worker's MetaEditor threads share the connection, one call at a time
+        self.lock = threading.RLock()
+
+    def connect(self):
+        if self.connection:
+            return self.connection
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # every upload runs its own validate process, they share the file
+        self.connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.connection.execute("pragma journal_mode=wal")
+        self.connection.execute("""
+            create table if not exists compile_results (
+              key text primary key,
+              result text not null,
+              size integer not null,
+              last_used real not null
+            )
+        """)
+        self.connection.commit()
+        return self.connection
+
+    def get(self, key):
+        with self.lock:
+            connection = self.connect()
+            row = connection.execute("select result from compile_results where key = ?", (key,)).fetchone()
+            if not row:
+                return None
+
+            with connection:
+                connection.execute("update compile_results set last_used = ? where key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        content = json.dumps(result)
+
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.execute(
+                    "insert or replace into compile_results (key, result, size, last_used) values (?, ?, ?, ?)",
+                    (key, content, len(content), time.time())
+                )
+                self.evict(connection)
+
+    def evict(self, connection):
+        total = connection.execute("select coalesce(sum(size), 0) from compile_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # drop the least recently used results until the rest fit
+        for key, size in connection.execute("select key, size from compile_results order by last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            connection.execute("delete from compile_results where key = ?", (key,))
+            total -= size
@@ -0,0 +1,150 @@
+import os
+import time
+import queue
+import shutil
+import signal
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from utils.compile_cache import include_folder
+
+METAEDITOR_PATH = os.getenv("METAEDITOR_PATH", r"C:\MQ45\Metatrader5\MetaEditor64.exe")
+# MetaEditor runs at once, each on its own copy of the executable under COMPILE_WORKERS_FOLDER\W<n>
+COMPILE_WORKERS = int(os.getenv("COMPILE_WORKERS", min(os.cpu_count() or 1, 4)))
+COMPILE_WORKERS_FOLDER = os.getenv("COMPILE_WORKERS_FOLDER", r"C:\MQ45\MetaEditors")
+# seconds one file may compile before MetaEditor and everything it started is killed
+COMPILE_TIMEOUT = float(os.getenv("COMPILE_TIMEOUT", 60))
+
+
+def kill_tree(process):
+    if os.name == "nt":
+        # /T takes the children MetaEditor started with it
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    process.wait()
+
+
+def run_metaeditor(executable, target, log_file, include=None, timeout=COMPILE_TIMEOUT):
+    """Compile target (a file or a folder), False when MetaEditor was killed after timeout seconds."""
+    command = [executable, f"/compile:{target}", f"/log:{log_file}"]
+    if include:
+        command.append(f"/include:{include}")
+
+    # its own process group, so a timeout can kill the whole tree
+    if os.name == "nt":
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+
+    try:
+        process.communicate(timeout=timeout)
+        return True
+    except subprocess.TimeoutExpired:
+        kill_tree(process)
+        return False
+
+
+class CompileWorker:
+    """One MetaEditor copy with its own log folder, used by one compile at a time."""
+
+    def __init__(self, number, metaeditor_path=METAEDITOR_PATH, folder=COMPILE_WORKERS_FOLDER, timeout=COMPILE_TIMEOUT):
+        self.number = number
+        self.metaeditor_path = metaeditor_path
+        self.folder = os.path.join(folder, f"W{number}")
+        self.executable = os.path.join(self.folder, os.path.basename(metaeditor_path))
+        self.log_folder = os.path.join(self.folder, "logs")
+        self.timeout = timeout
+        self.timeouts = 0
+
+    def prepare(self):
+        os.makedirs(self.log_folder, exist_ok=True)
+
+        # refreshed when MetaEditor is updated; copy2 keeps the mtime, so compile keys stay the same
+        source = os.stat(self.metaeditor_path)
+        try:
+            copy = os.stat(self.executable)
+            if copy.st_size == source.st_size and copy.st_mtime_ns == source.st_mtime_ns:
+                return
+        except OSError:
+            pass
+        shutil.copy2(self.metaeditor_path, self.executable)
+
+    def run(self, target, log_file, source_file, timeout=None):
+        # includes still come from the installation's MQL5 (or MQL4) folder
+        include = os.path.dirname(include_folder(self.metaeditor_path, source_file))
+        finished = run_metaeditor(self.executable, target, log_file, include, timeout or self.timeout)
+        if not finished:
+            self.timeouts += 1
+        return finished
+
+
+class CompileScheduler:
+    """Runs compile jobs on at most `workers` MetaEditor copies at once.
+
+    A job is called with the CompileWorker it got; jobs beyond the worker count
+    wait in the queue.
+    """
+
+    def __init__(self, workers=COMPILE_WORKERS, metaeditor_path=METAEDITOR_PATH, folder=COMPILE_WORKERS_FOLDER,
+                 timeout=COMPILE_TIMEOUT):
+        self.workers = [CompileWorker(i + 1, metaeditor_path, folder, timeout) for i in range(max(workers, 1))]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+        self.executor = ThreadPoolExecutor(max_workers=len(self.workers), thread_name_prefix="metaeditor")
+
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.compile_seconds = 0.0
+
+    def submit(self, job):
+        with self.lock:
+            self.queued += 1
+        return self.executor.submit(self.run, job, time.monotonic())
+
+    def run(self, job, enqueued_at):
+        worker = self.idle.get()
+        started = time.monotonic()
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_seconds += started - enqueued_at
+
+        try:
+            worker.prepare()
+            return job(worker)
+        except Exception:
+            with self.lock:
+                self.failed += 1
+            raise
+        finally:
+            with self.lock:
+                self.running -= 1
+                self.completed += 1
+                self.compile_seconds += time.monotonic() - started
+            self.idle.put(worker)
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "workers": len(self.workers),
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "timeouts": sum(worker.timeouts for worker in self.workers),
+                "wait_seconds": self.wait_seconds,
+                "compile_seconds": self.compile_seconds
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
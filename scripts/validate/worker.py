@@ -0,0 +1,85 @@
+from index import compile_ea, compile_batch
+from utils.compile_cache import CompileCache
+from utils.compile_scheduler import CompileScheduler, COMPILE_WORKERS, COMPILE_TIMEOUT, METAEDITOR_PATH
+import os
+import sys
+# json_lines.py in the scripts folder is shared by the resident workers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from json_lines import serve_stdin
+import asyncio
+import json
+import argparse
+from loguru import logger
+
+# Resident EA validation worker.
+# Reads one JSON request per line and writes one JSON response per line. Compiles run on
+# a CompileScheduler: at most COMPILE_WORKERS MetaEditor copies at once, the rest queue.
+#
+# request:  {"id": "1", "file_path": "...mq5", "filename": "...", "ex_file_path": "...", "raw_file_path": "..."}
+# response: {"id": "1", "errors": [...], "stats": {...}}
+#
+# {"id": "2", "batch": "<staging dir>"} compiles every file of the folder in one MetaEditor
+# run, the response has one {"errors", "stats"} entry per file name.
+# {"id": "3", "command": "metrics"} returns the queue depth and time spent compiling.
+
+
+class ValidateWorker:
+    def __init__(self, scheduler: CompileScheduler):
+        self.scheduler = scheduler
+        self.cache = CompileCache()
+
+    def compile(self, worker, request: dict):
+        if request.get("batch"):
+            staging_dir = os.path.abspath(request["batch"])
+            log_file = os.path.join(worker.log_folder, f"batch-{os.path.basename(staging_dir)}.log")
+            return compile_batch(worker.metaeditor_path, staging_dir, log_file, self.cache, worker)
+
+        log_file = os.path.join(worker.log_folder, f"{request['filename']}.log")
+        return compile_ea(worker.metaeditor_path, request["file_path"], log_file, request.get("ex_file_path"),
+                          request.get("raw_file_path"), self.cache, worker)
+
+    async def handle_line(self, line: str):
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            return {"id": None, "error": "Invalid request"}
+
+        request_id = request.get("id")
+        if request.get("command") == "metrics":
+            return {"id": request_id, "status": True, "data": self.scheduler.metrics()}
+
+        if not request.get("batch") and (not request.get("file_path") or not request.get("filename")):
+            return {"id": request_id, "error": "Missing args"}
+
+        try:
+            result = await asyncio.wrap_future(self.scheduler.submit(lambda worker: self.compile(worker, request)))
+        except Exception as e:
+            logger.exception(f"❌ Compile failed for {request.get('filename') or request.get('batch')}: {e}")
+            result = {"errors": [], "stats": {}}
+
+        return {"id": request_id, **result}
+
+    async def serve_stdin(self):
+        await serve_stdin(self.handle_line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Resident EA validation worker")
+    parser.add_argument("--workers", type=int, default=COMPILE_WORKERS, help="MetaEditor copies compiling at once")
+    parser.add_argument("--timeout", type=float, default=COMPILE_TIMEOUT, help="seconds per file before MetaEditor is killed")
+    parser.add_argument("--metaeditor", default=METAEDITOR_PATH)
+    args = parser.parse_args()
+
+    # stdout carries the responses
+    logger.remove()
+    logger.add(sys.stderr)
+
+    scheduler = CompileScheduler(args.workers, args.metaeditor, timeout=args.timeout)
+    try:
+        await ValidateWorker(scheduler).serve_stdin()
+    finally:
+        scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,12 @@
 import os
-import shutil
 import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 TERMINALS_PARENT_FOLDER = r"C:\MQ45\Terminals"
 DAYS_TO_KEEP = 0  # 0 = delete all
+# terminals cleaned at once, the work is mostly waiting on the disk
+CLEANUP_WORKERS = 8
 
 STATIC_FOLDERS = [
     "logs",
@@ -15,73 +18,115 @@ EXCLUDED_BASE_FOLDERS = ["Custom", "Default", "signals"]
 
 FOLDERS_TO_CLEAN = ["history", "ticks", "trades", "mail", "news", "subscriptions"]
 
-def remove_and_recreate(folder_path):
-    """Delete a folder entirely and recreate it empty."""
+
+def clean_tree(folder_path, cutoff, dry_run=False):
+    """Delete the files under folder_path last modified before cutoff (None = all of them)
+    in one scandir walk, and the subfolders left empty. folder_path itself is kept."""
+    report = {"files": 0, "bytes": 0, "kept": 0, "errors": 0}
+
+    def walk(path):
+        # True when everything under path was deleted
+        empty = True
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            report["errors"] += 1
+            return False
+
+        for entry in entries:
+            try:
+                # scandir already has the stat on Windows, no extra call per file
+                if entry.is_dir(follow_symlinks=False):
+                    if walk(entry.path):
+                        os.rmdir(entry.path)
+                    else:
+                        # kept files below, so this folder stays too
+                        empty = False
+                    continue
+
+                stat = entry.stat(follow_symlinks=False)
+                if cutoff is not None and stat.st_mtime >= cutoff:
+                    report["kept"] += 1
+                    empty = False
+                    continue
+
+                if not dry_run:
+                    os.remove(entry.path)
+                report["files"] += 1
+                report["bytes"] += stat.st_size
+            except OSError:
+                # e.g. a file a running terminal still holds open
+                report["errors"] += 1
+                empty = False
+
+        return empty and not dry_run
+
+    if os.path.isdir(folder_path):
+        walk(folder_path)
+    return report
+
+
+def cleanup_targets(terminal_folder):
+    targets = [os.path.join(terminal_folder, rel_path) for rel_path in STATIC_FOLDERS]
+
+    # broker server folders under /Bases are detected dynamically
+    bases_folder = os.path.join(terminal_folder, "Bases")
+    if os.path.isdir(bases_folder):
+        for entry in os.scandir(bases_folder):
+            if not entry.is_dir() or any(keyword.lower() == entry.name.lower() for keyword in EXCLUDED_BASE_FOLDERS):
+                continue
+            targets += [os.path.join(entry.path, subfolder) for subfolder in FOLDERS_TO_CLEAN]
+
+    return targets
+
+
+def clean_terminal(terminal_folder, cutoff, dry_run=False):
+    started = time.perf_counter()
+    report = {"terminal": os.path.basename(terminal_folder), "files": 0, "bytes": 0, "kept": 0, "errors": 0}
+
     try:
-        if os.path.exists(folder_path):
-            shutil.rmtree(folder_path)
-        os.makedirs(folder_path, exist_ok=True)
-        return True
-    except Exception as e:
-        print(f"❌ Failed to reset folder {folder_path}: {e}")
-        return False
-
-def clean_mt5_data():
-    now = time.time()
-    cutoff = now - (DAYS_TO_KEEP * 86400)
-    total_deleted = 0
-    total_size = 0
-
-    for folder_name in os.listdir(TERMINALS_PARENT_FOLDER):
-        if not folder_name.upper().startswith("T"):
-            continue
-
-        terminal_folder = os.path.join(TERMINALS_PARENT_FOLDER, folder_name)
-        bases_folder = os.path.join(terminal_folder, "Bases")
-
-        # 1️⃣ Clean static folders (full delete + recreate)
-        for rel_path in STATIC_FOLDERS:
-            folder_path = os.path.join(terminal_folder, rel_path)
-            if os.path.exists(folder_path):
-                # Calculate size and file count before removing
-                for root, dirs, files in os.walk(folder_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        try:
-                            if DAYS_TO_KEEP == 0 or os.path.getmtime(file_path) < cutoff:
-                                total_size += os.path.getsize(file_path)
-                                total_deleted += 1
-                        except:
-                            pass
-                remove_and_recreate(folder_path)
-
-        # 2️⃣ Dynamically detect broker server folders under /Bases
-        if os.path.exists(bases_folder):
-            server_folders = [
-                p for p in os.listdir(bases_folder)
-                if os.path.isdir(os.path.join(bases_folder, p))
-                and not any(keyword.lower() == p.lower() for keyword in EXCLUDED_BASE_FOLDERS)
-            ]
-
-            for server_folder in server_folders:
-                server_path = os.path.join(bases_folder, server_folder)
-
-                for subfolder in FOLDERS_TO_CLEAN:
-                    target = os.path.join(server_path, subfolder)
-                    if os.path.exists(target):
-                        # Calculate size before deletion
-                        for root, dirs, files in os.walk(target):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                try:
-                                    if DAYS_TO_KEEP == 0 or os.path.getmtime(file_path) < cutoff:
-                                        total_size += os.path.getsize(file_path)
-                                        total_deleted += 1
-                                except:
-                                    pass
-                        remove_and_recreate(target)
-
-    print(f"🧹 Cleanup complete: {total_deleted} files deleted ({total_size/1024/1024:.2f} MB freed)")
+        for target in cleanup_targets(terminal_folder):
+            for key, value in clean_tree(target, cutoff, dry_run).items():
+                report[key] += value
+    except OSError as e:
+        print(f"❌ Failed to clean {terminal_folder}: {e}")
+        report["errors"] += 1
+
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+def clean_mt5_data(days_to_keep=DAYS_TO_KEEP, workers=CLEANUP_WORKERS, dry_run=False):
+    cutoff = None if days_to_keep == 0 else time.time() - days_to_keep * 86400
+    started = time.perf_counter()
+
+    terminal_folders = [
+        entry.path for entry in os.scandir(TERMINALS_PARENT_FOLDER)
+        if entry.is_dir() and entry.name.upper().startswith("T")
+    ]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        reports = list(executor.map(lambda folder: clean_terminal(folder, cutoff, dry_run), terminal_folders))
+
+    for report in sorted(reports, key=lambda r: r["terminal"]):
+        errors = f", {report['errors']} errors" if report["errors"] else ""
+        print(f"  {report['terminal']}: {report['files']} files ({report['bytes']/1024/1024:.2f} MB), "
+              f"{report['kept']} kept{errors} in {report['seconds']:.2f}s")
+
+    total_deleted = sum(report["files"] for report in reports)
+    total_size = sum(report["bytes"] for report in reports)
+    total_kept = sum(report["kept"] for report in reports)
+    action = "would be deleted" if dry_run else "deleted"
+    print(f"🧹 Cleanup complete: {total_deleted} files {action} ({total_size/1024/1024:.2f} MB freed), "
+          f"{total_kept} newer files kept, {len(reports)} terminals in {time.perf_counter() - started:.2f}s")
+    return reports
+
 
 if __name__ == "__main__":
-    clean_mt5_data()
+    parser = argparse.ArgumentParser(description="Delete old logs and cached broker data of every terminal")
+    parser.add_argument("--days", type=int, default=DAYS_TO_KEEP, help="keep files modified in the last N days, 0 deletes all")
+    parser.add_argument("--workers", type=int, default=CLEANUP_WORKERS, help="terminals cleaned at once")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be deleted")
+    args = parser.parse_args()
+
+    clean_mt5_data(args.days, args.workers, args.dry_run)
@@ -1,31 +1,227 @@
 import os
 import shutil
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 # === CONFIGURATION ===
 SOURCE_FOLDER = r"C:\MQ45\Metatrader5"     # Path to original MT5 terminal folder
 DEST_PARENT_FOLDER = r"C:\MQ45\Terminals"  # Where to create the T1, T2... folders
 RANGE_START = 1
 RANGE_END = 32                        # Change as needed
+PROVISION_WORKERS = 8                 # Terminals created at once
 
+# Folders every terminal writes to, copied per terminal. Everything else (terminal64.exe,
+# MetaEditor, DLLs...) is hardlinked to the source install: 32 terminals then take the disk
+# space of one, plus their own data. The MQL5 program folders are copied too: terminals and
+# LiveUpdate rewrite .ex5 files there in place, which through a hardlink would change every
+# terminal and the source install at once.
+MUTABLE_FOLDERS = [
+    "config",
+    "Bases",
+    "logs",
+    "tester",
+    "MQL5\\Logs",
+    "MQL5\\Files",
+    "MQL5\\Profiles",
+    "MQL5\\Experts",
+    "MQL5\\Indicators",
+    "MQL5\\Scripts",
+    "MQL5\\Services",
+    "MQL5\\Presets",
+    "MQL5\\Libraries"
+]
+# compiled programs, mutable wherever they are
+MUTABLE_EXTENSIONS = (".ex5", ".ex4")
 
-def duplicate_mt5_terminals():
+
+def is_mutable(rel_path):
+    rel_path = rel_path.lower()
+    if rel_path.endswith(MUTABLE_EXTENSIONS):
+        return True
+    for folder in MUTABLE_FOLDERS:
+        folder = folder.replace("\\", os.sep).lower()
+        if rel_path == folder or rel_path.startswith(folder + os.sep):
+            return True
+    return False
+
+
+def source_tree():
+    """Relative paths of the source install's folders and files, from one scandir walk."""
+    folders, files = [], []
+    pending = [""]
+    while pending:
+        rel_folder = pending.pop()
+        for entry in os.scandir(os.path.join(SOURCE_FOLDER, rel_folder)):
+            rel_path = os.path.join(rel_folder, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                folders.append(rel_path)
+                pending.append(rel_path)
+            else:
+                files.append(rel_path)
+    return folders, files
+
+
+def link_or_copy(source, dest, mode):
+    """Hardlink source to dest in "link" mode (copy when linking is not possible, e.g. across
+    volumes), always copy in "copy" mode. Returns "linked" or "copied"."""
+    if mode == "link":
+        try:
+            os.link(source, dest)
+            return "linked"
+        except OSError:
+            pass
+    shutil.copy2(source, dest)
+    return "copied"
+
+
+def provision_terminal(number, tree, mode="link"):
+    dest_folder = os.path.join(DEST_PARENT_FOLDER, f"T{number}")
+    if os.path.exists(dest_folder):
+        print(f"⚠️  Skipping T{number}: Already exists")
+        return None
+
+    # built next to the target and renamed, so a failed run never leaves a half terminal as T<n>
+    staging_folder = dest_folder + ".tmp"
+    started = time.perf_counter()
+    report = {"terminal": f"T{number}", "linked": 0, "copied": 0}
+
+    try:
+        if os.path.exists(staging_folder):
+            shutil.rmtree(staging_folder)
+
+        folders, files = tree
+        os.makedirs(staging_folder)
+        for rel_path in folders:
+            os.makedirs(os.path.join(staging_folder, rel_path), exist_ok=True)
+        for rel_path in files:
+            action = link_or_copy(os.path.join(SOURCE_FOLDER, rel_path), os.path.join(staging_folder, rel_path),
+                                  "copy" if is_mutable(rel_path) else mode)
+            report[action] += 1
+
+        os.rename(staging_folder, dest_folder)
+        report["seconds"] = time.perf_counter() - started
+        print(f"✅ Created {dest_folder}: {report['linked']} linked, {report['copied']} copied in {report['seconds']:.2f}s")
+        return report
+    except Exception as e:
+        print(f"❌ Failed to create T{number}: {e}")
+        shutil.rmtree(staging_folder, ignore_errors=True)
+        return None
+
+
+def verify_terminal(number, tree, repair=False, mode="link"):
+    """Drift between T<n> and the source install. Only the shared part is compared, the mutable
+    folders are expected to differ: missing files, files changed since (size or mtime), and
+    identical files that are separate copies instead of links (wasted space, not reported for
+    terminals created in "copy" mode). A file that cannot be read or replaced, e.g. the exe of
+    a running terminal, is counted under errors and the check goes on."""
+    dest_folder = os.path.join(DEST_PARENT_FOLDER, f"T{number}")
+    report = {"terminal": f"T{number}", "missing": [], "changed": [], "unlinked": [], "errors": [], "repaired": 0}
+    if not os.path.isdir(dest_folder):
+        report["missing"].append(".")
+        return report
+
+    _, files = tree
+    for rel_path in files:
+        if is_mutable(rel_path):
+            continue
+
+        source = os.path.join(SOURCE_FOLDER, rel_path)
+        dest = os.path.join(dest_folder, rel_path)
+        try:
+            source_stat = os.stat(source)
+            try:
+                dest_stat = os.stat(dest)
+            except FileNotFoundError:
+                report["missing"].append(rel_path)
+                if repair:
+                    os.makedirs(os.path.dirname(dest), exist_ok=True)
+                    link_or_copy(source, dest, mode)
+                    report["repaired"] += 1
+                continue
+
+            if os.path.samestat(source_stat, dest_stat):
+                continue
+            if source_stat.st_size != dest_stat.st_size or source_stat.st_mtime_ns != dest_stat.st_mtime_ns:
+                report["changed"].append(rel_path)
+            elif mode == "copy":
+                # a copied terminal is made of identical copies
+                continue
+            else:
+                report["unlinked"].append(rel_path)
+
+            if repair:
+                os.remove(dest)
+                link_or_copy(source, dest, mode)
+                report["repaired"] += 1
+        except OSError:
+            # e.g. a DLL a running terminal holds open
+            report["errors"].append(rel_path)
+
+    return report
+
+
+def duplicate_mt5_terminals(mode="link", workers=PROVISION_WORKERS):
     if not os.path.exists(SOURCE_FOLDER):
         print(f"❌ Source folder does not exist: {SOURCE_FOLDER}")
         return
-    
+
     os.makedirs(DEST_PARENT_FOLDER, exist_ok=True)
+    started = time.perf_counter()
+    tree = source_tree()
+    print(f"🔁 Creating T{RANGE_START}-T{RANGE_END} from {SOURCE_FOLDER} ({len(tree[1])} files, mode: {mode})...")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        reports = list(executor.map(lambda number: provision_terminal(number, tree, mode),
+                                    range(RANGE_START, RANGE_END + 1)))
 
-    for i in range(RANGE_START, RANGE_END + 1):
-        dest_folder = os.path.join(DEST_PARENT_FOLDER, f"T{i}")
-        if os.path.exists(dest_folder):
-            print(f"⚠️  Skipping T{i}: Already exists")
+    created = [report for report in reports if report]
+    print(f"✅ Created {len(created)} terminals in {time.perf_counter() - started:.2f}s")
+
+
+def verify_mt5_terminals(repair=False, mode="link", workers=PROVISION_WORKERS):
+    if not os.path.exists(SOURCE_FOLDER):
+        print(f"❌ Source folder does not exist: {SOURCE_FOLDER}")
+        return
+
+    tree = source_tree()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        reports = list(executor.map(lambda number: verify_terminal(number, tree, repair, mode),
+                                    range(RANGE_START, RANGE_END + 1)))
+
+    drifted = 0
+    for report in reports:
+        if report["missing"] == ["."]:
+            print(f"❌ {report['terminal']}: does not exist")
+            drifted += 1
+            continue
+
+        problems = {key: report[key] for key in ("missing", "changed", "unlinked", "errors") if report[key]}
+        if not problems:
+            print(f"✅ {report['terminal']}: in sync")
             continue
-        try:
-            print(f"🔁 Copying to {dest_folder}...")
-            shutil.copytree(SOURCE_FOLDER, dest_folder)
-            print(f"✅ Created {dest_folder}")
-        except Exception as e:
-            print(f"❌ Failed to create T{i}: {e}")
+
+        drifted += 1
+        summary = ", ".join(f"{len(paths)} {key}" for key, paths in problems.items())
+        repaired = f", {report['repaired']} repaired" if repair else ""
+        print(f"⚠️  {report['terminal']}: {summary}{repaired}")
+        for key, paths in problems.items():
+            for rel_path in paths[:5]:
+                print(f"     {key}: {rel_path}")
+
+    print(f"🔍 Verified {len(reports)} terminals, {drifted} drifted from {SOURCE_FOLDER}")
+
 
 if __name__ == "__main__":
-    duplicate_mt5_terminals()
+    parser = argparse.ArgumentParser(description="Create T1..TN terminal folders from the source MT5 install")
+    parser.add_argument("--mode", choices=["link", "copy"], default="link",
+                        help="hardlink the read-only files (default) or copy everything; with --verify, how the terminals were created")
+    parser.add_argument("--workers", type=int, default=PROVISION_WORKERS, help="terminals created at once")
+    parser.add_argument("--verify", action="store_true", help="report drift from the source instead of creating")
+    parser.add_argument("--repair", action="store_true", help="with --verify, relink missing and drifted files")
+    args = parser.parse_args()
+
+    if args.verify:
+        verify_mt5_terminals(args.repair, args.mode, args.workers)
+    else:
+        duplicate_mt5_terminals(args.mode, args.workers)
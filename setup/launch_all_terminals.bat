@@ -1,8 +1,5 @@
 @echo off
-setlocal enabledelayedexpansion
-
-for /L %%i in (1,1,32) do (
-    set "folder=C:\MQ45\Terminals\T%%i"
-    start "" "!folder!\terminal64.exe" /portable
-    timeout /nobreak /t 1 >nul
-)
+rem Starts T1-T32 under the warm-pool supervisor (scripts\account\supervisor.py): crashed
+rem terminals are restarted and kept out of the allocator until they are ready again.
+cd /d "%~dp0..\scripts\account"
+python supervisor.py --terminals 1-32